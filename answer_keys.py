@@ -0,0 +1,85 @@
+# answer_keys.py
+"""Compiled answer keys and one-pass grading for exam submissions.
+
+An answer key maps the form field name of each question (its id as a
+string) to ``(question_id, normalized correct option, {normalized option:
+option number})``. Keys are cached per worker and tagged with the exam's
+``questions_version``, so a stale key is rebuilt as soon as any worker
+changes the exam's questions.
+
+Graded submissions can also be packed into one compact record per
+attempt: 5 bytes per question (uint32 question id, uint8 choice), where
+the choice is the option number picked (0 = unanswered, 7 = not one of
+the options) with CORRECT_FLAG set when it matched the key.
+"""
+import struct
+import threading
+
+
+RESPONSE_RECORD = struct.Struct('<IB')
+CHOICE_MASK = 0x07
+UNRECOGNIZED_CHOICE = 0x07
+CORRECT_FLAG = 0x80
+
+
+def normalize_answer(value):
+    return value.strip().lower()
+
+
+def compile_answer_key(rows):
+    """Build an answer key from (question_id, correct_option, option1..option4) rows."""
+    answer_key = {}
+    for question_id, correct, *options in rows:
+        numbers = {}
+        for number, option in enumerate(options, start=1):
+            numbers.setdefault(normalize_answer(option), number)
+        answer_key[str(question_id)] = (question_id, normalize_answer(correct), numbers)
+    return answer_key
+
+
+def grade_and_pack(answer_key, form):
+    """Grade a submission and pack every response; return (score, packed bytes)."""
+    score = 0
+    packed = bytearray()
+    for field, (question_id, correct, numbers) in answer_key.items():
+        selected = form.get(field)
+        choice = 0
+        if selected:
+            selected = normalize_answer(selected)
+            choice = numbers.get(selected, UNRECOGNIZED_CHOICE)
+            if selected == correct:
+                score += 1
+                choice |= CORRECT_FLAG
+        packed += RESPONSE_RECORD.pack(question_id, choice)
+    return score, bytes(packed)
+
+
+class AnswerKeyCache:
+    """Per-worker cache of compiled answer keys, validated against a version stamp."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, exam_id, version):
+        entry = self._keys.get(exam_id)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        answer_key = self._loader(exam_id)
+        with self._lock:
+            self._keys[exam_id] = (version, answer_key)
+        return answer_key
+
+    def invalidate(self, exam_id):
+        with self._lock:
+            self._keys.pop(exam_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
@@ -1,47 +1,105 @@
 # app.py  
-from flask import Flask, render_template, request, redirect, url_for, flash, session, g, jsonify, make_response, Response
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, session, g, jsonify, make_response, Response, stream_with_context, abort, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from functools import partial, wraps
 import os
+import uuid
+import mimetypes
+import hashlib
+import time
+import math
+import threading
+import fcntl
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import click
 from dotenv import load_dotenv
-from openai import OpenAI
-from datetime import datetime
+from datetime import datetime, timedelta
+import base64
 import csv
+import json
 from io import StringIO
-from flask import send_from_directory
+from flask import send_file
+from flask.signals import before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
-
-
-
-# --- Load environment variables first ---
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-if not OPENAI_API_KEY:
-    raise RuntimeError("❌ OPENAI_API_KEY not found in .env")
-
-# --- Initialize OpenAI client ---
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-basedir = os.path.abspath(os.path.dirname(__file__))
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'change-this-to-a-random-secret-key'
-db_url = os.getenv("DATABASE_URL", "sqlite:///database.db")
-
-# Fix SSL issue on Render
-if db_url.startswith("postgres://"):
-    db_url = db_url.replace("postgres://", "postgresql://")
-
-app.config['SQLALCHEMY_DATABASE_URI'] = db_url
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-
-migrate = Migrate(app, db)
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from smartbot_cache import create_reply_cache, make_cache_key
+from answer_keys import AnswerKeyCache, compile_answer_key, grade_and_pack
+from question_import import ImportFormatError, detect_format, iter_rows, validate_question
+from identity_cache import IdentityCache, identity_from_user
+from note_storage import BlobStore
+from note_search import SearchIndex, extract_text
+from fragment_cache import VersionedCache
+from autosave import WriteBehindBuffer
+from submission_queue import FINISHED, SubmissionJournal, SubmissionWorker
+from metrics import COUNT_BUCKETS, Registry, SnapshotExporter, render as render_metrics
+from smartbot_backends import UpstreamRateLimited, create_chat_backend
+from smartbot_admission import SmartBotBusy, Ticket, create_admission_control
+from config import CONFIGS
+from question_sampling import QuestionBank, QuestionBankCache, attempt_seed, draw, pack_ids, unpack_ids
+from db_profiles import apply_sqlite_pragmas, engine_options, resolve_profile, sqlite_pragmas
+from static_assets import AssetPipeline
+
+
+
+SMARTBOT_MODEL = "gpt-3.5-turbo"
+SMARTBOT_SYSTEM_PROMPT = "You are SmartBot, a helpful AI tutor for Smart E-Learning."
+SMARTBOT_MAX_TOKENS = 250
+SMARTBOT_TEMPERATURE = 0.7
+SMARTBOT_ERROR_REPLY = "⚠ Sorry, I'm having trouble connecting to SmartBot."
+SMARTBOT_BUSY_REPLY = "⏳ SmartBot is busy right now. Please try again in {retry_after} s."
+SMARTBOT_CONTEXT_INTRO = ("Excerpts from the course notes follow. Use them when they are relevant "
+                          "to the question and say which note you used.")
+SMARTBOT_RATE_LIMITED_REPLY = "⏳ You're sending messages too quickly. Please try again in {retry_after} s."
+
+db = SQLAlchemy()
+migrate = Migrate()
+
+# Routes, hooks and CLI commands; create_app() registers them on the app.
+bp = Blueprint('main', __name__, cli_group=None)
+
+
+def service(name):
+    """Proxy to one of the current app's per-app services, built by create_app()."""
+    return LocalProxy(lambda: current_app.extensions['smartelearning'][name])
+
+
+smartbot_backend = service('smartbot_backend')
+smartbot_cache = service('smartbot_cache')
+smartbot_admission = service('smartbot_admission')
+blob_store = service('blob_store')
+search_index = service('search_index')
+answer_keys = service('answer_keys')
+question_banks = service('question_banks')
+identities = service('identities')
+catalog_fragments = service('catalog_fragments')
+autosave_buffer = service('autosave_buffer')
+submission_journal = service('submission_journal')
+submission_worker = service('submission_worker')
+metrics_exporter = service('metrics_exporter')
+
+
+def note_vector_index():
+    """The app's NoteVectorIndex, opened on first use (it imports NumPy, which is slow)."""
+    services = current_app.extensions['smartelearning']
+    if services.get('note_vectors') is None:
+        with services['note_vectors_lock']:
+            if services.get('note_vectors') is None:
+                from note_vectors import NoteVectorIndex
+                services['note_vectors'] = NoteVectorIndex(
+                    current_app.config['NOTE_VECTORS_DIR'] or os.path.join(current_app.instance_path, "note_vectors"),
+                    dim=current_app.config['NOTE_VECTOR_DIM']
+                )
+    return services['note_vectors']
+
+
+note_vectors = LocalProxy(note_vector_index)
 
 
 # ---------- Models ----------
@@ -64,36 +122,259 @@ class Exam(db.Model):
     title = db.Column(db.String(150), nullable=False)
     description = db.Column(db.String(300))
     duration = db.Column(db.Integer, nullable=False, default=30)  # minutes
+    # Changes whenever the exam's questions change; validates cached answer keys.
+    questions_version = db.Column(db.String(32), nullable=False, default=lambda: uuid.uuid4().hex)
     questions = db.relationship('Question', backref='exam', lazy=True)
+    # Serve each attempt this many questions drawn from the bank (None: all of them),
+    # optionally in proportion to the bank's tags.
+    sample_size = db.Column(db.Integer)
+    sample_by_tag = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    def bump_questions_version(self):
+        self.questions_version = uuid.uuid4().hex
+
+
+class CatalogVersion(db.Model):
+    """Single-row counter bumped whenever the exam catalog changes."""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False, index=True)
     question_text = db.Column(db.String(500), nullable=False)
     option1 = db.Column(db.String(200), nullable=False)
     option2 = db.Column(db.String(200), nullable=False)
     option3 = db.Column(db.String(200), nullable=False)
     option4 = db.Column(db.String(200), nullable=False)
     correct_option = db.Column(db.String(200), nullable=False)
+    # Topic used to stratify sampled attempts (see Exam.sample_by_tag).
+    tag = db.Column(db.String(50))
 
 
 class Result(db.Model):
+    __table_args__ = (
+        # One attempt per student per exam; also serves per-user lookups.
+        db.Index('uq_result_user_exam', 'user_id', 'exam_id', unique=True),
+        # Per-exam filters, score ordering and score aggregates.
+        db.Index('ix_result_exam_id_score', 'exam_id', 'score'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False)
     score = db.Column(db.Integer, nullable=False)
     date_taken = db.Column(db.DateTime, default=datetime.utcnow)
 
+class ResultAnswers(db.Model):
+    """The responses behind one Result, packed by answer_keys.grade_and_pack (5 bytes per question)."""
+    result_id = db.Column(db.Integer, db.ForeignKey('result.id'), primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False, index=True)
+    answers = db.Column(db.LargeBinary, nullable=False)
+
+
+class ExamDraft(db.Model):
+    """An attempt in progress: when it started, and its autosaved answers (seq is the client's save counter)."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), primary_key=True, index=True)
+    answers = db.Column(db.JSON, nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ExamAttempt(db.Model):
+    """The questions served to one student's attempt: packed uint32 ids drawn from a
+    sampled exam, or NULL for every question of the exam."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), primary_key=True, index=True)
+    question_ids = db.Column(db.LargeBinary)
+    drawn_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ExamStats(db.Model):
+    """Running score statistics for one exam, updated with every submission."""
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.BigInteger, nullable=False, default=0)
+    total_squares = db.Column(db.BigInteger, nullable=False, default=0)
+    min_score = db.Column(db.Integer)
+    max_score = db.Column(db.Integer)
+    # JSON list; histogram[s] is the number of results with score s.
+    histogram = db.Column(db.Text, nullable=False, default='[]')
+
+    def add(self, score, times=1):
+        counts = json.loads(self.histogram or '[]')
+        if score >= len(counts):
+            counts.extend([0] * (score + 1 - len(counts)))
+        counts[score] += times
+        self.histogram = json.dumps(counts)
+        self.count = (self.count or 0) + times
+        self.total = (self.total or 0) + score * times
+        self.total_squares = (self.total_squares or 0) + score * score * times
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+
+    def reset(self):
+        self.count = self.total = self.total_squares = 0
+        self.min_score = self.max_score = None
+        self.histogram = '[]'
+
+    def percentile(self, p):
+        """Nearest-rank percentile (0-100) read off the histogram."""
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+        for score, n in enumerate(json.loads(self.histogram)):
+            seen += n
+            if seen >= rank:
+                return score
+        return self.max_score
+
+    def to_dict(self):
+        mean = self.total / self.count if self.count else 0
+        variance = self.total_squares / self.count - mean * mean if self.count else 0
+        return {
+            "count": self.count,
+            "avg": round(mean, 2),
+            "stddev": round(max(variance, 0) ** 0.5, 2),
+            "min": self.min_score,
+            "max": self.max_score,
+            "histogram": json.loads(self.histogram),
+            "percentiles": {str(p): self.percentile(p) for p in (10, 25, 50, 75, 90)}
+        }
+
+
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     filename = db.Column(db.String(200), nullable=False)
+    # SHA-256 of the stored blob; NULL for notes saved before content addressing.
+    content_hash = db.Column(db.String(64), index=True)
+    size = db.Column(db.BigInteger)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     uploader = db.relationship('User', backref='notes_uploaded') 
-    upload_date = db.Column(db.DateTime, default=datetime.utcnow)
-
-
+    upload_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class NoteBlob(db.Model):
+    """One stored file in the content-addressed note store, shared by identical uploads."""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ---------- Instrumentation ----------
+# Each worker writes its metrics to METRICS_DIR; /metrics sums all workers.
+# Queries slower than SLOW_QUERY_MS are logged with their endpoint.
+metrics_registry = Registry()
+REQUEST_LATENCY = metrics_registry.histogram(
+    "smartelearning_http_request_duration_seconds", "Time to serve a request, by endpoint.",
+    ("endpoint", "method"))
+REQUESTS = metrics_registry.counter(
+    "smartelearning_http_requests_total", "Requests served, by endpoint and status.",
+    ("endpoint", "method", "status"))
+REQUEST_QUERIES = metrics_registry.histogram(
+    "smartelearning_db_queries_per_request", "SQL statements issued while serving one request.",
+    ("endpoint",), buckets=COUNT_BUCKETS)
+QUERIES = metrics_registry.counter(
+    "smartelearning_db_queries_total", "SQL statements executed, by endpoint.", ("endpoint",))
+QUERY_SECONDS = metrics_registry.counter(
+    "smartelearning_db_query_seconds_total", "Time spent executing SQL, by endpoint.", ("endpoint",))
+SLOW_QUERIES = metrics_registry.counter(
+    "smartelearning_db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS.", ("endpoint",))
+OPENAI_LATENCY = metrics_registry.histogram(
+    "smartelearning_openai_request_duration_seconds",
+    "OpenAI chat completion time (whole stream when streaming).", ("model", "outcome"))
+OPENAI_TOKENS = metrics_registry.counter(
+    "smartelearning_openai_tokens_total", "Tokens used by OpenAI chat completions.", ("model", "kind"))
+TEMPLATE_RENDER = metrics_registry.histogram(
+    "smartelearning_template_render_seconds", "Time to render a template, by template.", ("template",))
+RETRIEVAL_LATENCY = metrics_registry.histogram(
+    "smartelearning_smartbot_retrieval_seconds", "Time to retrieve note excerpts for a SmartBot prompt.")
+SMARTBOT_REFUSED = metrics_registry.counter(
+    "smartelearning_smartbot_refused_total",
+    "SmartBot requests refused by admission control (user, global or upstream).", ("reason",))
+
+
+def metrics_endpoint_label():
+    if not has_request_context():
+        return "background"
+    return request.url_rule.endpoint if request.url_rule else "unmatched"
+
+
+def instrument_engine(engine, slow_query_ms, logger):
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        endpoint = metrics_endpoint_label()
+        QUERIES.inc(endpoint)
+        QUERY_SECONDS.inc(endpoint, amount=elapsed)
+        if has_request_context() and "request_stats" in g:
+            g.request_stats["queries"] += 1
+        if elapsed * 1000 >= slow_query_ms:
+            SLOW_QUERIES.inc(endpoint)
+            logger.warning("Slow query (%.1f ms) in %s: %s", elapsed * 1000, endpoint, statement)
+
+    @event.listens_for(engine, "handle_error")
+    def drop_query_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_stats = {"started": time.perf_counter(), "queries": 0}
+
+
+def record_request_metrics(stats, endpoint, method, status):
+    REQUEST_LATENCY.observe(time.perf_counter() - stats["started"], endpoint, method)
+    REQUESTS.inc(endpoint, method, str(status))
+    REQUEST_QUERIES.observe(stats["queries"], endpoint)
+
+
+@bp.after_app_request
+def record_request(response):
+    stats = g.request_stats
+    # Runs once the body has been sent, so streamed responses count in full.
+    response.call_on_close(partial(record_request_metrics, stats, metrics_endpoint_label(),
+                                   request.method, response.status_code))
+    stats["recorded"] = True
+    return response
+
+
+@bp.teardown_app_request
+def record_failed_request(exc):
+    # An exception that escaped every handler (or an after_request hook) never
+    # reaches record_request; count it as the 500 the client gets.
+    stats = g.get("request_stats")
+    if stats is not None and not stats.get("recorded"):
+        record_request_metrics(stats, metrics_endpoint_label(), request.method, 500)
+    metrics_exporter.start()
+
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint; needs "Authorization: Bearer $METRICS_TOKEN".
+
+    Without a token configured only direct loopback requests are answered
+    (not proxied ones: behind a local proxy every client looks like loopback).
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f"Bearer {token}":
+            abort(403)
+    elif request.remote_addr not in ('127.0.0.1', '::1') or 'X-Forwarded-For' in request.headers:
+        abort(403)
+    return Response(render_metrics(metrics_registry, metrics_exporter.collect()),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 # ---------- helpers ----------
@@ -102,7 +383,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash("Please login to access this page.", "warning")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -112,19 +393,155 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if not g.user or not g.user.is_admin:
             flash("Admin access required.", "danger")
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
         return f(*args, **kwargs)
     return decorated_function
 
 
-@app.before_request
+def answer_key_rows():
+    return db.select(Question.id, Question.correct_option,
+                     Question.option1, Question.option2, Question.option3, Question.option4)
+
+
+def answer_key_query(exam_id):
+    return answer_key_rows().where(Question.exam_id == exam_id).order_by(Question.id)
+
+
+def load_answer_key(exam_id):
+    rows = db.session.execute(answer_key_query(exam_id)).all()
+    return compile_answer_key(rows)
+
+
+def load_question_bank(exam_id):
+    return QuestionBank(db.session.execute(
+        db.select(Question.id, Question.tag).where(Question.exam_id == exam_id).order_by(Question.id)
+    ))
+
+
+
+def load_identity(user_id):
+    user = db.session.get(User, user_id)
+    return identity_from_user(user) if user else None
+
+
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def invalidate_user_identity(mapper, connection, user):
+    identities.invalidate(user.id)
+
+
+@bp.before_app_request
 def load_logged_in_user():
+    # g.user is a cached Identity (id, fullname, email, is_admin), not a User row.
     g.user = None
+    # Static files are the same for everyone; reading the session would add "Vary: Cookie".
+    if request.endpoint == 'static':
+        return
     if 'user_id' in session:
-        g.user = User.query.get(session['user_id'])
+        g.user = identities.get(session['user_id'])
+
+# ---------- Notes full-text index ----------
+# One background thread per worker extracts text so uploads never wait on it.
+note_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='note-index')
+
+
+def note_path(note):
+    if note.content_hash is None:
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(note.filename))
+    return blob_store.path_for(note.content_hash)
+
+
+def note_exists(note_id):
+    # A connection of its own: the caller's session may hold an older snapshot.
+    with db.engine.connect() as conn:
+        return conn.execute(db.select(Note.id).where(Note.id == note_id)).first() is not None
+
+
+def index_note(note_id):
+    note = db.session.get(Note, note_id)
+    if note is None:
+        return
+    path = note_path(note)
+    body = extract_text(path, note.filename) if os.path.exists(path) else ''
+    # Both indexes re-check the note under their write lock: delete_note()
+    # may have removed it while the text was being extracted.
+    if search_index.upsert(note.id, note.title, body):
+        note_vectors.add(note.id, note.title, body, still_exists=partial(note_exists, note.id))
+
+
+def index_note_in_background(note_id):
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                index_note(note_id)
+            except Exception:
+                current_app.logger.exception("Indexing note %s failed", note_id)
+    note_index_executor.submit(run)
+
+
+@bp.before_app_request
+def catch_up_note_index():
+    """Once per process, index notes whose background job was lost (e.g. in a restart or
+    crash), or that this host's vector index has never seen (a fresh instance folder)."""
+    services = current_app.extensions['smartelearning']
+    if request.endpoint == 'static' or services.get('note_index_checked') == os.getpid():
+        return
+    services['note_index_checked'] = os.getpid()
+    app = current_app._get_current_object()
+
+    def run():
+        with open(os.path.join(app.instance_path, 'note_index.lock'), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another worker is catching up
+            with app.app_context():
+                try:
+                    indexed = search_index.indexed_ids() & note_vectors.note_ids()
+                    missing = [note_id for note_id in db.session.execute(db.select(Note.id)).scalars()
+                               if note_id not in indexed]
+                    for note_id in missing:
+                        index_note(note_id)
+                except Exception:
+                    current_app.logger.exception("Catching up the notes index failed")
+                    return
+                if missing:
+                    current_app.logger.info("Indexed %d notes missing from the index", len(missing))
+    note_index_executor.submit(run)
+
 
 # ---------- Admin: Upload Notes ----------
-@app.route('/upload_notes', methods=['GET', 'POST'])
+def acquire_blob(digest, size):
+    """Add a reference to a stored blob, creating its row on first use."""
+    updated = NoteBlob.query.filter_by(sha256=digest).update(
+        {NoteBlob.ref_count: NoteBlob.ref_count + 1}, synchronize_session=False
+    )
+    if updated:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(NoteBlob(sha256=digest, size=size, ref_count=1))
+    except IntegrityError:
+        # Another worker created the row first.
+        NoteBlob.query.filter_by(sha256=digest).update(
+            {NoteBlob.ref_count: NoteBlob.ref_count + 1}, synchronize_session=False
+        )
+
+
+def release_blob(digest):
+    """Drop a reference; return True when the blob is no longer referenced."""
+    NoteBlob.query.filter_by(sha256=digest).update(
+        {NoteBlob.ref_count: NoteBlob.ref_count - 1}, synchronize_session=False
+    )
+    return NoteBlob.query.filter(NoteBlob.sha256 == digest, NoteBlob.ref_count <= 0).delete(
+        synchronize_session=False
+    ) > 0
+
+
+@bp.route('/upload_notes', methods=['GET', 'POST'])
 @admin_required
 def upload_notes():
     if request.method == 'POST':
@@ -133,32 +550,422 @@ def upload_notes():
 
         if not title or not file:
             flash("Please provide both a title and a file.", "danger")
-            return redirect(url_for('upload_notes'))
+            return redirect(url_for('main.upload_notes'))
+
+        # Stream into the content-addressed store; identical files share one blob.
+        filename = secure_filename(file.filename) or 'note'
+        # The blob stays locked until its reference is committed (see delete_note).
+        with blob_store.storing(file.stream) as (digest, size):
+            acquire_blob(digest, size)
+            new_note = Note(title=title, filename=filename, content_hash=digest, size=size,
+                            uploaded_by=g.user.id)
+            db.session.add(new_note)
+            db.session.commit()
+        index_note_in_background(new_note.id)
+
+        flash("✅ Note uploaded successfully!", "success")
+        return redirect(url_for('main.view_notes'))
+
+    return render_template('upload_notes.html')
+
+
+# ---------- Exam statistics ----------
+def locked_exam_stats(exam_id):
+    """The exam's stats row, locked for update (created if missing)."""
+    stats = db.session.execute(
+        db.select(ExamStats).where(ExamStats.exam_id == exam_id).with_for_update()
+    ).scalar_one_or_none()
+    if stats is not None:
+        return stats
+    try:
+        with db.session.begin_nested():
+            stats = ExamStats(exam_id=exam_id)
+            stats.reset()
+            db.session.add(stats)
+        return stats
+    except IntegrityError:
+        # Another submission created it first.
+        return db.session.execute(
+            db.select(ExamStats).where(ExamStats.exam_id == exam_id).with_for_update()
+        ).scalar_one()
+
+
+def record_score(exam_id, score):
+    """Fold a new result, already added to the session, into the exam's stats.
+
+    Runs inside the caller's transaction. An exam without a stats row yet
+    is rebuilt from its results, which include the new one once flushed.
+    """
+    record_scores(exam_id, [score])
+
+
+def record_scores(exam_id, scores):
+    """record_score() for a batch of new results, taking the stats row lock once."""
+    db.session.flush()
+    stats = db.session.execute(
+        db.select(ExamStats).where(ExamStats.exam_id == exam_id).with_for_update()
+    ).scalar_one_or_none()
+    if stats is None:
+        rebuild_exam_stats(exam_id)
+    else:
+        for score, times in Counter(scores).items():
+            stats.add(score, times)
+
+
+def score_counts_query(exam_id):
+    return (db.select(Result.score, db.func.count(Result.id))
+            .where(Result.exam_id == exam_id).group_by(Result.score))
+
+
+def rebuild_exam_stats(exam_id):
+    """Recompute an exam's stats from its Result rows (one GROUP BY query)."""
+    stats = locked_exam_stats(exam_id)
+    stats.reset()
+    rows = db.session.execute(score_counts_query(exam_id)).all()
+    for score, times in rows:
+        stats.add(score, times)
+    return stats
+
+
+def exam_stats(exam_id):
+    stats = db.session.get(ExamStats, exam_id)
+    if stats is None:
+        stats = rebuild_exam_stats(exam_id)
+        db.session.commit()
+    return stats
+
+
+def upsert(model):
+    """INSERT for the current dialect, with on_conflict_do_update/do_nothing."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+# ---------- Question sampling ----------
+def draw_questions(exam, user_id, bank):
+    seed = attempt_seed(current_app.config['SECRET_KEY'], exam.id, user_id)
+    return draw(bank, exam.sample_size, seed, stratified=exam.sample_by_tag)
+
+
+def served_question_ids(attempt):
+    """The stored choice of an attempt: its drawn ids, or None for the whole exam."""
+    return None if attempt.question_ids is None else unpack_ids(attempt.question_ids)
+
+
+def attempt_question_ids(exam, user_id):
+    """The questions user_id's attempt is served: drawn ids, or None for every question.
+
+    The first call stores the choice, so changing the exam's sampling later
+    does not change an attempt in progress. A draw cut short by a small bank
+    is drawn again once the bank has grown; an empty bank stores nothing.
+    Runs inside the caller's transaction.
+    """
+    attempt = db.session.get(ExamAttempt, (user_id, exam.id))
+    if attempt is not None:
+        question_ids = served_question_ids(attempt)
+        if question_ids is None or not exam.sample_size or len(question_ids) >= exam.sample_size:
+            return question_ids
+        bank = question_banks.get(exam.id, exam.questions_version)
+        if len(bank) > len(question_ids):
+            question_ids = draw_questions(exam, user_id, bank)
+            attempt.question_ids = pack_ids(question_ids)
+            attempt.drawn_at = datetime.utcnow()
+        return question_ids
+
+    if exam.sample_size:
+        bank = question_banks.get(exam.id, exam.questions_version)
+        if not len(bank):
+            return []
+        question_ids = draw_questions(exam, user_id, bank)
+        packed = pack_ids(question_ids)
+    else:
+        question_ids = packed = None
+    # The draw is deterministic, so a concurrent first request stores the same choice.
+    db.session.execute(upsert(ExamAttempt).on_conflict_do_nothing(), {
+        "user_id": user_id, "exam_id": exam.id, "question_ids": packed, "drawn_at": datetime.utcnow()
+    })
+    return question_ids
+
+
+def attempt_answer_keys(exams, attempts):
+    """Answer keys for (user_id, exam_id) attempts.
+
+    Each attempt is graded on what it was served (its stored ExamAttempt),
+    whatever the exam's sampling is now. Whole exams use the cached compiled
+    key; drawn attempts are keyed on their questions only, read for all of
+    them in one query.
+    """
+    stored = {(attempt.user_id, attempt.exam_id): attempt for attempt in db.session.scalars(
+        db.select(ExamAttempt).where(
+            ExamAttempt.exam_id.in_({exam_id for _, exam_id in attempts}),
+            ExamAttempt.user_id.in_({user_id for user_id, _ in attempts})
+        ))}
+
+    keys = {}
+    drawn = {}
+    for user_id, exam_id in attempts:
+        exam = exams[exam_id]
+        attempt = stored.get((user_id, exam_id))
+        if attempt is not None:
+            question_ids = served_question_ids(attempt)
+        else:
+            # Never opened (or opened before attempts were recorded).
+            question_ids = attempt_question_ids(exam, user_id)
+        if question_ids is None:
+            keys[(user_id, exam_id)] = answer_keys.get(exam.id, exam.questions_version)
+        else:
+            drawn[(user_id, exam_id)] = question_ids
+    if drawn:
+        rows = {row[0]: row for row in db.session.execute(answer_key_rows().where(
+            Question.id.in_({question_id for ids in drawn.values() for question_id in ids})
+        ))}
+        for attempt, question_ids in drawn.items():
+            keys[attempt] = compile_answer_key([rows[i] for i in question_ids if i in rows])
+    return keys
+
+
+def parse_sample_size(value):
+    """Form value -> (sample size or None for every question, error)."""
+    value = (value or '').strip()
+    if not value or value == '0':
+        return None, None
+    if not value.isdigit():
+        return None, "Sample size must be a whole number (leave empty to serve every question)."
+    return int(value), None
+
+
+# ---------- Exam autosave ----------
+AUTOSAVE_MAX_ANSWERS = 1000
+
+
+def write_drafts(app, entries):
+    """Store a batch of ((user_id, exam_id), answers, seq) in one transaction.
+
+    Only updates: start_attempt() creates the row when the exam is opened,
+    and discard_draft() deletes it on submission, so a save flushed late by
+    another worker cannot bring a submitted attempt back. A row also only
+    moves forward: a save with an older seq leaves the stored draft alone.
+    """
+    with app.app_context():
+        draft = ExamDraft.__table__
+        stmt = draft.update().where(
+            draft.c.user_id == db.bindparam('b_user_id'),
+            draft.c.exam_id == db.bindparam('b_exam_id'),
+            draft.c.seq < db.bindparam('b_seq'),
+        ).values(answers=db.bindparam('b_answers'), seq=db.bindparam('b_seq'), updated_at=datetime.utcnow())
+        db.session.execute(stmt, [
+            {"b_user_id": user_id, "b_exam_id": exam_id, "b_answers": answers, "b_seq": seq}
+            for (user_id, exam_id), answers, seq in entries
+        ])
+        db.session.commit()
+
+
+def saved_answers(user_id, exam_id):
+    """The newest autosaved answers for an attempt: pending in this worker, else stored."""
+    answers = autosave_buffer.get((user_id, exam_id))
+    if answers is not None:
+        return answers
+    draft = db.session.get(ExamDraft, (user_id, exam_id))
+    return draft.answers if draft else {}
 
-        # Save file securely
-        filename = secure_filename(file.filename)
-        upload_path = os.path.join('uploads', filename)
-        file.save(upload_path)
 
-        new_note = Note(title=title, filename=filename, uploaded_by=g.user.id)
-        db.session.add(new_note)
+def start_attempt(user_id, exam_id):
+    """When the student first opened the exam; the first call records now. Commit afterwards."""
+    now = datetime.utcnow()
+    db.session.execute(upsert(ExamDraft).values(
+        user_id=user_id, exam_id=exam_id, answers={}, seq=0, updated_at=now, started_at=now
+    ).on_conflict_do_nothing())
+    return db.session.execute(
+        db.select(ExamDraft.started_at).where(ExamDraft.user_id == user_id, ExamDraft.exam_id == exam_id)
+    ).scalar_one()
+
+
+def attempt_deadline(started_at, duration):
+    return started_at + timedelta(minutes=duration)
+
+
+def past_deadline(started_at, duration, at):
+    """True when at (naive UTC) is after the attempt's time limit plus EXAM_SUBMIT_GRACE."""
+    grace = timedelta(seconds=current_app.config['EXAM_SUBMIT_GRACE'])
+    return started_at is not None and at > attempt_deadline(started_at, duration) + grace
+
+
+def attempt_starts(pairs):
+    """{(user_id, exam_id): started_at} for the attempts in pairs that have been opened."""
+    if not pairs:
+        return {}
+    rows = db.session.execute(
+        db.select(ExamDraft.user_id, ExamDraft.exam_id, ExamDraft.started_at)
+        .where(db.tuple_(ExamDraft.user_id, ExamDraft.exam_id).in_(list(pairs)))
+    )
+    return {(user_id, exam_id): started_at for user_id, exam_id, started_at in rows}
+
+
+def discard_draft(user_id, exam_id):
+    autosave_buffer.discard((user_id, exam_id))
+    ExamDraft.query.filter_by(user_id=user_id, exam_id=exam_id).delete()
+
+
+# ---------- Submission pipeline ----------
+def grade_submissions(app, batch):
+    """Grade journaled submissions and insert their results in one transaction."""
+    with app.app_context():
+        exams = {exam.id: exam for exam in
+                 Exam.query.filter(Exam.id.in_({s.exam_id for s in batch}))}
+        pairs = {(s.user_id, s.exam_id) for s in batch if s.exam_id in exams}
+        keys = attempt_answer_keys(exams, pairs)
+        starts = attempt_starts(pairs)
+        outcomes = []
+        scores = {}
+        for submission in batch:
+            exam = exams.get(submission.exam_id)
+            if exam is None:
+                outcomes.append((submission.id, 'failed', None, None, "Exam no longer exists."))
+                continue
+            answer_key = keys[(submission.user_id, exam.id)]
+            answers = submission.answers
+            if past_deadline(starts.get((submission.user_id, exam.id)), exam.duration,
+                             datetime.utcfromtimestamp(submission.submitted_at)):
+                # Late: grade what was autosaved by the deadline (later autosaves are refused).
+                answers = saved_answers(submission.user_id, exam.id)
+            score, packed_answers = grade_and_pack(answer_key, answers)
+            try:
+                with db.session.begin_nested():
+                    result = Result(user_id=submission.user_id, exam_id=exam.id, score=score,
+                                    date_taken=datetime.fromtimestamp(submission.submitted_at))
+                    db.session.add(result)
+                    db.session.flush()
+                    db.session.add(ResultAnswers(result_id=result.id, exam_id=exam.id,
+                                                 answers=packed_answers))
+                    discard_draft(submission.user_id, exam.id)
+            except IntegrityError:
+                # The attempt already has a result (resubmitted, or regraded after a crash).
+                outcomes.append((submission.id, 'duplicate', None, None, None))
+                continue
+            scores.setdefault(exam.id, []).append(score)
+            outcomes.append((submission.id, 'graded', score, len(answer_key), None))
+
+        for exam_id, exam_scores in scores.items():
+            record_scores(exam_id, exam_scores)
         db.session.commit()
+        return outcomes
 
-        flash("✅ Note uploaded successfully!", "success")
-        return redirect(url_for('view_notes'))
 
-    return render_template('upload_notes.html')
 
+def finish_submission(submission):
+    """Flash the outcome of a graded submission; returns where to send the student."""
+    if submission.status == 'graded':
+        session['last_score'] = submission.score
+        session['last_total'] = submission.total
+        flash(f"✅ Exam submitted! You scored {submission.score} out of {submission.total}.", "success")
+        return url_for('main.result')
+    if submission.status == 'duplicate':
+        flash("⚠ You have already taken this exam. You cannot retake it.", "warning")
+    else:
+        flash(f"⚠ Your exam could not be graded: {submission.error}", "danger")
+    return url_for('main.exam_list')
+
+
+# ---------- Catalog caching ----------
+def catalog_version():
+    return db.session.execute(
+        db.select(CatalogVersion.version).where(CatalogVersion.id == 1)
+    ).scalar() or 0
+
+
+def bump_catalog_version():
+    """Call inside the write transaction of anything that changes the exam catalog."""
+    updated = CatalogVersion.query.filter_by(id=1).update(
+        {CatalogVersion.version: CatalogVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(CatalogVersion(id=1, version=1))
+
+
+
+def template_fingerprint(app, assets_version=""):
+    """Changes whenever a template file (or a static asset) changes, so deploys invalidate browser copies."""
+    digest = hashlib.sha1(assets_version.encode())
+    folder = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(folder)):
+        stat = os.stat(os.path.join(folder, name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def precompile_templates(app):
+    """Compile every template now rather than on its first render; returns {name: seconds}.
+
+    With a bytecode cache, later boots (and the other workers) load the
+    compiled code instead of compiling again.
+    """
+    timings = {}
+    for name in app.jinja_env.list_templates():
+        started = time.perf_counter()
+        app.jinja_env.get_template(name)
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def start_template_timer(sender, template, context, **extra):
+    # A stack, because templates can be rendered while rendering another one.
+    g.setdefault('template_timers', []).append(time.perf_counter())
+
+
+def record_template_render(sender, template, context, **extra):
+    TEMPLATE_RENDER.observe(time.perf_counter() - g.template_timers.pop(), template.name or "<string>")
+
+
+
+def revalidated_page(etag_parts, render):
+    """Render a page with an ETag built from etag_parts, or answer 304 without rendering.
+
+    Pages that still have flash messages to show are never cached.
+    """
+    if session.get('_flashes'):
+        response = make_response(render())
+        response.cache_control.no_store = True
+        return response
+
+    etag = hashlib.sha1(repr((current_app.extensions['smartelearning']['template_fingerprint'],) + tuple(etag_parts)).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    # Per-user pages: only the browser may keep them, and it must revalidate.
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def user_etag_parts():
+    if not g.user:
+        return (None,)
+    return (g.user.id, g.user.fullname, g.user.is_admin)
+
+
+def build_exam_cards():
+    """Render every exam card in both its taken and not-taken form."""
+    exams = Exam.query.order_by(Exam.id).all()
+    return [
+        (exam.id,
+         render_template('_exam_card.html', exam=exam, taken=False),
+         render_template('_exam_card.html', exam=exam, taken=True))
+        for exam in exams
+    ]
 
 
 # ---------- Routes ----------
-@app.route('/')
+@bp.route('/')
 def home():
-    exams = Exam.query.all()
-    return render_template('index.html', exams=exams)
+    return revalidated_page(user_etag_parts(), lambda: render_template('index.html'))
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         fullname = request.form.get('fullname', '').strip()
@@ -168,22 +975,22 @@ def register():
 
         if not fullname or not email or not password or not confirm_password:
           flash("Please fill out all fields.", "danger")
-          return redirect(url_for('register'))
+          return redirect(url_for('main.register'))
 
         if password != confirm_password:
             flash("❌ Passwords does not match. Please try again.", "danger")
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
          # 🔹 NEW CHECK: Prevent registration with the same name (case-sensitive)
         existing_name = User.query.filter_by(fullname=fullname).first()
         if existing_name:
             flash("⚠ A user with this name already exists. Please use a different name.", "warning")
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
         existing = User.query.filter_by(email=email).first()
         if existing:
             flash("An account with that email already exists. Please log in.", "warning")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
 
         user = User(fullname=fullname, email=email)
         user.set_password(password)
@@ -194,16 +1001,16 @@ def register():
         except Exception as e:
             db.session.rollback()
             flash("Email already registered. Please log in instead.", "warning")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
 
 
         flash("Registration successful. Please log in.", "success")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     return render_template('register.html')
 
 
-@app.route('/login', methods=['GET','POST'])
+@bp.route('/login', methods=['GET','POST'])
 def login():
     if request.method == 'POST':
         email = request.form.get('email', '').strip().lower()
@@ -213,47 +1020,251 @@ def login():
         if user and user.check_password(password):
             session.clear()
             session['user_id'] = user.id
+            identities.put(identity_from_user(user))
             flash(f"Welcome, {user.fullname}!", "success")
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
         else:
             flash("Invalid email or password.", "danger")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
 
     return render_template('login.html')
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash("You have been logged out.", "info")
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
 
-@app.route('/exam')
+@bp.route('/exam')
 @login_required
 def exam():
-    exams = Exam.query.all()
-    if exams:
-        return redirect(url_for('take_exam', exam_id=exams[0].id))
+    first_exam_id = catalog_fragments.get_or_build(
+        catalog_version(), 'first_exam_id',
+        lambda: db.session.execute(db.select(db.func.min(Exam.id))).scalar()
+    )
+    if first_exam_id is not None:
+        return redirect(url_for('main.take_exam', exam_id=first_exam_id))
     flash("No exams available yet.", "info")
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
 
-@app.route('/exam_list')
+@bp.route('/exam_list')
 @login_required
 def exam_list():
-    exams = Exam.query.all()
-    taken_exam_ids = [r.exam_id for r in Result.query.filter_by(user_id=g.user.id).all()]
-    return render_template('exam_list.html', exams=exams, taken_exam_ids=taken_exam_ids)
+    version = catalog_version()
+    taken_exam_ids = set(db.session.execute(
+        db.select(Result.exam_id).where(Result.user_id == g.user.id)
+    ).scalars())
+
+    def render():
+        # The cards are cached per catalog version; only the per-user
+        # "taken" choice between the two cached variants happens per request.
+        cards = catalog_fragments.get_or_build(
+            version, ('exam_cards', g.user.is_admin), build_exam_cards
+        )
+        exam_cards = Markup(''.join(
+            taken_html if exam_id in taken_exam_ids else open_html
+            for exam_id, open_html, taken_html in cards
+        ))
+        return render_template('exam_list.html', exam_cards=exam_cards)
+
+    return revalidated_page(
+        user_etag_parts() + (version, tuple(sorted(taken_exam_ids))), render
+    )
 
 
-@app.route('/chat')
+@bp.route('/chat')
 @login_required
 def chat():
     return render_template('chat.html')
 
 
-@app.route('/chatbot', methods=['POST'])
+def note_context(user_input):
+    """Excerpts of the course notes most similar to the question, within SMARTBOT_CONTEXT_TOKENS."""
+    budget = current_app.config['SMARTBOT_CONTEXT_TOKENS']
+    if budget <= 0:
+        return ""
+    started = time.perf_counter()
+    try:
+        return note_vectors.context(user_input, budget, k=current_app.config['SMARTBOT_CONTEXT_CHUNKS'],
+                                    min_score=current_app.config['SMARTBOT_CONTEXT_MIN_SCORE'])
+    except Exception:
+        current_app.logger.exception("Note retrieval failed")
+        return ""
+    finally:
+        RETRIEVAL_LATENCY.observe(time.perf_counter() - started)
+
+
+def smartbot_system_prompt(user_input):
+    context = note_context(user_input)
+    if not context:
+        return SMARTBOT_SYSTEM_PROMPT
+    return f"{SMARTBOT_SYSTEM_PROMPT}\n\n{SMARTBOT_CONTEXT_INTRO}\n\n{context}"
+
+
+def smartbot_messages(user_input, system):
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user_input}
+    ]
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+def smartbot_cache_key(user_input, system):
+    # The system prompt carries the retrieved notes, so edited notes get fresh replies.
+    return make_cache_key(
+        user_input,
+        SMARTBOT_MODEL,
+        system=system,
+        max_tokens=SMARTBOT_MAX_TOKENS,
+        temperature=SMARTBOT_TEMPERATURE
+    )
+
+
+def record_openai_usage(usage):
+    if usage is not None:
+        OPENAI_TOKENS.inc(SMARTBOT_MODEL, "prompt", amount=usage.prompt_tokens)
+        OPENAI_TOKENS.inc(SMARTBOT_MODEL, "completion", amount=usage.completion_tokens)
+
+
+def fetch_smartbot_reply(user_input, system):
+    started = time.perf_counter()
+    try:
+        reply, usage = smartbot_backend.complete(
+            smartbot_messages(user_input, system),
+            model=SMARTBOT_MODEL,
+            max_tokens=SMARTBOT_MAX_TOKENS,
+            temperature=SMARTBOT_TEMPERATURE
+        )
+    except Exception:
+        OPENAI_LATENCY.observe(time.perf_counter() - started, SMARTBOT_MODEL, "error")
+        raise
+    OPENAI_LATENCY.observe(time.perf_counter() - started, SMARTBOT_MODEL, "ok")
+    record_openai_usage(usage)
+    return reply
+
+
+def admit_smartbot_call():
+    """A Ticket for one upstream call by the current user; raises SmartBotBusy."""
+    if not smartbot_admission:
+        return Ticket(None, None)
+    try:
+        return smartbot_admission.admit(g.user.id)
+    except SmartBotBusy as busy:
+        SMARTBOT_REFUSED.inc(busy.reason)
+        raise
+
+
+def upstream_busy(error):
+    """SmartBotBusy for an upstream 429, closing admission in every worker meanwhile."""
+    if smartbot_admission:
+        smartbot_admission.backoff(error.retry_after)
+    SMARTBOT_REFUSED.inc("upstream")
+    return SmartBotBusy("upstream", max(1, math.ceil(error.retry_after)))
+
+
+def busy_reply(busy):
+    template = SMARTBOT_RATE_LIMITED_REPLY if busy.reason == "user" else SMARTBOT_BUSY_REPLY
+    return template.format(retry_after=busy.retry_after)
+
+
+def busy_response(busy):
+    response = jsonify({"reply": busy_reply(busy), "busy": True, "retry_after": busy.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(busy.retry_after)
+    return response
+
+
+def cached_reply_frames(reply):
+    yield sse_event({"delta": reply})
+    yield sse_event({"cached": True}, event="done")
+
+
+def stream_smartbot_reply(user_input, system, cache_key, ticket, pending=None):
+    """Yield SSE frames carrying completion deltas as they arrive from OpenAI.
+
+    Releases the admission ticket once the upstream call is over, and
+    hands the reply (or the failure) to the requests waiting on pending.
+    """
+    parts = []
+    started = time.perf_counter()
+    outcome = "disconnected"
+    reply = error = None
+    try:
+        stream = smartbot_backend.stream(
+            smartbot_messages(user_input, system),
+            model=SMARTBOT_MODEL,
+            max_tokens=SMARTBOT_MAX_TOKENS,
+            temperature=SMARTBOT_TEMPERATURE
+        )
+        for delta, usage in stream:
+            record_openai_usage(usage)
+            if delta:
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        outcome = "ok"
+    except UpstreamRateLimited as e:
+        outcome = "rate_limited"
+        error = upstream_busy(e)
+        yield sse_event({"error": busy_reply(error), "retry_after": error.retry_after}, event="error")
+    except Exception as e:
+        outcome = "error"
+        error = e
+        current_app.logger.warning("OpenAI API error: %s", e)
+        yield sse_event({"error": SMARTBOT_ERROR_REPLY}, event="error")
+    else:
+        if parts:
+            reply = "".join(parts).strip()
+    finally:
+        ticket.release()
+        OPENAI_LATENCY.observe(time.perf_counter() - started, SMARTBOT_MODEL, outcome)
+        # A leader that disconnected shares nothing; its waiters make their own call.
+        if pending is not None:
+            smartbot_cache.finish(cache_key, pending, reply, error)
+        elif smartbot_cache and reply:
+            smartbot_cache.set(cache_key, reply)
+    yield sse_event({}, event="done")
+
+
+def coalesced_reply_frames(user_input, system, cache_key, pending):
+    """Frames for a request whose identical question another request is already asking:
+    its reply once it is complete, or a call of our own if it produced none."""
+    try:
+        reply = smartbot_cache.wait(pending)
+    except SmartBotBusy as busy:
+        yield sse_event({"error": busy_reply(busy), "retry_after": busy.retry_after}, event="error")
+        yield sse_event({}, event="done")
+        return
+    except Exception:
+        yield sse_event({"error": SMARTBOT_ERROR_REPLY}, event="error")
+        yield sse_event({}, event="done")
+        return
+    if reply is not None:
+        yield from cached_reply_frames(reply)
+        return
+    try:
+        ticket = admit_smartbot_call()
+    except SmartBotBusy as busy:
+        yield sse_event({"error": busy_reply(busy), "retry_after": busy.retry_after}, event="error")
+        yield sse_event({}, event="done")
+        return
+    yield from stream_smartbot_reply(user_input, system, cache_key, ticket)
+
+
+def wants_stream():
+    if request.json.get('stream'):
+        return True
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+
+@bp.route('/chatbot', methods=['POST'])
 @login_required
 def chatbot():
     user_input = request.json.get('message', '').strip()
@@ -261,25 +1272,127 @@ def chatbot():
     if not user_input:
         return jsonify({"reply": "Please type a message."})
 
+    system = smartbot_system_prompt(user_input)
+    cache_key = smartbot_cache_key(user_input, system)
+    if wants_stream():
+        cached = smartbot_cache.get(cache_key) if smartbot_cache else None
+        ticket = pending = None
+        if cached is not None:
+            frames = cached_reply_frames(cached)
+        else:
+            leader = True
+            if smartbot_cache:
+                # Concurrent identical questions share one upstream call.
+                pending, leader = smartbot_cache.begin(cache_key)
+            if not leader:
+                frames = coalesced_reply_frames(user_input, system, cache_key, pending)
+                pending = None
+            else:
+                # Refuse before the stream starts, so the client gets a plain 429.
+                try:
+                    ticket = admit_smartbot_call()
+                except SmartBotBusy as busy:
+                    if pending is not None:
+                        smartbot_cache.finish(cache_key, pending, error=busy)
+                    return busy_response(busy)
+                frames = stream_smartbot_reply(user_input, system, cache_key, ticket, pending)
+        response = Response(stream_with_context(frames), mimetype='text/event-stream')
+        if ticket is not None:
+            # The generator releases it; this covers a client gone before the first frame.
+            response.call_on_close(ticket.release)
+        if pending is not None:
+            # Likewise, so waiters are not left waiting for a stream that never ran.
+            response.call_on_close(partial(smartbot_cache.finish, cache_key, pending))
+        # Stop proxies (nginx on Render) from buffering the stream.
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    def admitted_fetch():
+        with admit_smartbot_call():
+            try:
+                return fetch_smartbot_reply(user_input, system)
+            except UpstreamRateLimited as e:
+                raise upstream_busy(e) from e
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are SmartBot, a helpful AI tutor for Smart E-Learning."},
-                {"role": "user", "content": user_input}
-            ],
-            max_tokens=250,
-            temperature=0.7
-        )
-        bot_reply = response.choices[0].message.content.strip()
+        if not smartbot_cache:
+            bot_reply = admitted_fetch()
+        else:
+            # Concurrent identical questions share one upstream call.
+            bot_reply = smartbot_cache.get_or_compute(cache_key, admitted_fetch)
         return jsonify({"reply": bot_reply})
+    except SmartBotBusy as busy:
+        return busy_response(busy)
     except Exception as e:
-        print("OpenAI API Error:", e)
-        return jsonify({"reply": "⚠ Sorry, I'm having trouble connecting to SmartBot."})
+        current_app.logger.warning("OpenAI API error: %s", e)
+        return jsonify({"reply": SMARTBOT_ERROR_REPLY})
+
+
+# ---------- Admin: SmartBot cache stats ----------
+@bp.route('/chatbot/cache_stats')
+@admin_required
+def chatbot_cache_stats():
+    if not smartbot_cache:
+        return jsonify({"enabled": False})
+    stats = smartbot_cache.stats()
+    stats["enabled"] = True
+    stats["worker_pid"] = os.getpid()
+    return jsonify(stats)
+
+
+@bp.route('/chatbot/admission_stats')
+@admin_required
+def chatbot_admission_stats():
+    if not smartbot_admission:
+        return jsonify({"enabled": False})
+    stats = smartbot_admission.stats()
+    stats["enabled"] = True
+    stats["worker_pid"] = os.getpid()
+    return jsonify(stats)
+
+
+@bp.route('/chatbot/note_vectors_stats')
+@admin_required
+def note_vectors_stats():
+    return jsonify(note_vectors.stats())
+
+
+# ---------- Admin: Identity cache stats ----------
+@bp.route('/identity_cache_stats')
+@admin_required
+def identity_cache_stats():
+    stats = identities.stats()
+    stats["worker_pid"] = os.getpid()
+    return jsonify(stats)
+
+
+@bp.route('/template_stats')
+@admin_required
+def template_stats():
+    """This worker's render count and time per template, and its boot-time compile times."""
+    compile_times = current_app.extensions['smartelearning']['template_compile_times']
+    with metrics_registry.lock:
+        series = {labels[0]: list(values) for labels, values in TEMPLATE_RENDER.values.items()}
+    templates = {}
+    for name in sorted(set(compile_times) | set(series)):
+        values = series.get(name)
+        renders = sum(values[:-1]) if values else 0
+        templates[name] = {
+            "compile_ms": round(compile_times[name] * 1000, 2) if name in compile_times else None,
+            "renders": renders,
+            "avg_render_ms": round(values[-1] / renders * 1000, 2) if renders else None,
+        }
+    return jsonify({
+        "auto_reload": current_app.jinja_env.auto_reload,
+        "bytecode_cache": current_app.jinja_env.bytecode_cache is not None,
+        "templates": templates,
+        "worker_pid": os.getpid(),
+    })
 
 
 # ---------- Admin: Add Exam ----------
-@app.route('/add_exam', methods=['GET', 'POST'])
+@bp.route('/add_exam', methods=['GET', 'POST'])
 @admin_required
 def add_exam():
     if request.method == 'POST':
@@ -289,22 +1402,31 @@ def add_exam():
         
         if not title or not duration:
             flash("Exam title and duration are required.", "danger")
-            return redirect(url_for('add_exam'))
+            return redirect(url_for('main.add_exam'))
         
         duration = int(duration)        
-        
+        sample_size, error = parse_sample_size(request.form.get('sample_size'))
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('main.add_exam'))
 
-        new_exam = Exam(title=title, description=desc, duration=duration)
+        new_exam = Exam(title=title, description=desc, duration=duration, sample_size=sample_size,
+                        sample_by_tag=bool(request.form.get('sample_by_tag')))
         db.session.add(new_exam)
+        db.session.flush()
+        empty_stats = ExamStats(exam_id=new_exam.id)
+        empty_stats.reset()
+        db.session.add(empty_stats)
+        bump_catalog_version()
         db.session.commit()
         flash("Exam added successfully! Now add questions.", "success")
-        return redirect(url_for('add_question', exam_id=new_exam.id))
+        return redirect(url_for('main.add_question', exam_id=new_exam.id))
 
     return render_template('add_exam.html')
 
 
 # ---------- Admin: Add Questions ----------
-@app.route('/add_question/<int:exam_id>', methods=['GET', 'POST'])
+@bp.route('/add_question/<int:exam_id>', methods=['GET', 'POST'])
 @admin_required
 def add_question(exam_id):
     exam = Exam.query.get_or_404(exam_id)
@@ -316,11 +1438,12 @@ def add_question(exam_id):
         option3 = request.form['option3'].strip()
         option4 = request.form['option4'].strip()
         correct_option = request.form['correct_option'].strip()
+        tag = request.form.get('tag', '').strip()[:50] or None
 
         options = [option1, option2, option3, option4]
         if correct_option not in options:
             flash("❌ Correct Option must exactly match one of the four options.", "danger")
-            return redirect(url_for('add_question', exam_id=exam.id))
+            return redirect(url_for('main.add_question', exam_id=exam.id))
 
         new_question = Question(
             exam_id=exam.id,
@@ -329,46 +1452,164 @@ def add_question(exam_id):
             option2=option2,
             option3=option3,
             option4=option4,
-            correct_option=correct_option
+            correct_option=correct_option,
+            tag=tag
         )
         db.session.add(new_question)
+        exam.bump_questions_version()
+        bump_catalog_version()
         db.session.commit()
+        answer_keys.invalidate(exam.id)
+        question_banks.invalidate(exam.id)
 
         flash("✅ Question added successfully!", "success")
-        return redirect(url_for('add_question', exam_id=exam.id))
+        return redirect(url_for('main.add_question', exam_id=exam.id))
 
-    return render_template('add_question.html', exam=exam)
+    bank = question_banks.get(exam.id, exam.questions_version)
+    return render_template('add_question.html', exam=exam, bank_size=len(bank),
+                           bank_tags=sorted(tag for tag in bank.strata if tag))
 
 
-@app.route('/delete_exam/<int:exam_id>', methods=['POST'])
+@bp.route('/exam_sampling/<int:exam_id>', methods=['POST'])
+@admin_required
+def exam_sampling(exam_id):
+    exam = Exam.query.get_or_404(exam_id)
+    sample_size, error = parse_sample_size(request.form.get('sample_size'))
+    if error:
+        flash(f"❌ {error}", "danger")
+        return redirect(url_for('main.add_question', exam_id=exam.id))
+
+    # Attempts already opened keep the questions they were served.
+    exam.sample_size = sample_size
+    exam.sample_by_tag = bool(request.form.get('sample_by_tag'))
+    db.session.commit()
+    if sample_size:
+        flash(f"✅ Each attempt now gets {sample_size} questions drawn from the bank.", "success")
+    else:
+        flash("✅ Each attempt now gets every question.", "success")
+    return redirect(url_for('main.add_question', exam_id=exam.id))
+
+
+# ---------- Admin: Bulk Import Questions ----------
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+
+def import_questions(exam, rows, batch_size=IMPORT_BATCH_SIZE):
+    """Validate rows and insert the valid ones in executemany batches, in one transaction.
+
+    Returns a report with the number imported and a per-row error list
+    (row numbers are 1-based, not counting a CSV header).
+    """
+    report = {"imported": 0, "failed": 0, "errors": []}
+    batch = []
+    insert = Question.__table__.insert()
+
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            values, error = validate_question(row)
+            if error:
+                report["failed"] += 1
+                if len(report["errors"]) < IMPORT_MAX_ERRORS:
+                    report["errors"].append({"row": row_number, "error": error})
+                continue
+            values["exam_id"] = exam.id
+            batch.append(values)
+            if len(batch) >= batch_size:
+                db.session.execute(insert, batch)
+                report["imported"] += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(insert, batch)
+            report["imported"] += len(batch)
+    except ImportFormatError:
+        db.session.rollback()
+        raise
+
+    if report["imported"]:
+        exam.bump_questions_version()
+        bump_catalog_version()
+    db.session.commit()
+    answer_keys.invalidate(exam.id)
+    question_banks.invalidate(exam.id)
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
+
+
+@bp.route('/import_questions/<int:exam_id>', methods=['POST'])
+@admin_required
+def import_questions_upload(exam_id):
+    exam = Exam.query.get_or_404(exam_id)
+    file = request.files.get('file')
+    wants_json = request.accept_mimetypes.best == 'application/json'
+
+    try:
+        if not file or not file.filename:
+            raise ImportFormatError("Please choose a CSV or JSON file to import.")
+        fmt = detect_format(file.filename, request.form.get('format'))
+        report = import_questions(exam, iter_rows(file.stream, fmt))
+    except ImportFormatError as e:
+        if wants_json:
+            return jsonify({"imported": 0, "error": str(e)}), 400
+        flash(f"❌ {e}", "danger")
+        return redirect(url_for('main.add_question', exam_id=exam.id))
+
+    if wants_json:
+        return jsonify(report)
+
+    flash(f"✅ Imported {report['imported']} questions.", "success")
+    if report["failed"]:
+        shown = "; ".join(f"row {e['row']}: {e['error']}" for e in report["errors"][:5])
+        more = f" (and {report['failed'] - 5} more)" if report["failed"] > 5 else ""
+        flash(f"⚠ Skipped {report['failed']} invalid rows — {shown}{more}", "warning")
+    return redirect(url_for('main.add_question', exam_id=exam.id))
+
+
+@bp.route('/delete_exam/<int:exam_id>', methods=['POST'])
 @admin_required
 def delete_exam(exam_id):
     exam = Exam.query.get_or_404(exam_id)
     Question.query.filter_by(exam_id=exam.id).delete()
+    ResultAnswers.query.filter_by(exam_id=exam.id).delete()
     Result.query.filter_by(exam_id=exam.id).delete()
+    ExamDraft.query.filter_by(exam_id=exam.id).delete()
+    ExamAttempt.query.filter_by(exam_id=exam.id).delete()
+    ExamStats.query.filter_by(exam_id=exam.id).delete()
     db.session.delete(exam)
+    bump_catalog_version()
     db.session.commit()
+    answer_keys.invalidate(exam.id)
+    question_banks.invalidate(exam.id)
     flash(f"Exam '{exam.title}' deleted successfully.", "success")
-    return redirect(url_for('exam_list'))
+    return redirect(url_for('main.exam_list'))
 
 
-@app.route('/take_exam/<int:exam_id>', methods=['GET', 'POST'])
+@bp.route('/take_exam/<int:exam_id>', methods=['GET', 'POST'])
 @login_required
 def take_exam(exam_id):
+    if request.method == 'POST' and current_app.config['SUBMISSION_MODE'] == 'queue':
+        # Journal and acknowledge; duplicates and unknown exams are settled by the grader.
+        submission_id = submission_journal.append(g.user.id, exam_id, request.form.to_dict())
+        submission_worker.wake()
+        return redirect(url_for('main.submission_status', submission_id=submission_id), code=303)
+
     exam = Exam.query.get_or_404(exam_id)
-    questions = Question.query.filter_by(exam_id=exam.id).all()
 
     existing_result = Result.query.filter_by(user_id=g.user.id, exam_id=exam.id).first()
     if existing_result:
         flash("⚠ You have already taken this exam. You cannot retake it.", "warning")
-        return redirect(url_for('exam_list'))
+        return redirect(url_for('main.exam_list'))
 
     if request.method == 'POST':
-        score = 0
-        for q in questions:
-            selected = request.form.get(str(q.id))
-            if selected and selected.strip().lower() == q.correct_option.strip().lower():
-                score += 1
+        answer_key = attempt_answer_keys({exam.id: exam}, [(g.user.id, exam.id)])[(g.user.id, exam.id)]
+        answers = request.form
+        late = past_deadline(attempt_starts([(g.user.id, exam.id)]).get((g.user.id, exam.id)),
+                             exam.duration, datetime.utcnow())
+        if late:
+            # Grade what was autosaved by the deadline (later autosaves are refused).
+            answers = saved_answers(g.user.id, exam.id)
+        score, packed_answers = grade_and_pack(answer_key, answers)
+        total = len(answer_key)
 
         result = Result(
             user_id=g.user.id,
@@ -377,17 +1618,102 @@ def take_exam(exam_id):
             date_taken=datetime.now()
         )
         db.session.add(result)
-        db.session.commit()
+        try:
+            record_score(exam.id, score)
+            db.session.add(ResultAnswers(result_id=result.id, exam_id=exam.id, answers=packed_answers))
+            discard_draft(g.user.id, exam.id)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submission for the same attempt won the race.
+            db.session.rollback()
+            flash("⚠ You have already taken this exam. You cannot retake it.", "warning")
+            return redirect(url_for('main.exam_list'))
 
         session['last_score'] = score
-        session['last_total'] = len(questions)
-        flash(f"✅ Exam submitted! You scored {score} out of {len(questions)}.", "success")
-        return redirect(url_for('result'))
+        session['last_total'] = total
+        if late:
+            flash("⚠ The time limit had passed; your answers saved before it ran out were graded.", "warning")
+        flash(f"✅ Exam submitted! You scored {score} out of {total}.", "success")
+        return redirect(url_for('main.result'))
+
+    # The clock runs from the first opening; reloading the page does not restart it.
+    started_at = start_attempt(g.user.id, exam.id)
+    question_ids = attempt_question_ids(exam, g.user.id)
+    db.session.commit()
+    if question_ids is not None:
+        by_id = {q.id: q for q in Question.query.filter(Question.id.in_(question_ids))}
+        questions = [by_id[i] for i in question_ids if i in by_id]
+    else:
+        questions = Question.query.filter_by(exam_id=exam.id).all()
+    remaining = attempt_deadline(started_at, exam.duration) - datetime.utcnow()
+    return render_template('exam.html', exam=exam, questions=questions,
+                           saved_answers=saved_answers(g.user.id, exam.id),
+                           remaining_seconds=max(0, int(remaining.total_seconds())))
+
+
+def own_submission(submission_id):
+    submission = submission_journal.get(submission_id)
+    if submission is None or submission.user_id != g.user.id:
+        abort(404)
+    return submission
+
+
+@bp.route('/submission/<int:submission_id>')
+@login_required
+def submission_status(submission_id):
+    submission = own_submission(submission_id)
+    if submission.status in FINISHED:
+        return redirect(finish_submission(submission))
+    submission_worker.start()
+    return render_template('submission_status.html', submission=submission)
+
+
+@bp.route('/api/submission/<int:submission_id>')
+@login_required
+def submission_status_api(submission_id):
+    submission = own_submission(submission_id)
+    if submission.status not in FINISHED:
+        submission_worker.start()
+        return jsonify({"status": submission.status})
+    return jsonify({"status": submission.status, "redirect": finish_submission(submission)})
 
-    return render_template('exam.html', exam=exam, questions=questions)
 
+@bp.route('/autosave/<int:exam_id>', methods=['POST'])
+@login_required
+def autosave(exam_id):
+    """Buffer the attempt's current answers; the write-behind flusher persists them."""
+    # force=True: navigator.sendBeacon posts may arrive without a JSON content type.
+    payload = request.get_json(force=True, silent=True) or {}
+    answers = payload.get('answers')
+    seq = payload.get('seq')
+    if (not isinstance(answers, dict) or len(answers) > AUTOSAVE_MAX_ANSWERS
+            or not isinstance(seq, int) or isinstance(seq, bool)
+            or not all(isinstance(k, str) and isinstance(v, str) and len(v) <= 200
+                       for k, v in answers.items())):
+        return jsonify({"error": "Expected {answers: {question_id: option}, seq: int}."}), 400
+
+    attempt = db.session.execute(
+        db.select(ExamDraft.started_at, Exam.duration).join(Exam, Exam.id == ExamDraft.exam_id)
+        .where(ExamDraft.user_id == g.user.id, ExamDraft.exam_id == exam_id)
+    ).first()
+    if attempt is None:
+        # Not opened, or already submitted.
+        return jsonify({"error": "No attempt in progress."}), 409
+    if past_deadline(attempt.started_at, attempt.duration, datetime.utcnow()):
+        # Answers saved by the deadline are what a late submission is graded on.
+        return jsonify({"error": "The time limit has passed."}), 409
+
+    autosave_buffer.put((g.user.id, exam_id), answers, seq)
+    return jsonify({"saved": True, "seq": seq}), 202
+
+
+@bp.route('/autosave_stats')
+@admin_required
+def autosave_stats():
+    return jsonify(autosave_buffer.stats())
 
-@app.route('/result')
+
+@bp.route('/result')
 @login_required
 def result():
     score = session.get('last_score', None)
@@ -395,24 +1721,163 @@ def result():
 
 
 # ---------- Admin: View Exam Participants ----------
-@app.route('/exam_participants/<int:exam_id>')
+PARTICIPANTS_PAGE_SIZE = 50
+PARTICIPANTS_MAX_PAGE_SIZE = 500
+
+
+def exam_score_aggregates(exam_id):
+    """Count, average, min and max score for an exam, read from its stats row."""
+    stats = exam_stats(exam_id).to_dict()
+    return {key: stats[key] for key in ("count", "avg", "min", "max")}
+
+
+@bp.route('/api/item_analysis/<int:exam_id>')
+@admin_required
+def item_analysis_api(exam_id):
+    """Per-question difficulty, discrimination and distractor counts for an exam."""
+    import item_analysis  # NumPy is only needed by this report
+
+    exam = Exam.query.get_or_404(exam_id)
+    started = time.perf_counter()
+    packed = db.session.execute(
+        db.select(ResultAnswers.answers).where(ResultAnswers.exam_id == exam.id)
+    ).scalars().all()
+    analysis = item_analysis.analyze(packed)
+    questions = {q.id: q for q in Question.query.filter_by(exam_id=exam.id)}
+    payload = item_analysis.report(analysis, questions)
+    payload["exam_id"] = exam.id
+    payload["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(payload)
+
+
+@bp.route('/api/exam_stats/<int:exam_id>')
+@admin_required
+def exam_stats_api(exam_id):
+    exam = Exam.query.get_or_404(exam_id)
+    stats = exam_stats(exam.id).to_dict()
+    stats["exam_id"] = exam.id
+    return jsonify(stats)
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+@bp.route('/exam_participants/<int:exam_id>')
 @admin_required
 def exam_participants(exam_id):
     exam = Exam.query.get_or_404(exam_id)
-    results = db.session.query(Result, User).join(User, Result.user_id == User.id).filter(Result.exam_id == exam.id).all()
-    total_participants = len(results)
-    avg_score = round(sum(r[0].score for r in results) / total_participants, 2) if total_participants else 0
+    stats = exam_score_aggregates(exam.id)
+    # Rows are loaded lazily from participants_api as the admin scrolls.
     return render_template(
         'exam_participants.html',
         exam=exam,
-        results=results,
-        total_participants=total_participants,
-        avg_score=avg_score
+        total_participants=stats["count"],
+        avg_score=stats["avg"],
+        stats=stats,
+        page_size=PARTICIPANTS_PAGE_SIZE
     )
 
 
+def participants_query(exam_id, search='', sort='name', after=None):
+    """An exam's results joined to their users, in page order after the (key, id) cursor."""
+    query = db.session.query(
+        Result.id, Result.score, Result.date_taken, User.fullname, User.email
+    ).join(User, Result.user_id == User.id).filter(Result.exam_id == exam_id)
+    if search:
+        query = query.filter(User.fullname.ilike(f"%{escape_like(search)}%", escape='\\'))
+
+    if after:
+        last_key, last_id = after
+        if sort == 'name':
+            query = query.filter(db.or_(
+                User.fullname > last_key,
+                db.and_(User.fullname == last_key, Result.id > last_id)
+            ))
+        else:
+            query = query.filter(db.or_(
+                Result.score < last_key,
+                db.and_(Result.score == last_key, Result.id < last_id)
+            ))
+
+    if sort == 'name':
+        return query.order_by(User.fullname.asc(), Result.id.asc())
+    # (score desc, id desc) walks ix_result_exam_id_score backwards with no sort step.
+    return query.order_by(Result.score.desc(), Result.id.desc())
+
+
+@bp.route('/api/exam_participants/<int:exam_id>')
+@admin_required
+def participants_api(exam_id):
+    """One keyset-paginated page of participants, searchable by name and sortable by name or score."""
+    exam = Exam.query.get_or_404(exam_id)
+    search = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'name')
+    if sort not in ('name', 'score'):
+        return jsonify({"error": "sort must be 'name' or 'score'"}), 400
+    limit = request.args.get('limit', PARTICIPANTS_PAGE_SIZE, type=int) or PARTICIPANTS_PAGE_SIZE
+    # A negative LIMIT is "no limit" to SQLite and an error to Postgres.
+    limit = max(1, min(limit, PARTICIPANTS_MAX_PAGE_SIZE))
+
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        after = decode_cursor(cursor)
+        if not isinstance(after, list) or len(after) != 2:
+            return jsonify({"error": "invalid cursor"}), 400
+        last_key, last_id = after
+        # The key must match the sort (a name cursor reused with sort=score would
+        # compare an integer column with a string, which Postgres rejects).
+        key_type = str if sort == 'name' else int
+        if not (type(last_key) is key_type and type(last_id) is int):
+            return jsonify({"error": "invalid cursor"}), 400
+
+    query = participants_query(exam.id, search=search, sort=sort, after=after)
+    # Fetch one extra row to know whether another page exists.
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last_row = rows[-1]
+        next_cursor = encode_cursor([
+            last_row.fullname if sort == 'name' else last_row.score,
+            last_row.id
+        ])
+
+    payload = {
+        "participants": [
+            {
+                "id": row.id,
+                "fullname": row.fullname,
+                "email": row.email,
+                "score": row.score,
+                "date_taken": row.date_taken.strftime('%Y-%m-%d %H:%M:%S') if row.date_taken else 'N/A'
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    }
+    # Aggregates only need to travel with the first page.
+    if not cursor:
+        payload["stats"] = exam_score_aggregates(exam.id)
+    return jsonify(payload)
+
+
 # ---------- Admin: Delete All Participants ----------
-@app.route('/delete_participants/<int:exam_id>', methods=['POST'])
+@bp.route('/delete_participants/<int:exam_id>', methods=['POST'])
 @admin_required
 def delete_participants(exam_id):
     exam = Exam.query.get_or_404(exam_id)
@@ -420,25 +1885,101 @@ def delete_participants(exam_id):
 
     if not results:
         flash("⚠ No participants found to delete.", "warning")
-        return redirect(url_for('exam_participants', exam_id=exam.id))
+        return redirect(url_for('main.exam_participants', exam_id=exam.id))
 
+    ResultAnswers.query.filter_by(exam_id=exam.id).delete()
+    # A retake is served by the exam's current settings.
+    ExamAttempt.query.filter(ExamAttempt.exam_id == exam.id,
+                             ExamAttempt.user_id.in_({r.user_id for r in results})).delete()
     for r in results:
         db.session.delete(r)
+    db.session.flush()
+    rebuild_exam_stats(exam.id)
     db.session.commit()
 
     flash(f"🗑 All participants for '{exam.title}' have been deleted successfully.", "info")
-    return redirect(url_for('exam_participants', exam_id=exam.id))
+    return redirect(url_for('main.exam_participants', exam_id=exam.id))
+
+
+# ---------- Admin: Export Results ----------
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+EXPORT_COLUMNS = ['exam_id', 'exam_title', 'student_name', 'email', 'score', 'date_taken']
+
+
+def iter_result_rows(exam_id=None):
+    """Yield export rows from a server-side cursor, EXPORT_BATCH_SIZE rows at a time."""
+    stmt = db.select(
+        Exam.id, Exam.title, User.fullname, User.email, Result.score, Result.date_taken
+    ).select_from(Result).join(User, Result.user_id == User.id).join(Exam, Result.exam_id == Exam.id)
+    if exam_id is not None:
+        stmt = stmt.where(Result.exam_id == exam_id)
+    stmt = stmt.order_by(Result.exam_id, Result.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    for row in db.session.execute(stmt):
+        yield [
+            row[0], row[1], row[2], row[3], row[4],
+            row[5].strftime('%Y-%m-%d %H:%M:%S') if row[5] else None
+        ]
+
+
+def stream_csv(rows):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        # Flush roughly every 64 KiB so each chunk is a reasonable write.
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n"
+
+
+def export_response(rows, basename):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    body = stream_csv(rows) if fmt == 'csv' else stream_ndjson(rows)
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={basename}.{extension}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/export_results/<int:exam_id>')
+@admin_required
+def export_exam_results(exam_id):
+    exam = Exam.query.get_or_404(exam_id)
+    basename = f"participants_{secure_filename(exam.title) or exam.id}"
+    return export_response(iter_result_rows(exam.id), basename)
+
+
+@bp.route('/export_results')
+@admin_required
+def export_all_results():
+    return export_response(iter_result_rows(), "all_results")
 
 
 
 # ---------- CLI Utilities ----------
-@app.cli.command("init-db")
+@bp.cli.command("init-db")
 def init_db():
     db.create_all()
     print("Initialized the database.")
 
 
-@app.cli.command("create-admin")
+@bp.cli.command("create-admin")
 def create_admin():
     fullname = input("Full Name: ")
     email = input("Email: ")
@@ -455,42 +1996,303 @@ def create_admin():
     db.session.commit()
     print(f"Admin user '{fullname}' created successfully!")
 
+
+@bp.cli.command("import-questions")
+@click.argument("exam_id", type=int)
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "json"]), help="Defaults to the file extension.")
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True)
+def import_questions_command(exam_id, path, fmt, batch_size):
+    """Bulk-import questions for an exam from a CSV or JSON file."""
+    exam = db.session.get(Exam, exam_id)
+    if exam is None:
+        raise click.ClickException(f"Exam {exam_id} not found.")
+
+    try:
+        fmt = detect_format(path, fmt)
+        with open(path, 'rb') as f:
+            report = import_questions(exam, iter_rows(f, fmt), batch_size=batch_size)
+    except ImportFormatError as e:
+        raise click.ClickException(str(e))
+
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}")
+    if report["errors_truncated"]:
+        print(f"... {report['failed'] - len(report['errors'])} more errors not shown")
+    print(f"Imported {report['imported']} questions into '{exam.title}' ({report['failed']} rows skipped).")
+
+@bp.cli.command("rebuild-stats")
+@click.option("--exam-id", type=int, help="Only rebuild this exam (default: all exams).")
+def rebuild_stats(exam_id):
+    """Recompute per-exam score statistics from the result table."""
+    exam_ids = [exam_id] if exam_id else db.session.execute(db.select(Exam.id)).scalars().all()
+    for eid in exam_ids:
+        stats = rebuild_exam_stats(eid)
+        db.session.commit()
+        print(f"Exam {eid}: {stats.count} results")
+
+
+@bp.cli.command("grade-submissions")
+def grade_submissions_command():
+    """Grade every journaled submission that is waiting (e.g. after a restart)."""
+    processed = submission_worker.drain()
+    print(f"Graded {processed} submission(s). Journal: {submission_journal.counts()}")
+
 # ---------- View & Download Notes ----------
-@app.route('/view_notes')
+@bp.route('/view_notes')
 @login_required
 def view_notes():
     notes = Note.query.order_by(Note.upload_date.desc()).all()
     return render_template('view_notes.html', notes=notes)
 
 
-@app.route('/download/<filename>')
+def note_file_response(path, download_name, etag=True, last_modified=None):
+    """Serve a note with conditional GET and Range support, or offload it to the proxy."""
+    offload = current_app.config['NOTES_OFFLOAD']
+    if offload not in ('x-sendfile', 'x-accel-redirect'):
+        response = send_file(path, as_attachment=True, download_name=download_name,
+                             etag=etag, last_modified=last_modified, conditional=True)
+    else:
+        if not os.path.isfile(path):
+            abort(404)
+        response = Response(mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream')
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        if offload == 'x-sendfile':
+            response.headers['X-Sendfile'] = os.path.abspath(path)
+        else:
+            relative = os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+            prefix = current_app.config['NOTES_ACCEL_PREFIX']
+            response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative
+        if isinstance(etag, str):
+            response.set_etag(etag)
+        response.last_modified = last_modified or datetime.utcfromtimestamp(os.path.getmtime(path))
+        # Still answer revalidations here; the proxy only handles full and range transfers.
+        response.make_conditional(request)
+
+    # Notes need a login, so only the browser may cache them, and it must revalidate.
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.cache_control.public = False
+    return response
+
+
+@bp.route('/download/<int:note_id>')
 @login_required
-def download_note(filename):
-    return send_from_directory('uploads', filename, as_attachment=True)
+def download_note(note_id):
+    note = Note.query.get_or_404(note_id)
+    if note.content_hash is None:
+        # Saved before content addressing, under its original name.
+        return note_file_response(note_path(note), note.filename)
+    # Blobs are content-addressed, so their hash is a strong ETag.
+    return note_file_response(blob_store.path_for(note.content_hash), note.filename,
+                              etag=note.content_hash, last_modified=note.upload_date)
+
+@bp.route('/search_notes')
+@login_required
+def search_notes():
+    query = request.args.get('q', '').strip()
+    # Clamped from below too: a negative LIMIT is unbounded on SQLite, an error on Postgres.
+    limit = max(1, min(request.args.get('limit', 20, type=int) or 20, 100))
+    started = time.perf_counter()
+    matches = search_index.search(query, limit=limit) if query else []
+
+    notes = {n.id: n for n in Note.query.filter(Note.id.in_([m[0] for m in matches]))} if matches else {}
+    results = [
+        {
+            "id": note_id,
+            "title": notes[note_id].title,
+            "filename": notes[note_id].filename,
+            "snippet": snippet,
+            "score": round(score, 4),
+            "download_url": url_for('main.download_note', note_id=note_id)
+        }
+        for note_id, snippet, score in matches
+        if note_id in notes
+    ]
+    return jsonify({
+        "query": query,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+
+
+@bp.cli.command("build-assets")
+def build_assets():
+    """Bundle, fingerprint and precompress static/ into static/dist/."""
+    manifest = current_app.extensions['smartelearning']['assets'].build()
+    for name, built in sorted(manifest.items()):
+        click.echo(f"{name} -> {built}")
+
+
+@bp.cli.command("reindex-notes")
+def reindex_notes():
+    """Rebuild the full-text and SmartBot retrieval indexes for every note."""
+    note_vectors.clear()
+    count = 0
+    for (note_id,) in db.session.execute(db.select(Note.id)).all():
+        index_note(note_id)
+        count += 1
+    print(f"Indexed {count} notes.")
 
 # ---------- Admin: Delete Notes ----------
-@app.route('/delete_note/<int:note_id>', methods=['POST'])
+@bp.route('/delete_note/<int:note_id>', methods=['POST'])
 @admin_required
 def delete_note(note_id):
     note = Note.query.get_or_404(note_id)
-    file_path = os.path.join('uploads', note.filename)
-
-    # Delete file if exists
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    digest = note.content_hash
+    unreferenced = release_blob(digest) if digest else False
 
     # Delete record
     db.session.delete(note)
     db.session.commit()
+    search_index.remove(note.id)
+    note_vectors.remove(note.id)
+
+    # Delete the file once nothing references it (and only after the commit).
+    if digest is None:
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], note.filename)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    elif unreferenced:
+        # Under the blob's lock an upload of the same file has either committed
+        # its reference (the row is back) or not yet put the file in place.
+        with blob_store.lock(digest):
+            if db.session.get(NoteBlob, digest) is None:
+                blob_store.delete(digest)
+        db.session.commit()
+
     flash(f"🗑 Note '{note.title}' deleted successfully.", "info")
-    return redirect(url_for('view_notes'))
+    return redirect(url_for('main.view_notes'))
 
-@app.route('/update_db')
+@bp.route('/update_db')
 def update_db():
     db.create_all()
     return "Database Updated ✅"
 
 
 
+# ---------- App factory ----------
+def create_app(config=None):
+    """Build the app. config is a config object, a config class, or a name from
+    config.CONFIGS (default: $APP_CONFIG, else "production")."""
+    load_dotenv()
+    if config is None:
+        config = os.getenv("APP_CONFIG", "production")
+    if isinstance(config, str):
+        config = CONFIGS[config]
+    if isinstance(config, type):
+        config = config()
+
+    app = Flask(__name__)
+    app.config.from_object(config)
+    os.makedirs(app.instance_path, exist_ok=True)
+
+    # Compiled templates are cached on disk, shared by all workers and restarts
+    # (entries carry a checksum of their source, so an edited template is recompiled).
+    jinja_cache_dir = app.config['JINJA_CACHE_DIR'] or os.path.join(app.instance_path, "jinja_cache")
+    os.makedirs(jinja_cache_dir, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(jinja_cache_dir)}
+
+    db_profile = resolve_profile(app.config['DB_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI'])
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the profile's.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(db_profile, app.config),
+                                               **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+    migrate.init_app(app, db)
+
+    assets = AssetPipeline(app.static_folder, max_age=app.config['ASSETS_MAX_AGE'])
+    try:
+        assets.load(build_if_stale=app.config['ASSETS_AUTO_BUILD'])
+    except OSError:
+        # e.g. a read-only static folder; serve the last `flask build-assets` output.
+        app.logger.exception("Building static assets failed")
+        assets.load(build_if_stale=False)
+    if not assets.manifest:
+        app.logger.warning("No static asset build in %s; serving bundles from their sources. "
+                           "Run `flask build-assets`.", assets.dist_folder)
+    app.url_defaults(assets.fingerprint_url)
+    app.view_functions['static'] = assets.send_static
+
+    app.extensions['smartelearning'] = {
+        "smartbot_backend": create_chat_backend(app.config['SMARTBOT_BACKEND'],
+                                                api_key=app.config['OPENAI_API_KEY'],
+                                                base_url=app.config['OPENAI_BASE_URL'],
+                                                max_retries=app.config['OPENAI_MAX_RETRIES'],
+                                                timeout=app.config['OPENAI_TIMEOUT'],
+                                                stub_delay=app.config['SMARTBOT_STUB_DELAY']),
+        "smartbot_admission": create_admission_control(
+            app.config['SMARTBOT_ADMISSION_BACKEND'],
+            path=app.config['SMARTBOT_ADMISSION_PATH'] or os.path.join(app.instance_path, "smartbot_admission.db"),
+            rate=app.config['SMARTBOT_USER_RATE_PER_MINUTE'] / 60,
+            burst=app.config['SMARTBOT_USER_BURST'],
+            max_in_flight=app.config['SMARTBOT_MAX_IN_FLIGHT'],
+            lease=app.config['SMARTBOT_SLOT_LEASE'],
+            busy_retry_after=app.config['SMARTBOT_BUSY_RETRY_AFTER']
+        ),
+        "smartbot_cache": create_reply_cache(
+            app.config['SMARTBOT_CACHE_BACKEND'],
+            path=app.config['SMARTBOT_CACHE_PATH'] or os.path.join(app.instance_path, "smartbot_cache.db"),
+            max_entries=app.config['SMARTBOT_CACHE_SIZE'],
+            ttl=app.config['SMARTBOT_CACHE_TTL'],
+            wait_timeout=app.config['OPENAI_TIMEOUT']
+        ),
+        "blob_store": BlobStore(app.config['UPLOAD_FOLDER']),
+        "answer_keys": AnswerKeyCache(load_answer_key),
+        "question_banks": QuestionBankCache(load_question_bank),
+        "identities": IdentityCache(load_identity, ttl=app.config['IDENTITY_CACHE_TTL']),
+        "catalog_fragments": VersionedCache(),
+        "note_vectors_lock": threading.Lock(),
+        "assets": assets,
+        "template_fingerprint": template_fingerprint(app, assets.version),
+        "autosave_buffer": WriteBehindBuffer(partial(write_drafts, app),
+                                             interval=app.config['AUTOSAVE_FLUSH_INTERVAL'],
+                                             max_pending=app.config['AUTOSAVE_MAX_PENDING']),
+        "metrics_exporter": SnapshotExporter(
+            metrics_registry,
+            app.config['METRICS_DIR'] or os.path.join(app.instance_path, "metrics"),
+            interval=app.config['METRICS_FLUSH_INTERVAL']
+        ),
+    }
+    journal = SubmissionJournal(
+        app.config['SUBMISSION_JOURNAL_PATH'] or os.path.join(app.instance_path, "submissions.db"),
+        synchronous=app.config['SUBMISSION_JOURNAL_SYNC']
+    )
+    app.extensions['smartelearning'].update(
+        submission_journal=journal,
+        submission_worker=SubmissionWorker(journal, partial(grade_submissions, app),
+                                           batch_size=app.config['SUBMISSION_BATCH_SIZE'],
+                                           lease=app.config['SUBMISSION_LEASE']),
+    )
+
+    app.extensions['smartelearning']['db_profile'] = db_profile
+
+    with app.app_context():
+        if db_profile == "sqlite-wal":
+            apply_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
+        app.extensions['smartelearning']['search_index'] = SearchIndex(db.engine)
+        instrument_engine(db.engine, app.config['SLOW_QUERY_MS'], app.logger)
+
+    app.register_blueprint(bp)
+
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(record_template_render, app)
+    compile_times = {}
+    if app.config['TEMPLATES_PRECOMPILE']:
+        compile_times = precompile_templates(app)
+        app.logger.info("Precompiled %d templates in %.1f ms", len(compile_times), sum(compile_times.values()) * 1000)
+    app.extensions['smartelearning']['template_compile_times'] = compile_times
+    return app
+
+
+def __getattr__(name):
+    # "gunicorn app:app", "flask --app app" and "from app import app" still
+    # work; the default app is only built when something asks for it.
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app("development").run(debug=True)
\ No newline at end of file
@@ -0,0 +1,98 @@
+# autosave.py
+"""Write-behind buffer for in-progress exam answers.
+
+Autosave requests only update an in-memory map keyed by (user_id,
+exam_id); rapid updates to the same attempt coalesce into one pending
+entry. A background thread flushes everything pending in one batched
+transaction every ``interval`` seconds (or sooner once ``max_pending``
+attempts are waiting), so N clicks become at most one write per attempt
+per interval.
+"""
+import atexit
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(self, flush_fn, interval=1.0, max_pending=500):
+        self._flush_fn = flush_fn
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.updates = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def put(self, key, value, seq):
+        """Queue the latest value for key; older sequence numbers are ignored."""
+        with self._lock:
+            current = self._pending.get(key)
+            if current is not None:
+                if current[1] > seq:
+                    return
+                self.coalesced += 1
+            self._pending[key] = (value, seq)
+            self.updates += 1
+            full = len(self._pending) >= self.max_pending
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def get(self, key):
+        entry = self._pending.get(key)
+        return entry[0] if entry else None
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            self._flush_fn([(key, value, seq) for key, (value, seq) in batch.items()])
+        except Exception:
+            logger.exception("Autosave flush of %d entries failed; re-queueing", len(batch))
+            with self._lock:
+                for key, entry in batch.items():
+                    current = self._pending.get(key)
+                    if current is None or current[1] < entry[1]:
+                        self._pending[key] = entry
+            return 0
+        self.flushes += 1
+        self.rows_written += len(batch)
+        return len(batch)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='autosave-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
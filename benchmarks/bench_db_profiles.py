@@ -0,0 +1,188 @@
+# benchmarks/bench_db_profiles.py
+"""Write throughput of concurrent exam submissions for each engine profile.
+
+Run from the repository root:
+
+    python benchmarks/bench_db_profiles.py [--workers 4] [--threads 8] [--seconds 5]
+    python benchmarks/bench_db_profiles.py --postgres-url postgresql://user:pw@host/bench
+
+Each profile gets a fresh database seeded with one 20-question exam and
+enough students. --workers forked processes (like gunicorn workers), each
+running --threads threads, then commit inline submissions as fast as they
+can: insert the Result and ResultAnswers rows and fold the score into
+ExamStats under its row lock, the write path take_exam() uses in inline
+mode. Meanwhile --readers threads per process aggregate the exam's
+results every --read-interval seconds, as the participants and results pages do. Commits/sec, reads/sec
+and failed transactions ("database is locked", pool timeouts) are
+reported per profile. SQLite compares "default" with
+"sqlite-wal"; with --postgres-url, "default" with "postgres-pooled" too
+(the Postgres database is emptied first).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+N_QUESTIONS = 20
+
+
+def make_app(url, profile):
+    os.environ["DATABASE_URL"] = url
+    os.environ["DB_PROFILE"] = profile
+    from app import create_app
+    return create_app("production")
+
+
+def seed(url, profile, n_students):
+    from answer_keys import grade_and_pack  # noqa: F401  (imported before forking)
+    from app import db, Exam, Question, User
+
+    app = make_app(url, profile)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        exam = Exam(title="Write throughput", duration=30)
+        db.session.add(exam)
+        db.session.flush()
+        db.session.add_all([
+            Question(exam_id=exam.id, question_text=f"Question {i}?", option1=f"Answer {i}",
+                     option2="B", option3="C", option4="D", correct_option=f"Answer {i}")
+            for i in range(N_QUESTIONS)
+        ])
+        db.session.execute(db.insert(User), [
+            {"fullname": f"Student {i}", "email": f"student{i}@example.com", "password_hash": "x"}
+            for i in range(n_students)
+        ])
+        db.session.commit()
+        answers = {str(q.id): q.option1 if q.id % 3 else "B" for q in exam.questions}
+        user_ids = db.session.scalars(db.select(User.id).order_by(User.id)).all()
+        exam_id = exam.id
+        db.engine.dispose()
+    return exam_id, answers, user_ids
+
+
+def worker(url, profile, exam_id, answers, user_ids, threads, readers, read_interval, start, seconds,
+           results):
+    """Child process: submit and read from several threads until the deadline."""
+    from answer_keys import grade_and_pack
+    from app import db, answer_keys, record_scores, Exam, Result, ResultAnswers
+
+    app = make_app(url, profile)
+    outcomes = Counter()
+    lock = threading.Lock()
+    students = iter(user_ids)
+
+    def submit_loop():
+        deadline = start + seconds
+        with app.app_context():
+            while time.time() < deadline:
+                with lock:
+                    user_id = next(students, None)
+                if user_id is None:
+                    break
+                try:
+                    exam = db.session.get(Exam, exam_id)
+                    score, packed = grade_and_pack(answer_keys.get(exam.id, exam.questions_version), answers)
+                    result = Result(user_id=user_id, exam_id=exam_id, score=score)
+                    db.session.add(result)
+                    db.session.flush()
+                    db.session.add(ResultAnswers(result_id=result.id, exam_id=exam_id, answers=packed))
+                    record_scores(exam_id, [score])
+                    db.session.commit()
+                    outcome = "committed"
+                except Exception as exc:
+                    db.session.rollback()
+                    outcome = type(exc).__name__ + (": database is locked" if "locked" in str(exc) else "")
+                with lock:
+                    outcomes[outcome] += 1
+            db.session.remove()
+
+    def read_loop():
+        deadline = start + seconds
+        query = db.select(db.func.count(Result.id), db.func.avg(Result.score)).where(Result.exam_id == exam_id)
+        with app.app_context():
+            while time.time() < deadline:
+                try:
+                    db.session.execute(query).one()
+                    db.session.commit()
+                    outcome = "read"
+                except Exception as exc:
+                    db.session.rollback()
+                    outcome = type(exc).__name__ + (": database is locked" if "locked" in str(exc) else "")
+                with lock:
+                    outcomes[outcome] += 1
+                time.sleep(read_interval)
+            db.session.remove()
+
+    time.sleep(max(0.0, start - time.time()))
+    pool = ([threading.Thread(target=submit_loop) for _ in range(threads)]
+            + [threading.Thread(target=read_loop) for _ in range(readers)])
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put(dict(outcomes))
+
+
+def run(url, profile, args):
+    n_students = args.workers * args.max_per_worker
+    exam_id, answers, user_ids = seed(url, profile, n_students)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    start = time.time() + 1.0
+    processes = [
+        context.Process(target=worker, args=(url, profile, exam_id, answers,
+                                             user_ids[i::args.workers], args.threads,
+                                             args.readers, args.read_interval, start, args.seconds, results))
+        for i in range(args.workers)
+    ]
+    for p in processes:
+        p.start()
+    totals = Counter()
+    for _ in processes:
+        totals.update(results.get())
+    for p in processes:
+        p.join()
+    elapsed = max(args.seconds, time.time() - start)
+    committed = totals.pop("committed", 0)
+    reads = totals.pop("read", 0)
+    failed = ", ".join(f"{n} {kind}" for kind, n in totals.most_common()) or "none"
+    print(f"{profile:<16} {committed / elapsed:>8.0f} commits/s {reads / elapsed:>8.0f} reads/s   failed: {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="processes")
+    parser.add_argument("--threads", type=int, default=8, help="writer threads per process")
+    parser.add_argument("--readers", type=int, default=2, help="reader threads per process")
+    parser.add_argument("--read-interval", type=float, default=0.005, help="seconds between a reader's queries")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--max-per-worker", type=int, default=20000,
+                        help="students seeded per process (caps submissions)")
+    parser.add_argument("--postgres-url", help="also benchmark this (emptied!) Postgres database")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["SUBMISSION_JOURNAL_PATH"] = os.path.join(workdir, "submissions.db")
+    os.environ["METRICS_DIR"] = os.path.join(workdir, "metrics")
+    os.environ.setdefault("SMARTBOT_BACKEND", "stub")
+    os.environ.setdefault("SLOW_QUERY_MS", "1e9")  # lock waits would flood the log
+    print(f"{args.workers} processes x ({args.threads} writers + {args.readers} readers), "
+          f"{args.seconds:g} s per profile")
+
+    for profile in ("default", "sqlite-wal"):
+        run("sqlite:///" + os.path.join(workdir, f"{profile}.db"), profile, args)
+    if args.postgres_url:
+        for profile in ("default", "postgres-pooled"):
+            run(args.postgres_url, profile, args)
+
+
+if __name__ == "__main__":
+    main()
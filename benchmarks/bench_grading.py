@@ -0,0 +1,88 @@
+# benchmarks/bench_grading.py
+"""Submissions/sec for take_exam grading, before and after compiled answer keys.
+
+Run from the repository root:
+
+    python benchmarks/bench_grading.py [--seconds 2]
+
+"before" re-queries every Question row and compares with .strip().lower()
+on both sides, as take_exam() used to. "after" grades (and packs the
+responses) against the cached compiled answer key, as take_exam() does now.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from werkzeug.datastructures import MultiDict  # noqa: E402
+
+from app import app, db, Exam, Question, answer_keys  # noqa: E402
+from answer_keys import grade_and_pack  # noqa: E402
+
+
+def legacy_grade(exam_id, form):
+    questions = Question.query.filter_by(exam_id=exam_id).all()
+    score = 0
+    for q in questions:
+        selected = form.get(str(q.id))
+        if selected and selected.strip().lower() == q.correct_option.strip().lower():
+            score += 1
+    return score
+
+
+def compiled_grade(exam, form):
+    return grade_and_pack(answer_keys.get(exam.id, exam.questions_version), form)[0]
+
+
+def seed_exam(n_questions):
+    exam = Exam(title=f"Bench {n_questions}", duration=30)
+    db.session.add(exam)
+    db.session.flush()
+    db.session.add_all([
+        Question(
+            exam_id=exam.id,
+            question_text=f"Question {i}?",
+            option1=f"Answer {i}", option2="B", option3="C", option4="D",
+            correct_option=f"Answer {i}"
+        )
+        for i in range(n_questions)
+    ])
+    db.session.commit()
+    form = MultiDict({str(q.id): q.option1 if q.id % 2 else "B" for q in exam.questions})
+    return exam, form
+
+
+def throughput(fn, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        # take_exam() commits afterwards, which expires loaded ORM state.
+        db.session.expire_all()
+        count += 1
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time per measurement")
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        print(f"{'questions':>10} {'before/s':>12} {'after/s':>12} {'speedup':>8}")
+        for n in (10, 100, 1000):
+            exam, form = seed_exam(n)
+            assert legacy_grade(exam.id, form) == compiled_grade(exam, form)
+            before = throughput(lambda: legacy_grade(exam.id, form), args.seconds)
+            after = throughput(lambda: compiled_grade(exam, form), args.seconds)
+            print(f"{n:>10} {before:>12.0f} {after:>12.0f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+# benchmarks/bench_routes.py
+"""Throughput, latency and queries per request of the hot routes.
+
+Run from the repository root; everything is local (SQLite, stub SmartBot):
+
+    python benchmarks/bench_routes.py [--users 2000] [--concurrency 1,8,32] [--requests 400]
+    python benchmarks/bench_routes.py --output before.json
+    python benchmarks/bench_routes.py --baseline before.json    # after a change
+
+A fresh SQLite database is seeded from --seed with --users students,
+--exams exams of --questions questions, Result rows for
+--taken-fraction of the students in every exam, and --notes text notes
+(stored, full-text and retrieval indexed as uploads are). Then each
+route is driven at each concurrency level: that many threads share one
+app (like one gunicorn gthread worker) and send --requests requests in
+total through the WSGI interface, each as a random student (an admin
+for the admin pages):
+
+    exam_list          GET  /exam_list
+    take_exam_get      GET  /take_exam/<id>, an exam the student has not taken
+    exam_participants  GET  /exam_participants/<id>
+    participants_api   GET  /api/exam_participants/<id>, the first page
+    view_notes         GET  /view_notes
+    download_note      GET  /download/<id>, whole file
+    chatbot            POST /chatbot (stub backend, reply cache off)
+    take_exam_post     POST /take_exam/<id>, a new attempt each time
+
+SQL statements are counted per request on the serving thread, so
+background work (grading, indexing) is left out. Results go to stdout,
+or --output, as JSON; --baseline prints the change against an earlier
+run. Settings can be overridden with the usual environment variables
+(SUBMISSION_MODE, DB_PROFILE, SMARTBOT_CACHE_BACKEND, ...).
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ROUTES = ("exam_list", "take_exam_get", "exam_participants", "participants_api",
+          "view_notes", "download_note", "chatbot", "take_exam_post")
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+
+def configure(workdir):
+    """Point every file the app writes into workdir and keep it offline."""
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(workdir, "bench.db"),
+        "SUBMISSION_JOURNAL_PATH": os.path.join(workdir, "submissions.db"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        "NOTE_VECTORS_DIR": os.path.join(workdir, "note_vectors"),
+        "SMARTBOT_ADMISSION_PATH": os.path.join(workdir, "smartbot_admission.db"),
+        "SMARTBOT_CACHE_PATH": os.path.join(workdir, "smartbot_cache.db"),
+        "SMARTBOT_BACKEND": "stub",
+    })
+    # Measure the upstream path, not the reply cache or the per-user rate limit.
+    os.environ.setdefault("SMARTBOT_CACHE_BACKEND", "none")
+    os.environ.setdefault("SMARTBOT_ADMISSION_BACKEND", "none")
+    os.environ.setdefault("SLOW_QUERY_MS", "1e9")
+
+
+def seed(app, args, rng):
+    """Fill the database; return the fixture the scenarios draw from."""
+    from app import (db, acquire_blob, blob_store, index_note, rebuild_exam_stats,
+                     Exam, Note, Question, Result, User)
+
+    with app.app_context():
+        db.create_all()
+        admin = User(fullname="Admin", email="admin@example.com", password_hash="x", is_admin=True)
+        db.session.add(admin)
+        db.session.execute(db.insert(User), [
+            {"fullname": f"Student {i}", "email": f"student{i}@example.com", "password_hash": "x"}
+            for i in range(args.users)
+        ])
+        exams = [Exam(title=f"Exam {i}", duration=30) for i in range(args.exams)]
+        db.session.add_all(exams)
+        db.session.flush()
+        db.session.execute(db.insert(Question), [
+            {"exam_id": exam.id, "question_text": f"Question {i} of {exam.title}?",
+             "option1": f"Answer {i}", "option2": "B", "option3": "C", "option4": "D",
+             "correct_option": f"Answer {i}"}
+            for exam in exams for i in range(args.questions)
+        ])
+        student_ids = db.session.scalars(
+            db.select(User.id).where(User.is_admin.is_(False)).order_by(User.id)).all()
+
+        # The first taken_fraction of the students (in a per-exam order) have taken each exam.
+        n_taken = int(len(student_ids) * args.taken_fraction)
+        untaken = {}
+        for exam in exams:
+            order = rng.sample(student_ids, len(student_ids))
+            db.session.execute(db.insert(Result), [
+                {"user_id": user_id, "exam_id": exam.id, "score": rng.randint(0, args.questions)}
+                for user_id in order[:n_taken]
+            ])
+            untaken[exam.id] = order[n_taken:]
+            rebuild_exam_stats(exam.id)
+
+        for i in range(args.notes):
+            words = rng.choices(VOCABULARY, k=args.note_words)
+            digest, size = blob_store.save(io.BytesIO(' '.join(words).encode()))
+            acquire_blob(digest, size)
+            db.session.add(Note(title=f"Note {i}", filename=f"note{i}.txt", content_hash=digest,
+                                size=size, uploaded_by=admin.id))
+        db.session.commit()
+        note_ids = db.session.scalars(db.select(Note.id)).all()
+        for note_id in note_ids:
+            index_note(note_id)
+
+        answers = {exam.id: {str(q.id): q.option1 for q in exam.questions} for exam in exams}
+        fixture = {
+            "admin_id": admin.id,
+            "student_ids": student_ids,
+            "exam_ids": [exam.id for exam in exams],
+            "untaken": untaken,
+            "note_ids": note_ids,
+            "answers": answers,
+        }
+        db.session.remove()
+    return fixture
+
+
+class Scenarios:
+    """Builds (method, path, user_id, kwargs) for one request of a route."""
+
+    def __init__(self, fixture, rng):
+        self.f = fixture
+        self.rng = rng
+        self.lock = threading.Lock()
+        # take_exam_post uses each untaken (student, exam) pair once.
+        self.attempts = iter([(user_id, exam_id) for exam_id, users in fixture["untaken"].items()
+                              for user_id in users[len(users) // 2:]])
+
+    def student(self):
+        return self.rng.choice(self.f["student_ids"])
+
+    def request(self, route):
+        with self.lock:
+            return getattr(self, route)()
+
+    def exam_list(self):
+        return "GET", "/exam_list", self.student(), {}
+
+    def take_exam_get(self):
+        exam_id = self.rng.choice(self.f["exam_ids"])
+        users = self.f["untaken"][exam_id]
+        # Only the first half: the second half is kept for take_exam_post.
+        return "GET", f"/take_exam/{exam_id}", self.rng.choice(users[:max(1, len(users) // 2)]), {}
+
+    def exam_participants(self):
+        return "GET", f"/exam_participants/{self.rng.choice(self.f['exam_ids'])}", self.f["admin_id"], {}
+
+    def participants_api(self):
+        return "GET", f"/api/exam_participants/{self.rng.choice(self.f['exam_ids'])}", self.f["admin_id"], {}
+
+    def view_notes(self):
+        return "GET", "/view_notes", self.student(), {}
+
+    def download_note(self):
+        return "GET", f"/download/{self.rng.choice(self.f['note_ids'])}", self.student(), {}
+
+    def chatbot(self):
+        message = "Explain " + " and ".join(self.rng.choices(VOCABULARY, k=3))
+        return "POST", "/chatbot", self.student(), {"json": {"message": message}}
+
+    def take_exam_post(self):
+        attempt = next(self.attempts, None)
+        if attempt is None:
+            return None
+        user_id, exam_id = attempt
+        return "POST", f"/take_exam/{exam_id}", user_id, {"data": self.f["answers"][exam_id]}
+
+
+def install_query_counter(app):
+    """Count SQL statements per thread (the test client serves on the calling thread)."""
+    from sqlalchemy import event
+    from app import db
+
+    counter = threading.local()
+
+    with app.app_context():
+        @event.listens_for(db.engine, "after_cursor_execute")
+        def count_query(*args):
+            counter.queries = getattr(counter, "queries", 0) + 1
+
+    return counter
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+def drive(app, scenarios, counter, route, concurrency, n_requests):
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookie_name = app.config['SESSION_COOKIE_NAME']
+    cookies = {}
+    samples = []
+    lock = threading.Lock()
+    remaining = [n_requests]
+
+    def cookie(user_id):
+        if user_id not in cookies:
+            cookies[user_id] = f"{cookie_name}={serializer.dumps({'user_id': user_id})}"
+        return cookies[user_id]
+
+    def loop():
+        client = app.test_client(use_cookies=False)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            spec = scenarios.request(route)
+            if spec is None:
+                return
+            method, path, user_id, kwargs = spec
+            with lock:
+                header = cookie(user_id)
+            counter.queries = 0
+            started = time.perf_counter()
+            response = client.open(path, method=method, headers={"Cookie": header}, **kwargs)
+            response.get_data()
+            response.close()
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append((elapsed, response.status_code, counter.queries))
+
+    threads = [threading.Thread(target=loop) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _, _ in samples)
+    statuses = Counter(status for _, status, _ in samples)
+    queries = [n for _, _, n in samples]
+    if not samples:
+        return None
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": sum(n for status, n in statuses.items() if status >= 400),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "throughput_rps": round(len(samples) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "queries_per_request": round(sum(queries) / len(queries), 2),
+        "max_queries": max(queries),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    previous = {(r["route"], r["concurrency"]): r for r in (baseline or {}).get("results", [])}
+    print(f"{'route':<18} {'conc':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'queries':>7} {'errors':>6}" + ("   vs baseline" if baseline else ""), file=sys.stderr)
+    for r in results:
+        line = (f"{r['route']:<18} {r['concurrency']:>4} {r['throughput_rps']:>8} {r['p50_ms']:>8} "
+                f"{r['p95_ms']:>8} {r['p99_ms']:>8} {r['queries_per_request']:>7} {r['errors']:>6}")
+        old = previous.get((r["route"], r["concurrency"]))
+        if old:
+            line += (f"   req/s {r['throughput_rps'] / old['throughput_rps'] - 1:+.0%}"
+                     f", p95 {r['p95_ms'] / old['p95_ms'] - 1:+.0%}"
+                     f", queries {r['queries_per_request'] - old['queries_per_request']:+g}")
+        print(line, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000, help="students")
+    parser.add_argument("--exams", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=40, help="questions per exam")
+    parser.add_argument("--taken-fraction", type=float, default=0.5,
+                        help="share of the students with a result in every exam")
+    parser.add_argument("--notes", type=int, default=20)
+    parser.add_argument("--note-words", type=int, default=20000, help="words per note")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated subset of: " + ", ".join(ROUTES))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated thread counts")
+    parser.add_argument("--requests", type=int, default=400, help="requests per route and concurrency")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per route first")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="an earlier JSON report to compare with")
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    workdir = tempfile.mkdtemp()
+    configure(workdir)
+    from app import create_app
+
+    app = create_app("production")
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    fixture = seed(app, args, rng)
+    print(f"seeded {args.users} students, {args.exams} exams x {args.questions} questions, "
+          f"{args.notes} notes in {time.perf_counter() - started:.1f} s ({workdir})", file=sys.stderr)
+    counter = install_query_counter(app)
+    scenarios = Scenarios(fixture, rng)
+
+    results = []
+    for route in routes:
+        drive(app, scenarios, counter, route, 1, args.warmup)
+        for concurrency in levels:
+            result = drive(app, scenarios, counter, route, concurrency, args.requests)
+            if result is None:
+                print(f"{route}: no requests left to send (seed more --users)", file=sys.stderr)
+                continue
+            results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {name: app.config[name] for name in (
+            "SUBMISSION_MODE", "DB_PROFILE", "SMARTBOT_BACKEND", "SMARTBOT_CACHE_BACKEND",
+            "SMARTBOT_ADMISSION_BACKEND")},
+        "args": vars(args),
+        "results": results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
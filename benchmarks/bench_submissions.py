@@ -0,0 +1,178 @@
+# benchmarks/bench_submissions.py
+"""Acknowledgement latency for a deadline burst of take_exam submissions.
+
+Run from the repository root:
+
+    python benchmarks/bench_submissions.py [--submissions 2000] [--mode both]
+
+For each SUBMISSION_MODE a server process is started on a fresh SQLite
+database seeded with one 20-question exam and one student per
+submission. Every student opens the exam page, then all of them POST
+their answers at the same instant (a thread per student released by a
+barrier) and the time until the response arrives is recorded. "inline" grades and commits inside the
+request, as take_exam() used to; "queue" journals and acknowledges, and
+the batching worker grades in the background, so the time until every
+Result row exists is reported too.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+N_QUESTIONS = 20
+
+
+def serve(n_students):
+    """Child process: seed the database, print the fixtures, serve until killed."""
+    from werkzeug.serving import make_server
+
+    from app import app, db, Exam, Question, User
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with app.app_context():
+        db.create_all()
+        exam = Exam(title="Deadline burst", duration=30)
+        db.session.add(exam)
+        db.session.flush()
+        questions = [
+            Question(exam_id=exam.id, question_text=f"Question {i}?", option1=f"Answer {i}",
+                     option2="B", option3="C", option4="D", correct_option=f"Answer {i}")
+            for i in range(N_QUESTIONS)
+        ]
+        students = [User(fullname=f"Student {i}", email=f"student{i}@example.com", password_hash="x")
+                    for i in range(n_students)]
+        db.session.add_all(questions + students)
+        db.session.commit()
+        answers = {str(q.id): q.option1 if q.id % 3 else "B" for q in questions}
+        user_ids = [u.id for u in students]
+        exam_id = exam.id
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server.socket.listen(n_students)
+    print(json.dumps({
+        "port": server.server_port,
+        "exam_id": exam_id,
+        "answers": answers,
+        "cookies": [serializer.dumps({"user_id": uid}) for uid in user_ids],
+    }), flush=True)
+    server.serve_forever()
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+def run(mode, n_submissions):
+    workdir = tempfile.mkdtemp()
+    database = os.path.join(workdir, "burst.db")
+    env = dict(os.environ,
+               OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-benchmark"),
+               DATABASE_URL="sqlite:///" + database,
+               SUBMISSION_MODE=mode,
+               SUBMISSION_JOURNAL_PATH=os.path.join(workdir, "submissions.db"))
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(n_submissions)],
+                             cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        fixture = json.loads(child.stdout.readline())
+        body = urlencode(fixture["answers"])
+        path = f"/take_exam/{fixture['exam_id']}"
+        burst_started = []
+        barrier = threading.Barrier(n_submissions, action=lambda: burst_started.append(time.perf_counter()))
+        latencies = [None] * n_submissions
+        statuses = [None] * n_submissions
+
+        def submit(i):
+            cookie = f"session={fixture['cookies'][i]}"
+            # Open the exam first, as a student would, so the burst sees warm caches.
+            conn = http.client.HTTPConnection('127.0.0.1', fixture["port"], timeout=120)
+            conn.request("GET", path, headers={"Cookie": cookie})
+            conn.getresponse().read()
+            conn.close()
+
+            conn = http.client.HTTPConnection('127.0.0.1', fixture["port"], timeout=120)
+            headers = {"Content-Type": "application/x-www-form-urlencoded", "Cookie": cookie}
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                statuses[i] = response.status
+            except OSError as e:
+                statuses[i] = type(e).__name__
+            latencies[i] = time.perf_counter() - started
+            conn.close()
+
+        threading.stack_size(256 * 1024)
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(n_submissions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        acked = time.perf_counter() - burst_started[0]
+
+        # Wait for the grader to catch up (immediate for inline mode).
+        results = 0
+        ok = sum(1 for s in statuses if s in (302, 303))
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            with sqlite3.connect(database, timeout=30) as conn:
+                results = conn.execute("SELECT COUNT(*) FROM result").fetchone()[0]
+            if results >= ok:
+                break
+            time.sleep(0.05)
+        graded = time.perf_counter() - burst_started[0]
+
+        ordered = sorted(latencies)
+        return {
+            "mode": mode,
+            "submissions": n_submissions,
+            "acknowledged": ok,
+            "errors": n_submissions - ok,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1),
+            "all_acked_s": round(acked, 2),
+            "all_graded_s": round(graded, 2),
+            "results": results,
+        }
+    finally:
+        child.kill()
+        child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=2000, help="simultaneous submissions")
+    parser.add_argument("--mode", choices=("inline", "queue", "both"), default="both")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    modes = ("inline", "queue") if args.mode == "both" else (args.mode,)
+    print(f"{'mode':>7} {'ok':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'acked s':>8} {'graded s':>8}")
+    for mode in modes:
+        r = run(mode, args.submissions)
+        print(f"{r['mode']:>7} {r['acknowledged']:>6} {r['errors']:>6} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['max_ms']:>8} {r['all_acked_s']:>8} {r['all_graded_s']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# benchmarks/check_admission.py
+"""Drive /chatbot admission control against a slow stub upstream.
+
+Run from the repository root; exits non-zero if any check fails:
+
+    python benchmarks/check_admission.py [--workers 2] [--users 10]
+
+The stub backend takes --delay seconds per reply and the in-flight cap is
+--max-in-flight. --workers forked processes (standing in for gunicorn
+workers) share one SQLite admission file and each fire --users requests
+from different students at the same instant. Checks:
+
+- upstream calls in flight, counted across all processes, never exceed
+  the cap, and the cap is reached;
+- every refused request gets a 429 with Retry-After well before the stub
+  could have answered (it does not hold a worker);
+- one student past their burst is refused with the per-user message;
+- a streamed request is refused the same way, before streaming starts;
+- an upstream 429 closes admission for everyone until it has passed.
+
+tests/test_smartbot_admission.py runs the single-process cases with
+pytest; this script adds the cap shared across forked workers.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TrackingBackend:
+    """Wraps the stub; counts concurrent upstream calls across processes."""
+
+    def __init__(self, backend, current, peak):
+        self.backend = backend
+        self.current = current
+        self.peak = peak
+
+    def complete(self, messages, **params):
+        with self.current.get_lock():
+            self.current.value += 1
+            with self.peak.get_lock():
+                self.peak.value = max(self.peak.value, self.current.value)
+        try:
+            return self.backend.complete(messages, **params)
+        finally:
+            with self.current.get_lock():
+                self.current.value -= 1
+
+    def stream(self, messages, **params):
+        return self.backend.stream(messages, **params)
+
+
+class RateLimitedBackend:
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+    def complete(self, messages, **params):
+        from smartbot_backends import UpstreamRateLimited
+        raise UpstreamRateLimited(self.retry_after)
+
+
+def make_app():
+    from app import create_app
+    return create_app("production")
+
+
+def client(app, user_id):
+    c = app.test_client()
+    with c.session_transaction() as s:
+        s['user_id'] = user_id
+    return c
+
+
+def ask(app, user_id, message, stream=False):
+    started = time.perf_counter()
+    response = client(app, user_id).post('/chatbot', json={"message": message, "stream": stream})
+    response.close()
+    return response.status_code, response.headers.get('Retry-After'), response.get_data(as_text=True), \
+        time.perf_counter() - started
+
+
+def burst(worker_index, user_ids, start, current, peak, results):
+    """Child process: every user asks once, all at the same instant."""
+    from app import note_vectors
+    app = make_app()
+    services = app.extensions['smartelearning']
+    services['smartbot_backend'] = TrackingBackend(services['smartbot_backend'], current, peak)
+    with app.app_context():
+        # Open the note retrieval index (a one-off NumPy import) before the clock starts.
+        note_vectors.stats()
+    outcomes = []
+    lock = threading.Lock()
+
+    def one(user_id):
+        time.sleep(max(0.0, start - time.time()))
+        outcome = ask(app, user_id, f"Question from student {user_id} in worker {worker_index}")
+        with lock:
+            outcomes.append(outcome)
+
+    threads = [threading.Thread(target=one, args=(u,)) for u in user_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put([(status, retry_after, elapsed) for status, retry_after, _, elapsed in outcomes])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2, help="processes sharing the admission state")
+    parser.add_argument("--users", type=int, default=10, help="simultaneous students per process")
+    parser.add_argument("--delay", type=float, default=1.0, help="stub upstream seconds per reply")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(workdir, "admission.db"),
+        "SUBMISSION_JOURNAL_PATH": os.path.join(workdir, "submissions.db"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "SMARTBOT_BACKEND": "stub",
+        "SMARTBOT_STUB_DELAY": str(args.delay),
+        "SMARTBOT_CACHE_BACKEND": "none",
+        "SMARTBOT_ADMISSION_BACKEND": "sqlite",
+        "SMARTBOT_ADMISSION_PATH": os.path.join(workdir, "smartbot_admission.db"),
+        "NOTE_VECTORS_DIR": os.path.join(workdir, "note_vectors"),
+        "SMARTBOT_MAX_IN_FLIGHT": str(args.max_in_flight),
+        "SMARTBOT_USER_BURST": "2",
+        "SMARTBOT_USER_RATE_PER_MINUTE": "6",
+    })
+    from app import db, User
+
+    app = make_app()
+    n_users = args.workers * args.users + 3
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(User), [
+            {"fullname": f"Student {i}", "email": f"student{i}@example.com", "password_hash": "x"}
+            for i in range(n_users)
+        ])
+        db.session.commit()
+        user_ids = db.session.scalars(db.select(User.id).order_by(User.id)).all()
+        db.engine.dispose()
+
+    failures = []
+
+    def check(ok, message):
+        print(("ok    " if ok else "FAIL  ") + message)
+        if not ok:
+            failures.append(message)
+
+    # 1. A class-wide burst across processes.
+    context = multiprocessing.get_context("fork")
+    current, peak, results = context.Value('i', 0), context.Value('i', 0), context.Queue()
+    start = time.time() + 1.0
+    crowd = user_ids[:args.workers * args.users]
+    processes = [
+        context.Process(target=burst, args=(i, crowd[i::args.workers], start, current, peak, results))
+        for i in range(args.workers)
+    ]
+    for p in processes:
+        p.start()
+    outcomes = [outcome for _ in processes for outcome in results.get()]
+    for p in processes:
+        p.join()
+    answered = [elapsed for status, _, elapsed in outcomes if status == 200]
+    refused = [(retry_after, elapsed) for status, retry_after, elapsed in outcomes if status == 429]
+    print(f"burst of {len(outcomes)}: {len(answered)} answered, {len(refused)} refused, "
+          f"peak upstream concurrency {peak.value}")
+    check(peak.value <= args.max_in_flight, f"in-flight cap held across processes ({peak.value} <= {args.max_in_flight})")
+    check(len(answered) == args.max_in_flight, f"cap was used fully ({len(answered)} answered)")
+    slowest_refusal = max((elapsed for _, elapsed in refused), default=0.0)
+    check(len(answered) + len(refused) == len(outcomes) and slowest_refusal < args.delay / 4,
+          f"refusals were immediate (slowest {slowest_refusal * 1000:.0f} ms)")
+    check(all(retry_after and int(retry_after) >= 1 for retry_after, _ in refused), "refusals carry Retry-After")
+
+    # 2. One student past their burst of 2.
+    student = user_ids[-1]
+    statuses = [ask(app, student, f"question {i}")[:3] for i in range(3)]
+    check([s for s, _, _ in statuses] == [200, 200, 429], f"per-user burst enforced ({[s for s, _, _ in statuses]})")
+    check("too quickly" in statuses[2][2] and int(statuses[2][1]) >= 5,
+          f"per-user refusal says when to retry (Retry-After {statuses[2][1]})")
+
+    # 3. Streamed requests are refused before the stream starts.
+    status, retry_after, body, _ = ask(app, student, "streamed question", stream=True)
+    check(status == 429 and '"busy": true' in body.replace('"busy":true', '"busy": true'),
+          "streamed request refused with a JSON 429")
+
+    # 4. An upstream 429 closes admission for everyone.
+    services = app.extensions['smartelearning']
+    stub = services['smartbot_backend']
+    services['smartbot_backend'] = RateLimitedBackend(retry_after=2)
+    status, retry_after, _, _ = ask(app, user_ids[-2], "hello")
+    services['smartbot_backend'] = stub
+    check(status == 429 and retry_after == "2", f"upstream 429 surfaced as busy (status {status})")
+    status, _, _, _ = ask(app, user_ids[-3], "hello")
+    check(status == 429, "other students are refused during the upstream backoff")
+    time.sleep(2.1)
+    status, _, _, _ = ask(app, user_ids[-3], "hello")
+    check(status == 200, "admission reopens after the backoff")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
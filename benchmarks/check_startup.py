@@ -0,0 +1,102 @@
+# benchmarks/check_startup.py
+"""Check worker boot and CLI cold-start times against a budget.
+
+Run from the repository root; exits non-zero if any step is over budget
+or if booting imported the openai package:
+
+    python benchmarks/check_startup.py [--runs 5]
+
+Every measurement runs in a fresh interpreter with OPENAI_API_KEY unset
+(booting must not need it) and keeps the best of --runs, so disk cache
+noise does not fail the check.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds. Worker steps are measured inside the interpreter; CLI commands
+# are wall-clock time including interpreter startup.
+BUDGETS = {
+    "import app": 1.0,
+    "create_app()": 0.2,
+    "first request": 0.5,
+    "flask routes": 2.0,
+    "flask db current": 2.5,
+}
+
+BOOT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+application.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({
+    "import app": imported - started,
+    "create_app()": created - imported,
+    "first request": served - created,
+    "openai imported": "openai" in sys.modules,
+}))
+"""
+
+
+def clean_env():
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    workdir = tempfile.mkdtemp()
+    env["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "startup.db")
+    env["METRICS_DIR"] = os.path.join(workdir, "metrics")
+    env["SUBMISSION_JOURNAL_PATH"] = os.path.join(workdir, "submissions.db")
+    return env
+
+
+def boot_times(env):
+    output = subprocess.run([sys.executable, "-c", BOOT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def cli_time(env, *args):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", *args], cwd=ROOT, env=env,
+                   capture_output=True, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    args = parser.parse_args()
+
+    env = clean_env()
+    best = {}
+    openai_imported = False
+    for _ in range(args.runs):
+        times = boot_times(env)
+        openai_imported |= times.pop("openai imported")
+        times["flask routes"] = cli_time(env, "routes")
+        times["flask db current"] = cli_time(env, "db", "current")
+        for step, seconds in times.items():
+            best[step] = min(seconds, best.get(step, seconds))
+
+    failed = openai_imported
+    print(f"{'step':<18} {'best ms':>9} {'budget ms':>10}")
+    for step, budget in BUDGETS.items():
+        over = best[step] > budget
+        failed |= over
+        print(f"{step:<18} {best[step] * 1000:>9.0f} {budget * 1000:>10.0f}{'  OVER' if over else ''}")
+    if openai_imported:
+        print("openai was imported while booting a worker")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# config.py
+"""Configuration objects for create_app().
+
+Settings are read from the environment when a config object is
+instantiated (after create_app() has loaded .env), not at import time.
+Paths left as None default to files under the app's instance folder.
+"""
+import os
+
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+def database_url():
+    url = os.getenv("DATABASE_URL", "sqlite:///database.db")
+    # Fix SSL issue on Render
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://")
+    return url
+
+
+class Config:
+    DEBUG = False
+    TESTING = False
+
+    def __init__(self):
+        self.SECRET_KEY = os.getenv("SECRET_KEY", 'change-this-to-a-random-secret-key')
+        self.SQLALCHEMY_DATABASE_URI = database_url()
+        self.SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+        # DB_PROFILE: "auto" (by URL), "sqlite-wal", "postgres-pooled" or "default".
+        # See db_profiles.py. Pool sizes are per worker process: keep
+        # workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) below Postgres max_connections.
+        self.DB_PROFILE = os.getenv("DB_PROFILE", "auto").lower()
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        self.DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+        self.DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        self.SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+        self.SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+        self.SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+        # SmartBot: SMARTBOT_BACKEND is "openai" or "stub" (canned local replies).
+        # OPENAI_BASE_URL points the openai backend at any compatible server.
+        self.SMARTBOT_BACKEND = os.getenv("SMARTBOT_BACKEND", "openai").lower()
+        self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+        self.OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+        # Client-side retries wait inside the request; admission control fails fast instead.
+        self.OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0"))
+        # Seconds before an upstream request is abandoned (and before a request
+        # waiting on an identical in-flight question stops waiting).
+        self.OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+        # Seconds the stub backend takes per reply (simulates a slow upstream).
+        self.SMARTBOT_STUB_DELAY = float(os.getenv("SMARTBOT_STUB_DELAY", "0"))
+        # Admission control for upstream calls (smartbot_admission.py):
+        # SMARTBOT_ADMISSION_BACKEND is "sqlite" (shared by all workers on the
+        # host), "memory" (one worker) or "none". Each user may burst
+        # SMARTBOT_USER_BURST calls, refilled at SMARTBOT_USER_RATE_PER_MINUTE;
+        # at most SMARTBOT_MAX_IN_FLIGHT calls wait on upstream at once.
+        self.SMARTBOT_ADMISSION_BACKEND = os.getenv("SMARTBOT_ADMISSION_BACKEND", "sqlite").lower()
+        self.SMARTBOT_ADMISSION_PATH = os.getenv("SMARTBOT_ADMISSION_PATH")
+        self.SMARTBOT_USER_RATE_PER_MINUTE = float(os.getenv("SMARTBOT_USER_RATE_PER_MINUTE", "6"))
+        self.SMARTBOT_USER_BURST = int(os.getenv("SMARTBOT_USER_BURST", "3"))
+        self.SMARTBOT_MAX_IN_FLIGHT = int(os.getenv("SMARTBOT_MAX_IN_FLIGHT", "8"))
+        self.SMARTBOT_SLOT_LEASE = float(os.getenv("SMARTBOT_SLOT_LEASE", "120"))
+        self.SMARTBOT_BUSY_RETRY_AFTER = int(os.getenv("SMARTBOT_BUSY_RETRY_AFTER", "2"))
+        # Retrieval: up to SMARTBOT_CONTEXT_CHUNKS excerpts of the notes most like
+        # the question (cosine score >= SMARTBOT_CONTEXT_MIN_SCORE) go into the
+        # system prompt, within SMARTBOT_CONTEXT_TOKENS tokens; 0 turns it off.
+        self.SMARTBOT_CONTEXT_TOKENS = int(os.getenv("SMARTBOT_CONTEXT_TOKENS", "600"))
+        self.SMARTBOT_CONTEXT_CHUNKS = int(os.getenv("SMARTBOT_CONTEXT_CHUNKS", "4"))
+        self.SMARTBOT_CONTEXT_MIN_SCORE = float(os.getenv("SMARTBOT_CONTEXT_MIN_SCORE", "0.1"))
+        self.NOTE_VECTORS_DIR = os.getenv("NOTE_VECTORS_DIR")
+        self.NOTE_VECTOR_DIM = int(os.getenv("NOTE_VECTOR_DIM", "2048"))
+        # SMARTBOT_CACHE_BACKEND: "memory" (per worker), "sqlite" (shared by all
+        # workers on the host) or "none".
+        self.SMARTBOT_CACHE_BACKEND = os.getenv("SMARTBOT_CACHE_BACKEND", "memory")
+        self.SMARTBOT_CACHE_PATH = os.getenv("SMARTBOT_CACHE_PATH")
+        self.SMARTBOT_CACHE_SIZE = int(os.getenv("SMARTBOT_CACHE_SIZE", "1024"))
+        self.SMARTBOT_CACHE_TTL = int(os.getenv("SMARTBOT_CACHE_TTL", "3600"))
+
+        self.UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(basedir, 'uploads'))
+        # NOTES_OFFLOAD hands note transfers to the front proxy once Python has
+        # authorized them: "x-sendfile" (Apache/lighttpd) or "x-accel-redirect"
+        # (nginx, with an internal location mapping NOTES_ACCEL_PREFIX to UPLOAD_FOLDER).
+        self.NOTES_OFFLOAD = os.getenv("NOTES_OFFLOAD", "").lower()
+        self.NOTES_ACCEL_PREFIX = os.getenv("NOTES_ACCEL_PREFIX", "/_protected_uploads/")
+
+        # Static assets (static_assets.py): rebuilt at startup when static/ is
+        # newer than the last `flask build-assets`; fingerprinted files are
+        # cached by browsers for ASSETS_MAX_AGE seconds.
+        self.ASSETS_AUTO_BUILD = os.getenv("ASSETS_AUTO_BUILD", "1") == "1"
+        self.ASSETS_MAX_AGE = int(os.getenv("ASSETS_MAX_AGE", str(365 * 24 * 3600)))
+
+        # Templates are compiled at startup (TEMPLATES_PRECOMPILE), with the
+        # bytecode cached in JINJA_CACHE_DIR, and never re-checked on disk
+        # (TEMPLATES_AUTO_RELOAD) outside development.
+        self.TEMPLATES_AUTO_RELOAD = False
+        self.TEMPLATES_PRECOMPILE = os.getenv("TEMPLATES_PRECOMPILE", "1") == "1"
+        self.JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR")
+
+        self.IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "30"))
+
+        self.AUTOSAVE_FLUSH_INTERVAL = float(os.getenv("AUTOSAVE_FLUSH_INTERVAL", "1.0"))
+        self.AUTOSAVE_MAX_PENDING = int(os.getenv("AUTOSAVE_MAX_PENDING", "500"))
+        # Seconds after an attempt's time limit that its submission still counts
+        # as on time (the auto-submit and the network take a moment).
+        self.EXAM_SUBMIT_GRACE = int(os.getenv("EXAM_SUBMIT_GRACE", "30"))
+
+        # SUBMISSION_MODE: "queue" journals submissions and grades them in batches
+        # on a background worker; "inline" grades inside the request.
+        self.SUBMISSION_MODE = os.getenv("SUBMISSION_MODE", "queue").lower()
+        self.SUBMISSION_BATCH_SIZE = int(os.getenv("SUBMISSION_BATCH_SIZE", "200"))
+        self.SUBMISSION_LEASE = float(os.getenv("SUBMISSION_LEASE", "30"))
+        self.SUBMISSION_JOURNAL_PATH = os.getenv("SUBMISSION_JOURNAL_PATH")
+        self.SUBMISSION_JOURNAL_SYNC = os.getenv("SUBMISSION_JOURNAL_SYNC", "FULL")
+
+        # Each worker writes its metrics to METRICS_DIR; /metrics sums all workers.
+        self.METRICS_DIR = os.getenv("METRICS_DIR")
+        self.METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+        # Unset: /metrics only answers direct requests from loopback.
+        self.METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+        self.SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+    def __init__(self):
+        super().__init__()
+        # Edited templates show up on the next request.
+        self.TEMPLATES_AUTO_RELOAD = True
+        self.TEMPLATES_PRECOMPILE = False
+
+
+class ProductionConfig(Config):
+    pass
+
+
+class TestingConfig(Config):
+    TESTING = True
+
+    def __init__(self):
+        super().__init__()
+        self.SQLALCHEMY_DATABASE_URI = os.getenv("TEST_DATABASE_URL", "sqlite://")
+        self.SMARTBOT_BACKEND = "stub"
+        self.SMARTBOT_CACHE_BACKEND = "memory"
+        self.SMARTBOT_ADMISSION_BACKEND = "memory"
+        self.SUBMISSION_MODE = "inline"
+        self.TEMPLATES_PRECOMPILE = False
+
+
+CONFIGS = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+    "testing": TestingConfig,
+}
@@ -0,0 +1,72 @@
+# db_profiles.py
+"""Named database engine profiles.
+
+A profile decides the SQLAlchemy engine options for create_app() and, on
+SQLite, the PRAGMAs every new connection runs:
+
+- "sqlite-wal": WAL journal (readers never block the writer),
+  synchronous=NORMAL, a busy timeout so concurrent writers wait instead
+  of failing with "database is locked", and memory-mapped reads.
+- "postgres-pooled": a connection pool sized for gunicorn workers x
+  threads, with pre-ping and recycling so connections dropped by the
+  server or a proxy are replaced instead of failing a request.
+- "default": SQLAlchemy's defaults (what the app used before profiles).
+
+"auto" picks sqlite-wal or postgres-pooled from the database URL.
+"""
+from sqlalchemy import event
+
+
+PROFILES = ("auto", "default", "sqlite-wal", "postgres-pooled")
+
+
+def resolve_profile(name, url):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE: {name!r} (expected one of {', '.join(PROFILES)})")
+    if name != "auto":
+        return name
+    if url.startswith("sqlite"):
+        return "sqlite-wal"
+    if url.startswith("postgresql"):
+        return "postgres-pooled"
+    return "default"
+
+
+def sqlite_pragmas(config):
+    return {
+        "journal_mode": "WAL",
+        "synchronous": config['SQLITE_SYNCHRONOUS'],
+        "busy_timeout": config['SQLITE_BUSY_TIMEOUT_MS'],
+        "mmap_size": config['SQLITE_MMAP_SIZE'],
+    }
+
+
+def engine_options(profile, config):
+    """SQLALCHEMY_ENGINE_OPTIONS for a resolved profile."""
+    if profile == "postgres-pooled":
+        return {
+            "pool_size": config['DB_POOL_SIZE'],
+            "max_overflow": config['DB_MAX_OVERFLOW'],
+            "pool_timeout": config['DB_POOL_TIMEOUT'],
+            "pool_recycle": config['DB_POOL_RECYCLE'],
+            "pool_pre_ping": True,
+        }
+    if profile == "sqlite-wal":
+        # pysqlite's own busy handler; the PRAGMA below sets the same timeout.
+        return {"connect_args": {"timeout": config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    return {}
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run pragmas on every new DBAPI connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
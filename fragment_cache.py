@@ -0,0 +1,37 @@
+# fragment_cache.py
+"""Per-worker cache for rendered fragments tied to a catalog version.
+
+Every entry belongs to the catalog version it was built for; the first
+lookup with a newer version drops everything cached for the old one.
+"""
+import threading
+
+
+class VersionedCache:
+    def __init__(self):
+        self._version = None
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, version, key, build):
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries = {}
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = build()
+        with self._lock:
+            if self._version == version:
+                self._entries[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._entries = {}
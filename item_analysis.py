@@ -0,0 +1,113 @@
+# item_analysis.py
+"""Classical item analysis over packed exam responses.
+
+All attempts for an exam are decoded at once into an attempts x questions
+matrix, and every statistic is computed with whole-matrix NumPy
+operations:
+
+- p-value: share of attempts that answered the question correctly
+- discrimination: point-biserial correlation between getting the question
+  right and the rest score (total score minus that question)
+- distractors: how often each option (or no answer) was picked
+"""
+import numpy as np
+
+from answer_keys import CHOICE_MASK, CORRECT_FLAG, RESPONSE_RECORD
+
+
+RESPONSE_DTYPE = np.dtype([('question_id', '<u4'), ('choice', 'u1')])
+CHOICE_SLOTS = CHOICE_MASK + 1
+
+assert RESPONSE_DTYPE.itemsize == RESPONSE_RECORD.size
+
+
+def analyze(packed_attempts):
+    """Analyze a sequence of packed attempts (bytes from grade_and_pack).
+
+    Returns {"attempts", "question_ids", "p_value", "discrimination",
+    "choice_counts"}; per-question arrays are aligned with question_ids and
+    choice_counts[j, c] counts choice c (0 = unanswered) for question j.
+    """
+    n_attempts = len(packed_attempts)
+    if not n_attempts:
+        return {
+            "attempts": 0,
+            "question_ids": np.empty(0, dtype=np.uint32),
+            "p_value": np.empty(0),
+            "discrimination": np.empty(0),
+            "choice_counts": np.empty((0, CHOICE_SLOTS), dtype=np.int64),
+        }
+
+    responses = np.frombuffer(b''.join(packed_attempts), dtype=RESPONSE_DTYPE)
+    per_attempt = np.fromiter((len(p) for p in packed_attempts), dtype=np.int64,
+                              count=n_attempts) // RESPONSE_DTYPE.itemsize
+    rows = np.repeat(np.arange(n_attempts), per_attempt)
+    # Map question ids to columns with a dense lookup table (ids are small
+    # autoincrement keys), which is much cheaper than sorting with np.unique.
+    ids = responses['question_id']
+    seen = np.zeros(int(ids.max()) + 1, dtype=bool)
+    seen[ids] = True
+    question_ids = np.flatnonzero(seen).astype(np.uint32)
+    cols = (np.cumsum(seen) - 1)[ids]
+    n_questions = len(question_ids)
+
+    choices = responses['choice']
+    presented = np.zeros((n_attempts, n_questions), dtype=np.float32)
+    presented[rows, cols] = 1.0
+    correct = np.zeros((n_attempts, n_questions), dtype=np.float32)
+    correct[rows, cols] = (choices & CORRECT_FLAG) != 0
+
+    shown = presented.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p_value = correct.sum(axis=0) / shown
+
+        # Masked point-biserial against the rest score, all questions at once.
+        rest = correct.sum(axis=1, keepdims=True) - correct
+        item_mean = (correct * presented).sum(axis=0) / shown
+        rest_mean = (rest * presented).sum(axis=0) / shown
+        item_dev = (correct - item_mean) * presented
+        rest_dev = (rest - rest_mean) * presented
+        covariance = (item_dev * rest_dev).sum(axis=0)
+        spread = np.sqrt((item_dev ** 2).sum(axis=0) * (rest_dev ** 2).sum(axis=0))
+        discrimination = covariance / spread
+
+    choice_counts = np.bincount(
+        cols * CHOICE_SLOTS + (choices & CHOICE_MASK),
+        minlength=n_questions * CHOICE_SLOTS
+    ).reshape(n_questions, CHOICE_SLOTS)
+
+    return {
+        "attempts": n_attempts,
+        "question_ids": question_ids,
+        "p_value": p_value,
+        "discrimination": discrimination,
+        "choice_counts": choice_counts,
+    }
+
+
+def _finite(value):
+    return None if not np.isfinite(value) else round(float(value), 4)
+
+
+def report(analysis, questions):
+    """JSON-ready per-question report; questions maps question id -> Question."""
+    items = []
+    for j, question_id in enumerate(analysis["question_ids"].tolist()):
+        counts = analysis["choice_counts"][j]
+        question = questions.get(question_id)
+        options = ([question.option1, question.option2, question.option3, question.option4]
+                   if question else ['Option 1', 'Option 2', 'Option 3', 'Option 4'])
+        items.append({
+            "question_id": question_id,
+            "question_text": question.question_text if question else None,
+            "p_value": _finite(analysis["p_value"][j]),
+            "discrimination": _finite(analysis["discrimination"][j]),
+            "unanswered": int(counts[0]),
+            "unrecognized": int(counts[CHOICE_MASK]),
+            "distractors": [
+                {"option": option, "count": int(counts[number]),
+                 "correct": bool(question and option == question.correct_option)}
+                for number, option in enumerate(options, start=1)
+            ],
+        })
+    return {"attempts": analysis["attempts"], "questions": items}
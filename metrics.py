@@ -0,0 +1,272 @@
+# metrics.py
+"""Minimal Prometheus-style counters and histograms that aggregate across workers.
+
+Each process keeps its metrics in memory and periodically writes a
+snapshot to its own file in a shared directory (one file per process,
+named after its pid and start time). /metrics merges every snapshot in
+the directory, so any gunicorn worker answers with totals for all of
+them. When a worker has exited, the next scrape folds its file into
+retired.json, so counters never go backwards and the directory does not
+grow with every restart. (Liveness is checked by pid, so the directory
+must not be shared between hosts.)
+"""
+import fcntl
+import glob
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+RETIRED = "retired.json"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Counter:
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with self.registry.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Histogram:
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self.values = {}
+
+    def observe(self, value, *labels):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.registry.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        # A forked worker must not re-report what its parent already recorded.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self.lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric.values = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {name: [[list(labels), value if isinstance(value, (int, float)) else list(value)]
+                           for labels, value in metric.values.items()]
+                    for name, metric in self.metrics.items()}
+
+
+def merge(snapshots):
+    """Sum snapshots series by series: {name: {labels tuple: value}}."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            target = merged.setdefault(name, {})
+            for labels, value in series:
+                labels = tuple(labels)
+                current = target.get(labels)
+                if current is None:
+                    target[labels] = value
+                elif isinstance(value, list):
+                    target[labels] = [a + b for a, b in zip(current, value)]
+                else:
+                    target[labels] = current + value
+    return merged
+
+
+def as_snapshot(merged):
+    """The inverse of merge() for a single snapshot."""
+    return {name: [[list(labels), value] for labels, value in series.items()]
+            for name, series in merged.items()}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(registry, merged):
+    """Prometheus text exposition format for the registry's metrics."""
+    lines = []
+    for name, metric in registry.metrics.items():
+        series = merged.get(name, {})
+        kind = "histogram" if isinstance(metric, Histogram) else "counter"
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series.items()):
+            if kind == "counter":
+                lines.append(f"{name}{_label_text(metric.labelnames, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                le = (("le", _number(float(bound))),)
+                lines.append(f"{name}_bucket{_label_text(metric.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(metric.labelnames, labels)} {_number(float(value[-1]))}")
+            lines.append(f"{name}_count{_label_text(metric.labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class SnapshotExporter:
+    """Writes this process's snapshot to directory every interval seconds."""
+
+    def __init__(self, registry, directory, interval=5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._path = None
+        self._pid = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _own_path(self):
+        if self._pid != os.getpid():
+            # A forked worker starts its own file rather than overwriting its parent's.
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f"{self._pid}-{time.time_ns()}.json")
+        return self._path
+
+    def start(self):
+        """Start this process's writer thread (threads do not survive a fork)."""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name='metrics-writer', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.write()
+
+    def write(self):
+        path = self._own_path()
+        try:
+            self._write_json(path, self.registry.snapshot())
+        except OSError:
+            logger.exception("Writing metrics snapshot %s failed", path)
+
+    def _write_json(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def retire_dead(self):
+        """Fold the snapshots of exited processes into retired.json and delete them."""
+        retired_path = os.path.join(self.directory, RETIRED)
+        with open(os.path.join(self.directory, "retire.lock"), "a") as lock:
+            # One process at a time, or two scrapes could both count a dead file.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, "*-*.json")):
+                pid = os.path.basename(path).split("-", 1)[0]
+                if pid.isdigit() and not _pid_alive(int(pid)):
+                    dead.append(path)
+            if not dead:
+                return
+            try:
+                with open(retired_path) as f:
+                    retired = json.load(f)
+            except FileNotFoundError:
+                retired = {"absorbed": [], "metrics": {}}
+            # Files a crashed pass merged but did not delete are only deleted.
+            absorbed = set(retired["absorbed"])
+            snapshots = [retired["metrics"]]
+            for path in dead:
+                if os.path.basename(path) in absorbed:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except ValueError:
+                    logger.warning("Dropping unreadable metrics snapshot %s", path)
+            self._write_json(retired_path, {
+                "absorbed": sorted(os.path.basename(path) for path in dead),
+                "metrics": as_snapshot(merge(snapshots)),
+            })
+            for path in dead:
+                os.unlink(path)
+
+    def collect(self):
+        """Merged snapshots of every process, with this process's written fresh."""
+        self.write()
+        try:
+            self.retire_dead()
+        except OSError:
+            logger.exception("Retiring metrics snapshots in %s failed", self.directory)
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append(snapshot["metrics"] if os.path.basename(path) == RETIRED else snapshot)
+        return merge(snapshots)
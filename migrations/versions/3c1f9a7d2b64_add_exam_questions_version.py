@@ -0,0 +1,26 @@
+"""add exam questions_version
+
+Revision ID: 3c1f9a7d2b64
+Revises: 753549096506
+Create Date: 2026-10-17 09:12:40.118230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a7d2b64'
+down_revision = '753549096506'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exam', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('questions_version', sa.String(length=32), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('exam', schema=None) as batch_op:
+        batch_op.drop_column('questions_version')
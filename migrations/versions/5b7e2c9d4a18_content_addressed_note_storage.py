@@ -0,0 +1,37 @@
+"""content addressed note storage
+
+Revision ID: 5b7e2c9d4a18
+Revises: a9e4d0c7f215
+Create Date: 2026-10-17 11:27:03.884512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c9d4a18'
+down_revision = 'a9e4d0c7f215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('note_blob',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    with op.batch_alter_table('note', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('size', sa.BigInteger(), nullable=True))
+        batch_op.create_index('ix_note_content_hash', ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('note', schema=None) as batch_op:
+        batch_op.drop_index('ix_note_content_hash')
+        batch_op.drop_column('size')
+        batch_op.drop_column('content_hash')
+    op.drop_table('note_blob')
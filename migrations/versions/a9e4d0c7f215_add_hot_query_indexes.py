@@ -0,0 +1,36 @@
+"""add hot query indexes and unique result per user and exam
+
+Revision ID: a9e4d0c7f215
+Revises: 3c1f9a7d2b64
+Create Date: 2026-10-17 10:02:19.551904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4d0c7f215'
+down_revision = '3c1f9a7d2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep only the first attempt per (user, exam) so the unique index can be built.
+    op.execute(
+        "DELETE FROM result WHERE id NOT IN ("
+        " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM result GROUP BY user_id, exam_id) AS firsts)"
+    )
+
+    op.create_index('ix_question_exam_id', 'question', ['exam_id'], unique=False)
+    op.create_index('uq_result_user_exam', 'result', ['user_id', 'exam_id'], unique=True)
+    op.create_index('ix_result_exam_id_score', 'result', ['exam_id', 'score'], unique=False)
+    op.create_index('ix_note_upload_date', 'note', ['upload_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_note_upload_date', table_name='note')
+    op.drop_index('ix_result_exam_id_score', table_name='result')
+    op.drop_index('uq_result_user_exam', table_name='result')
+    op.drop_index('ix_question_exam_id', table_name='question')
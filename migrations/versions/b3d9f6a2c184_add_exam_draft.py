@@ -0,0 +1,35 @@
+"""add exam draft
+
+Revision ID: b3d9f6a2c184
+Revises: f7c2e8a1b390
+Create Date: 2026-10-17 16:02:11.418206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d9f6a2c184'
+down_revision = 'f7c2e8a1b390'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exam_draft',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.Column('answers', sa.JSON(), nullable=False),
+    sa.Column('seq', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['exam_id'], ['exam.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'exam_id')
+    )
+    op.create_index('ix_exam_draft_exam_id', 'exam_draft', ['exam_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_exam_draft_exam_id', table_name='exam_draft')
+    op.drop_table('exam_draft')
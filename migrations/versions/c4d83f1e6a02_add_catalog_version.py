@@ -0,0 +1,29 @@
+"""add catalog version
+
+Revision ID: c4d83f1e6a02
+Revises: 5b7e2c9d4a18
+Create Date: 2026-10-17 12:40:55.207316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d83f1e6a02'
+down_revision = '5b7e2c9d4a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalog_version, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
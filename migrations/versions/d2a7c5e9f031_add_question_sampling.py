@@ -0,0 +1,48 @@
+"""add question sampling
+
+Revision ID: d2a7c5e9f031
+Revises: b3d9f6a2c184
+Create Date: 2026-10-17 01:04:21.485642
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7c5e9f031'
+down_revision = 'b3d9f6a2c184'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exam_attempt',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.Column('question_ids', sa.LargeBinary(), nullable=False),
+    sa.Column('drawn_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['exam_id'], ['exam.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'exam_id')
+    )
+    op.create_index('ix_exam_attempt_exam_id', 'exam_attempt', ['exam_id'], unique=False)
+
+    with op.batch_alter_table('exam', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sample_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('sample_by_tag', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tag', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_column('tag')
+
+    with op.batch_alter_table('exam', schema=None) as batch_op:
+        batch_op.drop_column('sample_by_tag')
+        batch_op.drop_column('sample_size')
+
+    op.drop_index('ix_exam_attempt_exam_id', table_name='exam_attempt')
+    op.drop_table('exam_attempt')
@@ -0,0 +1,61 @@
+"""add exam stats
+
+Revision ID: e1a5b6c3d927
+Revises: c4d83f1e6a02
+Create Date: 2026-10-17 13:58:12.640021
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a5b6c3d927'
+down_revision = 'c4d83f1e6a02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    exam_stats = op.create_table('exam_stats',
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.BigInteger(), nullable=False),
+    sa.Column('total_squares', sa.BigInteger(), nullable=False),
+    sa.Column('min_score', sa.Integer(), nullable=True),
+    sa.Column('max_score', sa.Integer(), nullable=True),
+    sa.Column('histogram', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['exam_id'], ['exam.id'], ),
+    sa.PrimaryKeyConstraint('exam_id')
+    )
+
+    # Backfill from existing results.
+    rows = op.get_bind().execute(sa.text(
+        "SELECT exam_id, score, COUNT(*) FROM result GROUP BY exam_id, score"
+    )).all()
+    per_exam = {}
+    for exam_id, score, times in rows:
+        per_exam.setdefault(exam_id, []).append((score, times))
+
+    backfill = []
+    for exam_id, scores in per_exam.items():
+        histogram = [0] * (max(score for score, _ in scores) + 1)
+        for score, times in scores:
+            histogram[score] = times
+        backfill.append({
+            'exam_id': exam_id,
+            'count': sum(times for _, times in scores),
+            'total': sum(score * times for score, times in scores),
+            'total_squares': sum(score * score * times for score, times in scores),
+            'min_score': min(score for score, _ in scores),
+            'max_score': max(score for score, _ in scores),
+            'histogram': json.dumps(histogram),
+        })
+    if backfill:
+        op.bulk_insert(exam_stats, backfill)
+
+
+def downgrade():
+    op.drop_table('exam_stats')
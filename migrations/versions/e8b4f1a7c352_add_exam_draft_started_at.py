@@ -0,0 +1,30 @@
+"""add exam draft started_at
+
+Revision ID: e8b4f1a7c352
+Revises: d2a7c5e9f031
+Create Date: 2026-10-17 02:10:37.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4f1a7c352'
+down_revision = 'd2a7c5e9f031'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exam_draft', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('started_at', sa.DateTime(), nullable=True))
+    # Attempts already in progress: the earliest time we know of.
+    op.execute("UPDATE exam_draft SET started_at = updated_at")
+    with op.batch_alter_table('exam_draft', schema=None) as batch_op:
+        batch_op.alter_column('started_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('exam_draft', schema=None) as batch_op:
+        batch_op.drop_column('started_at')
@@ -0,0 +1,28 @@
+"""store unsampled exam attempts
+
+Revision ID: f3a8c1d6e095
+Revises: e8b4f1a7c352
+Create Date: 2026-10-17 03:12:48.530217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d6e095'
+down_revision = 'e8b4f1a7c352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NULL question_ids: the attempt was served every question of the exam.
+    with op.batch_alter_table('exam_attempt', schema=None) as batch_op:
+        batch_op.alter_column('question_ids', existing_type=sa.LargeBinary(), nullable=True)
+
+
+def downgrade():
+    op.execute("DELETE FROM exam_attempt WHERE question_ids IS NULL")
+    with op.batch_alter_table('exam_attempt', schema=None) as batch_op:
+        batch_op.alter_column('question_ids', existing_type=sa.LargeBinary(), nullable=False)
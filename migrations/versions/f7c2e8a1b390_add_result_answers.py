@@ -0,0 +1,33 @@
+"""add result answers
+
+Revision ID: f7c2e8a1b390
+Revises: e1a5b6c3d927
+Create Date: 2026-10-17 15:21:47.093318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c2e8a1b390'
+down_revision = 'e1a5b6c3d927'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('result_answers',
+    sa.Column('result_id', sa.Integer(), nullable=False),
+    sa.Column('exam_id', sa.Integer(), nullable=False),
+    sa.Column('answers', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['exam_id'], ['exam.id'], ),
+    sa.ForeignKeyConstraint(['result_id'], ['result.id'], ),
+    sa.PrimaryKeyConstraint('result_id')
+    )
+    op.create_index('ix_result_answers_exam_id', 'result_answers', ['exam_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_result_answers_exam_id', table_name='result_answers')
+    op.drop_table('result_answers')
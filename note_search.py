@@ -0,0 +1,160 @@
+# note_search.py
+"""Full-text search over uploaded notes.
+
+Text is extracted from PDFs (with pypdf, if installed) and plain-text
+files, then stored in a SQLite FTS5 table or, on Postgres, a table with a
+generated ``tsvector`` column and a GIN index. Both tables are created on
+first use, so ``flask init-db`` setups get them too; migrations/env.py
+keeps them out of autogenerate.
+"""
+import os
+
+from markupsafe import escape
+from sqlalchemy import text
+
+
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.json', '.html', '.htm', '.py', '.sql'}
+MAX_INDEXED_CHARS = 2_000_000
+SEARCH_TABLES = ('note_fts', 'note_search')
+
+# Private-use characters mark highlights until the snippet has been escaped.
+_MARK_START = '\ue000'
+_MARK_END = '\ue001'
+
+
+def extract_text(path, filename):
+    """Best-effort plain text of a stored note; '' when the type is unsupported."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.pdf':
+        # Imported here: pypdf is optional and slow to import, and only the
+        # background indexer needs it.
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return ''
+        parts = []
+        length = 0
+        for page in PdfReader(path).pages:
+            page_text = page.extract_text() or ''
+            parts.append(page_text)
+            length += len(page_text)
+            if length >= MAX_INDEXED_CHARS:
+                break
+        return '\n'.join(parts)[:MAX_INDEXED_CHARS]
+    if extension in TEXT_EXTENSIONS:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return f.read(MAX_INDEXED_CHARS)
+    return ''
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and turn the highlight markers into <mark> tags."""
+    return str(escape(snippet)).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+class SearchIndex:
+    def __init__(self, engine):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self._ready = False
+
+    def ensure_schema(self):
+        if self._ready:
+            return
+        with self.engine.begin() as conn:
+            if self.dialect == 'postgresql':
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS note_search ("
+                    " note_id INTEGER PRIMARY KEY,"
+                    " title TEXT NOT NULL,"
+                    " body TEXT NOT NULL,"
+                    " document tsvector GENERATED ALWAYS AS ("
+                    "  setweight(to_tsvector('english', title), 'A') ||"
+                    "  setweight(to_tsvector('english', body), 'B')) STORED)"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_note_search_document"
+                    " ON note_search USING gin (document)"
+                ))
+            else:
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts"
+                    " USING fts5(title, body, tokenize = 'porter unicode61')"
+                ))
+        self._ready = True
+
+    def upsert(self, note_id, title, body):
+        """Index a note's text; returns False (and indexes nothing) if the note is gone.
+
+        The note's existence is checked inside the write transaction, so a
+        delete committed before it wins, and one committed after it is
+        followed by the deleter's remove().
+        """
+        self.ensure_schema()
+        params = {"note_id": note_id, "title": title, "body": body}
+        with self.engine.begin() as conn:
+            if self.dialect == 'postgresql':
+                # FOR SHARE makes a concurrent delete of the note wait for this commit.
+                if conn.execute(text("SELECT 1 FROM note WHERE id = :note_id FOR SHARE"), params).first() is None:
+                    return False
+                conn.execute(text(
+                    "INSERT INTO note_search (note_id, title, body) VALUES (:note_id, :title, :body)"
+                    " ON CONFLICT (note_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body"
+                ), params)
+            else:
+                # The DELETE takes SQLite's write lock before the existence check.
+                conn.execute(text("DELETE FROM note_fts WHERE rowid = :note_id"), params)
+                inserted = conn.execute(text(
+                    "INSERT INTO note_fts (rowid, title, body)"
+                    " SELECT :note_id, :title, :body WHERE EXISTS (SELECT 1 FROM note WHERE id = :note_id)"
+                ), params)
+                if not inserted.rowcount:
+                    return False
+        return True
+
+    def indexed_ids(self):
+        self.ensure_schema()
+        query = 'SELECT note_id FROM note_search' if self.dialect == 'postgresql' else 'SELECT rowid FROM note_fts'
+        with self.engine.connect() as conn:
+            return set(conn.execute(text(query)).scalars())
+
+    def remove(self, note_id):
+        self.ensure_schema()
+        table = 'note_search WHERE note_id' if self.dialect == 'postgresql' else 'note_fts WHERE rowid'
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {table} = :note_id"), {"note_id": note_id})
+
+    def search(self, query, limit=20):
+        """Return [(note_id, highlighted snippet, score)] best match first."""
+        self.ensure_schema()
+        terms = query.split()
+        if not terms:
+            return []
+
+        with self.engine.connect() as conn:
+            if self.dialect == 'postgresql':
+                rows = conn.execute(text(
+                    "SELECT note_id,"
+                    " ts_headline('english', body, q, :options) AS snippet,"
+                    " ts_rank(document, q) AS score"
+                    " FROM note_search, websearch_to_tsquery('english', :query) AS q"
+                    " WHERE document @@ q ORDER BY score DESC LIMIT :limit"
+                ), {
+                    "query": query,
+                    "limit": limit,
+                    "options": f"StartSel={_MARK_START}, StopSel={_MARK_END}, "
+                               "MaxFragments=2, MaxWords=20, MinWords=5",
+                }).all()
+            else:
+                # Quote every term so user input can never be FTS5 syntax; the
+                # last term also matches as a prefix for search-as-you-type.
+                match = ' '.join('"' + t.replace('"', '""') + '"' for t in terms) + '*'
+                rows = conn.execute(text(
+                    "SELECT rowid,"
+                    " snippet(note_fts, -1, :start, :end, '…', 16) AS snippet,"
+                    " -bm25(note_fts, 4.0, 1.0) AS score"
+                    " FROM note_fts WHERE note_fts MATCH :match"
+                    " ORDER BY bm25(note_fts, 4.0, 1.0) LIMIT :limit"
+                ), {"match": match, "start": _MARK_START, "end": _MARK_END, "limit": limit}).all()
+
+        return [(row[0], highlight(row[1] or ''), float(row[2])) for row in rows]
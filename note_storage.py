@@ -0,0 +1,100 @@
+# note_storage.py
+"""Content-addressed storage for uploaded notes.
+
+Uploads are copied in fixed-size chunks into a temp file while their
+SHA-256 is computed, then atomically renamed to ``blobs/<aa>/<sha256>``.
+Identical files therefore share one blob on disk; the database keeps a
+reference count per blob (see NoteBlob in app.py) so a blob is only
+removed when its last note is deleted.
+
+Putting a blob in place and recording its reference happen under the
+blob's lock (``storing()``); deleting a blob re-checks its row under the
+same lock (``lock()``), so a delete can never remove a file that an
+upload has just stored but not yet committed.
+"""
+import fcntl
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.lock_dir = os.path.join(root, 'locks')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    @contextmanager
+    def lock(self, digest):
+        """Hold the blob's lock across processes (one lock file per digest prefix)."""
+        with open(os.path.join(self.lock_dir, digest[:2]), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self, stream, chunk_size=CHUNK_SIZE):
+        """Store a readable binary stream; return (sha256 hex digest, size in bytes)."""
+        with self.storing(stream, chunk_size) as stored:
+            return stored
+
+    @contextmanager
+    def storing(self, stream, chunk_size=CHUNK_SIZE):
+        """Store a stream and yield (sha256 hex digest, size in bytes) with the
+        blob's lock held; commit the reference to it before leaving the block."""
+        sha256 = hashlib.sha256()
+        size = 0
+        # The temp file lives under root so the final rename never crosses filesystems.
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+
+            digest = sha256.hexdigest()
+            final_path = self.path_for(digest)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            # mkstemp creates the file 0600; blobs get the usual upload mode.
+            os.chmod(tmp_path, 0o644)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self.lock(digest):
+            # Rename over any existing copy: the content is identical. A delete
+            # that saw no reference has finished by now, so nothing removes the
+            # file until the caller's reference is committed and released again.
+            try:
+                os.replace(tmp_path, final_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            yield digest, size
+
+    def delete(self, digest):
+        try:
+            os.remove(self.path_for(digest))
+        except FileNotFoundError:
+            pass
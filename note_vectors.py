@@ -0,0 +1,251 @@
+# note_vectors.py
+"""Chunked vector index over note text, for SmartBot retrieval.
+
+Each note is split into overlapping chunks of CHUNK_WORDS words. A chunk
+becomes a signed feature-hashed vector of its log term frequencies
+(stable crc32 hashing, stop words dropped), L2-normalized, so no
+vocabulary is kept and notes can be added or removed one at a time.
+
+Vectors are the rows of a float32 file that every worker memory-maps;
+chunk text and row bookkeeping live in a small SQLite file next to it,
+whose write lock also serializes writers across workers. A query is one
+matrix-vector product over the mapped rows plus an argpartition.
+
+Removing a note zeroes its rows (they can no longer score above 0) and
+frees them for later chunks; the file only ever grows, because shrinking
+it under another worker's mapping would crash that worker.
+"""
+import math
+import os
+import re
+import zlib
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from sqlite_state import ForkSafeSQLite
+
+
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+
+Chunk = namedtuple('Chunk', 'note_id title text score')
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers him his how i if in into is it its just me more most my no nor not of off on
+once only or other our out over own same she should so some such than that the their them then there
+these they this those through to too under until up very was we were what when where which while who
+whom why will with would you your
+""".split())
+
+
+def tokens(text):
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOP_WORDS]
+
+
+def chunk_text(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    words = text.split()
+    step = size - overlap
+    return [' '.join(words[start:start + size])
+            for start in range(0, max(len(words) - overlap, 1), step)
+            if words[start:start + size]]
+
+
+def estimate_tokens(text):
+    """Rough model token count (about 4 characters per token in English)."""
+    return len(text) // 4 + 1
+
+
+class NoteVectorIndex:
+    def __init__(self, directory, dim=2048):
+        if dim & (dim - 1):
+            raise ValueError("NOTE_VECTOR_DIM must be a power of two")
+        self.dim = dim
+        self.row_bytes = dim * 4
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, 'vectors.f32')
+        self.db_path = os.path.join(directory, 'chunks.db')
+        self._db = ForkSafeSQLite(self.db_path)
+        # One mapping per process too, shared by all threads.
+        self._map = None
+        self._map_rows = 0
+        self._map_pid = None
+        with self._db.lock:
+            conn = self._db.connect()
+            stored_dim = conn.execute("PRAGMA user_version").fetchone()[0]
+            if stored_dim and stored_dim != dim:
+                raise ValueError(f"{self.db_path} holds {stored_dim}-dimensional vectors, not {dim}; "
+                                 "delete the directory and run `flask reindex-notes`.")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk ("
+                " row INTEGER PRIMARY KEY,"
+                " note_id INTEGER NOT NULL,"
+                " title TEXT NOT NULL,"
+                " text TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_chunk_note_id ON chunk (note_id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS free_row (row INTEGER PRIMARY KEY)")
+            # Every indexed note, including those whose text gave no chunks.
+            conn.execute("CREATE TABLE IF NOT EXISTS indexed_note (note_id INTEGER PRIMARY KEY)")
+            conn.execute("INSERT OR IGNORE INTO indexed_note (note_id) SELECT DISTINCT note_id FROM chunk")
+            conn.execute(f"PRAGMA user_version = {dim}")
+
+    def vectorize(self, texts):
+        """(len(texts), dim) float32 matrix of L2-normalized hashed log-TF vectors."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        mask = self.dim - 1
+        for i, text in enumerate(texts):
+            for token, count in Counter(tokens(text)).items():
+                h = zlib.crc32(token.encode())
+                weight = 1.0 + math.log(count)
+                matrix[i, h & mask] += weight if h & 0x80000000 else -weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    # ---------- Writing ----------
+    def add(self, note_id, title, text, still_exists=None):
+        """Index a note's text, replacing whatever was indexed for it before.
+
+        still_exists() is called under the write lock; if it returns False
+        nothing is indexed, so a delete that ran meanwhile is not undone.
+        """
+        chunks = chunk_text(text)
+        # The title goes into every chunk's vector, so it helps match all of them.
+        vectors = self.vectorize([f"{title} {chunk}" for chunk in chunks])
+        with self._db.lock:
+            conn = self._db.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._remove(conn, note_id)
+                if still_exists is not None and not still_exists():
+                    conn.execute("COMMIT")
+                    return 0
+                rows = [row for (row,) in conn.execute(
+                    "SELECT row FROM free_row ORDER BY row LIMIT ?", (len(chunks),))]
+                conn.executemany("DELETE FROM free_row WHERE row = ?", [(row,) for row in rows])
+                end = self._file_rows()
+                rows += range(end, end + len(chunks) - len(rows))
+                self._write_rows(rows, vectors)
+                conn.executemany(
+                    "INSERT INTO chunk (row, note_id, title, text) VALUES (?, ?, ?, ?)",
+                    [(row, note_id, title, chunk) for row, chunk in zip(rows, chunks)]
+                )
+                conn.execute("INSERT INTO indexed_note (note_id) VALUES (?)", (note_id,))
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return len(chunks)
+
+    def remove(self, note_id):
+        with self._db.lock:
+            conn = self._db.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._remove(conn, note_id)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _remove(self, conn, note_id):
+        conn.execute("DELETE FROM indexed_note WHERE note_id = ?", (note_id,))
+        rows = [row for (row,) in conn.execute("SELECT row FROM chunk WHERE note_id = ?", (note_id,))]
+        if not rows:
+            return
+        self._write_rows(rows, np.zeros((len(rows), self.dim), dtype=np.float32))
+        conn.execute("DELETE FROM chunk WHERE note_id = ?", (note_id,))
+        conn.executemany("INSERT OR IGNORE INTO free_row (row) VALUES (?)", [(row,) for row in rows])
+
+    def clear(self):
+        """Remove every note. The file is zeroed, never truncated: other workers have it mapped."""
+        with self._db.lock:
+            conn = self._db.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._file_rows()
+                if rows:
+                    with open(self.vectors_path, 'r+b') as f:
+                        zeros = bytes(self.row_bytes * 256)
+                        for start in range(0, rows, 256):
+                            f.write(zeros[:self.row_bytes * min(256, rows - start)])
+                conn.execute("DELETE FROM chunk")
+                conn.execute("DELETE FROM indexed_note")
+                conn.execute("DELETE FROM free_row")
+                conn.executemany("INSERT INTO free_row (row) VALUES (?)", ((row,) for row in range(rows)))
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _file_rows(self):
+        try:
+            return os.path.getsize(self.vectors_path) // self.row_bytes
+        except FileNotFoundError:
+            return 0
+
+    def _write_rows(self, rows, vectors):
+        with open(self.vectors_path, 'r+b' if os.path.exists(self.vectors_path) else 'w+b') as f:
+            for row, vector in zip(rows, vectors):
+                f.seek(row * self.row_bytes)
+                f.write(vector.tobytes())
+
+    # ---------- Reading ----------
+    def _matrix(self):
+        """The mapped vector file, remapped when another worker has grown or rebuilt it."""
+        rows = self._file_rows()
+        with self._db.lock:
+            if self._map is None or self._map_rows != rows or self._map_pid != os.getpid():
+                self._map = (np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+                             if rows else None)
+                self._map_rows, self._map_pid = rows, os.getpid()
+            return self._map
+
+    def search(self, query, k=4, min_score=0.1):
+        """Top-k chunks by cosine similarity to query, best first."""
+        query_vector = self.vectorize([query])[0]
+        matrix = self._matrix()
+        if matrix is None or not query_vector.any():
+            return []
+        scores = matrix @ query_vector
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        top = [int(row) for row in top if scores[row] >= min_score]
+        if not top:
+            return []
+        with self._db.lock:
+            found = {row: (note_id, title, text) for row, note_id, title, text in self._db.connect().execute(
+                f"SELECT row, note_id, title, text FROM chunk WHERE row IN ({','.join('?' * len(top))})", top
+            )}
+        # A row missing here was removed (or not committed yet) since the product was taken.
+        return [Chunk(*found[row], float(scores[row])) for row in top if row in found]
+
+    def context(self, query, token_budget, k=4, min_score=0.1):
+        """The best chunks for query as "[title] text" excerpts, fitting within token_budget."""
+        excerpts = []
+        for chunk in self.search(query, k=k, min_score=min_score):
+            excerpt = f"[{chunk.title}] {chunk.text}"
+            cost = estimate_tokens(excerpt)
+            if cost <= token_budget:
+                excerpts.append(excerpt)
+                token_budget -= cost
+        return "\n\n".join(excerpts)
+
+    def note_ids(self):
+        """Ids of every note indexed here (this directory is per host, unlike the database)."""
+        with self._db.lock:
+            conn = self._db.connect()
+            return {note_id for (note_id,) in conn.execute("SELECT note_id FROM indexed_note")}
+
+    def stats(self):
+        with self._db.lock:
+            conn = self._db.connect()
+            chunks, notes = conn.execute("SELECT COUNT(*), COUNT(DISTINCT note_id) FROM chunk").fetchone()
+            free = conn.execute("SELECT COUNT(*) FROM free_row").fetchone()[0]
+        return {"notes": notes, "chunks": chunks, "rows": self._file_rows(), "free_rows": free,
+                "dim": self.dim, "bytes": self._file_rows() * self.row_bytes}
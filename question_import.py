@@ -0,0 +1,173 @@
+# question_import.py
+"""Streaming parsers and validation for bulk question import.
+
+Files are read incrementally: CSV through csv.DictReader, JSON either as a
+top-level array decoded one object at a time or as JSON Lines. Nothing
+here touches the database; see import_questions() in app.py.
+"""
+import codecs
+import csv
+import io
+import json
+
+
+QUESTION_FIELDS = ('question_text', 'option1', 'option2', 'option3', 'option4', 'correct_option')
+FIELD_LENGTHS = {
+    'question_text': 500,
+    'option1': 200,
+    'option2': 200,
+    'option3': 200,
+    'option4': 200,
+    'correct_option': 200,
+    'tag': 50,
+}
+OPTIONAL_FIELDS = ('tag',)
+IMPORT_FORMATS = ('csv', 'json')
+
+_JSON_CHUNK_SIZE = 65536
+
+
+class ImportFormatError(ValueError):
+    """The file itself cannot be parsed (as opposed to a single bad row)."""
+
+
+def detect_format(filename, explicit=None):
+    fmt = (explicit or filename.rsplit('.', 1)[-1]).lower()
+    if fmt in ('jsonl', 'ndjson'):
+        fmt = 'json'
+    if fmt not in IMPORT_FORMATS:
+        raise ImportFormatError("File must be .csv or .json (or pass the format explicitly).")
+    return fmt
+
+
+def validate_question(row):
+    """Return (values, error) for one raw row; exactly one of them is None."""
+    if not isinstance(row, dict):
+        return None, "Row must be an object with question fields."
+
+    values = {}
+    for field in QUESTION_FIELDS:
+        value = row.get(field)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            return None, f"Missing {field}."
+        if len(value) > FIELD_LENGTHS[field]:
+            return None, f"{field} is longer than {FIELD_LENGTHS[field]} characters."
+        values[field] = value
+
+    for field in OPTIONAL_FIELDS:
+        value = row.get(field)
+        value = '' if value is None else str(value).strip()
+        if len(value) > FIELD_LENGTHS[field]:
+            return None, f"{field} is longer than {FIELD_LENGTHS[field]} characters."
+        values[field] = value or None
+
+    options = [values['option1'], values['option2'], values['option3'], values['option4']]
+    if values['correct_option'] not in options:
+        return None, "Correct Option must exactly match one of the four options."
+    return values, None
+
+
+def iter_csv_rows(stream):
+    reader = csv.DictReader(_csv_lines(stream))
+    try:
+        fieldnames = reader.fieldnames or []
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFormatError(f"CSV header cannot be read: {_describe(e)}") from e
+    missing = [f for f in QUESTION_FIELDS if f not in fieldnames]
+    if missing:
+        raise ImportFormatError(f"CSV header is missing: {', '.join(missing)}")
+    row_number = 0
+    try:
+        for row_number, row in enumerate(reader, start=1):
+            yield row
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Row numbers match import_questions(): 1-based, not counting the header.
+        raise ImportFormatError(f"Row {row_number + 1} cannot be read: {_describe(e)}") from e
+
+
+def iter_json_rows(stream):
+    """Yield objects from a JSON array or JSON Lines file without loading it whole."""
+    text = _text(stream)
+    try:
+        yield from _decode_json_rows(text)
+    except UnicodeDecodeError as e:
+        raise ImportFormatError(f"JSON file cannot be read: {_describe(e)}") from e
+
+
+def _decode_json_rows(text):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    in_array = None
+    eof = False
+    decoded = 0
+
+    while True:
+        # Skip whitespace and separators, reading more input as needed.
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = buffer[pos:] + text.read(_JSON_CHUNK_SIZE), 0
+            eof = pos == len(buffer)
+
+        if pos >= len(buffer):
+            if in_array:
+                raise ImportFormatError("JSON array is not closed.")
+            return
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        if in_array and buffer[pos] == ']':
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ImportFormatError(f"Invalid JSON after item {decoded}.")
+            chunk = text.read(_JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        # A number split across chunks decodes "successfully" but short.
+        if end == len(buffer) and not eof:
+            chunk = text.read(_JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield obj
+        decoded += 1
+        pos = end
+
+
+def iter_rows(stream, fmt):
+    return iter_csv_rows(stream) if fmt == 'csv' else iter_json_rows(stream)
+
+
+def _text(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def _csv_lines(stream):
+    """Decode line by line, so a bad byte fails the row that contains it."""
+    if isinstance(stream, io.TextIOBase):
+        yield from stream
+        return
+    first = True
+    for line in stream:
+        if first:
+            line, first = line.removeprefix(codecs.BOM_UTF8), False
+        yield line.decode('utf-8')
+
+
+def _describe(error):
+    if isinstance(error, UnicodeDecodeError):
+        return "the file is not UTF-8 text (save it as UTF-8 and try again)."
+    return f"{error}."
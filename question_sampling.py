@@ -0,0 +1,81 @@
+# question_sampling.py
+"""Per-attempt question sampling from large question banks.
+
+An exam with a sample size serves each attempt N questions drawn from its
+bank instead of all of them. The bank is just the exam's question ids,
+grouped by tag, read with one narrow query and cached per worker as
+uint32 arrays against the exam's questions_version. Drawing a sample
+never loads question rows or sorts the table randomly.
+
+The draw is seeded from the exam, the student and the app's secret key,
+so every worker draws the same questions for the same attempt. Drawn ids
+are stored with the attempt (pack_ids), so the attempt keeps its
+questions if the bank changes later, and grading reads only those rows.
+"""
+import hashlib
+import random
+import struct
+from array import array
+
+from answer_keys import AnswerKeyCache
+
+
+class QuestionBank:
+    """An exam's question ids, all together and per tag ('' = untagged)."""
+
+    def __init__(self, rows):
+        """rows: (question_id, tag) pairs."""
+        self.ids = array('I')
+        self.strata = {}
+        for question_id, tag in rows:
+            self.ids.append(question_id)
+            self.strata.setdefault(tag or '', array('I')).append(question_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class QuestionBankCache(AnswerKeyCache):
+    """Per-worker cache of question banks, validated against questions_version."""
+
+
+def attempt_seed(secret, exam_id, user_id):
+    digest = hashlib.blake2b(f"{exam_id}:{user_id}".encode(), key=secret.encode()[:64], digest_size=8)
+    return int.from_bytes(digest.digest(), 'big')
+
+
+def allocate(sizes, n):
+    """Split n draws across strata in proportion to their sizes (largest remainder)."""
+    total = sum(sizes)
+    exact = [n * size / total for size in sizes]
+    counts = [int(share) for share in exact]
+    by_remainder = sorted(range(len(sizes)), key=lambda i: counts[i] - exact[i])
+    for i in by_remainder[:n - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def draw(bank, n, seed, stratified=False):
+    """Deterministically pick n question ids (all of them if n >= the bank size), in random order."""
+    rng = random.Random(seed)
+    if n >= len(bank):
+        picked = list(bank.ids)
+        rng.shuffle(picked)
+        return picked
+    if not stratified or len(bank.strata) < 2:
+        return rng.sample(bank.ids, n)
+
+    tags = sorted(bank.strata)
+    picked = []
+    for tag, count in zip(tags, allocate([len(bank.strata[tag]) for tag in tags], n)):
+        picked += rng.sample(bank.strata[tag], count)
+    rng.shuffle(picked)
+    return picked
+
+
+def pack_ids(ids):
+    return struct.pack(f'<{len(ids)}I', *ids)
+
+
+def unpack_ids(packed):
+    return list(struct.unpack(f'<{len(packed) // 4}I', packed))
@@ -0,0 +1,248 @@
+# smartbot_admission.py
+"""Admission control for SmartBot's upstream (OpenAI) calls.
+
+Before a chat request goes upstream it must pass two checks:
+
+- a token bucket per user (burst tokens, refilled at rate per second), so
+  one student cannot monopolise the bot;
+- a cap on upstream calls in flight across all workers, so a whole class
+  asking at once cannot tie up every worker waiting on OpenAI.
+
+A request that fails either check is refused at once with a retry hint
+(SmartBotBusy) instead of queueing. When upstream itself answers 429,
+backoff() closes admission for everyone until its Retry-After has passed.
+
+Two backends hold the state: an in-process one (single worker, tests)
+and a SQLite one shared by every gunicorn worker on the host. An
+in-flight slot is a lease, so slots of a crashed worker free themselves.
+"""
+import math
+import sqlite3
+import threading
+import time
+
+from sqlite_state import ForkSafeSQLite
+
+
+class SmartBotBusy(Exception):
+    """Admission refused; retry_after is in whole seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"{reason}: retry in {retry_after} s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _seconds(value):
+    return max(1, math.ceil(value))
+
+
+def _refill(tokens, updated_at, now, rate, burst):
+    return min(burst, tokens + (now - updated_at) * rate)
+
+
+# ---------- Backends ----------
+class MemoryAdmissionBackend:
+    """Per-process state; only correct with a single worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = {}
+        self._next_slot = 0
+        self._closed_until = 0.0
+
+    def acquire(self, user_id, now, rate, burst, max_in_flight, lease):
+        """Take a token and a slot together, or neither; returns (slot, None) or (None, refusal)."""
+        with self._lock:
+            if self._closed_until > now:
+                return None, ("upstream", self._closed_until - now)
+            tokens, updated_at = self._buckets.get(user_id, (burst, now))
+            tokens = _refill(tokens, updated_at, now, rate, burst)
+            if tokens < 1:
+                return None, ("user", (1 - tokens) / rate)
+            self._slots = {slot: expires for slot, expires in self._slots.items() if expires > now}
+            if len(self._slots) >= max_in_flight:
+                return None, ("global", None)
+            self._buckets[user_id] = (tokens - 1, now)
+            self._next_slot += 1
+            self._slots[self._next_slot] = now + lease
+            return self._next_slot, None
+
+    def release(self, slot):
+        with self._lock:
+            self._slots.pop(slot, None)
+
+    def close_until(self, until):
+        with self._lock:
+            self._closed_until = max(self._closed_until, until)
+
+    def in_flight(self, now):
+        with self._lock:
+            return sum(1 for expires in self._slots.values() if expires > now)
+
+
+class SQLiteAdmissionBackend:
+    """State in a SQLite file shared by all workers on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = ForkSafeSQLite(path, timeout=5, pragmas=(
+            # Losing the last few admissions on power loss is harmless.
+            "synchronous=OFF",
+        ))
+        with self._db.lock:
+            conn = self._db.connect()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS smartbot_bucket ("
+                " user_id INTEGER PRIMARY KEY,"
+                " tokens REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS smartbot_in_flight ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS smartbot_backoff ("
+                " id INTEGER PRIMARY KEY CHECK (id = 1),"
+                " closed_until REAL NOT NULL)"
+            )
+
+    def acquire(self, user_id, now, rate, burst, max_in_flight, lease):
+        with self._db.lock:
+            conn = self._db.connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                # Other workers have held the write lock for the whole timeout: we are overloaded.
+                return None, ("global", None)
+            try:
+                refusal = self._check(conn, user_id, now, rate, burst, max_in_flight)
+                slot = None
+                if refusal is None:
+                    slot = conn.execute(
+                        "INSERT INTO smartbot_in_flight (expires_at) VALUES (?)", (now + lease,)
+                    ).lastrowid
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return slot, refusal
+
+    @staticmethod
+    def _check(conn, user_id, now, rate, burst, max_in_flight):
+        """Refusal or None, taking the user's token when admitted (inside the transaction)."""
+        row = conn.execute("SELECT closed_until FROM smartbot_backoff WHERE id = 1").fetchone()
+        if row and row[0] > now:
+            return "upstream", row[0] - now
+
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM smartbot_bucket WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        tokens = _refill(*row, now, rate, burst) if row else burst
+        if tokens < 1:
+            return "user", (1 - tokens) / rate
+
+        conn.execute("DELETE FROM smartbot_in_flight WHERE expires_at <= ?", (now,))
+        in_flight = conn.execute("SELECT COUNT(*) FROM smartbot_in_flight").fetchone()[0]
+        if in_flight >= max_in_flight:
+            return "global", None
+
+        conn.execute(
+            "INSERT OR REPLACE INTO smartbot_bucket (user_id, tokens, updated_at) VALUES (?, ?, ?)",
+            (user_id, tokens - 1, now)
+        )
+        return None
+
+    def release(self, slot):
+        with self._db.lock:
+            self._db.connect().execute("DELETE FROM smartbot_in_flight WHERE id = ?", (slot,))
+
+    def close_until(self, until):
+        with self._db.lock:
+            self._db.connect().execute(
+                "INSERT INTO smartbot_backoff (id, closed_until) VALUES (1, ?)"
+                " ON CONFLICT (id) DO UPDATE SET closed_until = max(closed_until, excluded.closed_until)",
+                (until,)
+            )
+
+    def in_flight(self, now):
+        with self._db.lock:
+            return self._db.connect().execute(
+                "SELECT COUNT(*) FROM smartbot_in_flight WHERE expires_at > ?", (now,)
+            ).fetchone()[0]
+
+
+# ---------- Front-end ----------
+class Ticket:
+    """An admitted upstream call; release() (idempotent) frees its in-flight slot."""
+
+    def __init__(self, admission, slot):
+        self._admission = admission
+        self._slot = slot
+
+    def release(self):
+        slot, self._slot = self._slot, None
+        if slot is not None:
+            self._admission.backend.release(slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class AdmissionControl:
+    def __init__(self, backend, rate, burst, max_in_flight, lease=120.0, busy_retry_after=2):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.lease = lease
+        # The hint when all slots are taken; upstream calls usually finish by then.
+        self.busy_retry_after = busy_retry_after
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.refused = {"user": 0, "global": 0, "upstream": 0}
+
+    def admit(self, user_id):
+        """Return a Ticket for one upstream call or raise SmartBotBusy."""
+        slot, refusal = self.backend.acquire(user_id, time.time(), self.rate, self.burst,
+                                             self.max_in_flight, self.lease)
+        if refusal is not None:
+            reason, wait = refusal
+            with self._lock:
+                self.refused[reason] += 1
+            raise SmartBotBusy(reason, _seconds(self.busy_retry_after if wait is None else wait))
+        with self._lock:
+            self.admitted += 1
+        return Ticket(self, slot)
+
+    def backoff(self, seconds):
+        """Refuse every request (in all workers) for the next seconds, e.g. after an upstream 429."""
+        self.backend.close_until(time.time() + seconds)
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.backend.in_flight(time.time()),
+            "admitted": self.admitted,
+            "refused": dict(self.refused),
+        }
+
+
+def create_admission_control(backend="sqlite", path=None, **limits):
+    """Build AdmissionControl from a backend name: "sqlite", "memory" or "none"."""
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return AdmissionControl(MemoryAdmissionBackend(), **limits)
+    if backend == "sqlite":
+        return AdmissionControl(SQLiteAdmissionBackend(path), **limits)
+    raise ValueError(f"Unknown SmartBot admission backend: {backend!r}")
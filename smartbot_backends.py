@@ -0,0 +1,128 @@
+# smartbot_backends.py
+"""Chat completion backends for SmartBot.
+
+A backend turns a message list into a reply:
+
+- complete(messages, **params) -> (text, Usage or None)
+- stream(messages, **params) yields (delta text or None, Usage or None)
+
+OpenAIBackend imports the openai package and builds its client on the
+first call, so app startup and CLI commands never pay for it and do not
+need an API key. StubBackend answers locally, for tests and offline
+development; give it a delay to stand in for a slow upstream.
+
+Both raise UpstreamRateLimited when upstream answers 429, so callers can
+tell "slow down" apart from other failures.
+"""
+import threading
+import time
+from collections import namedtuple
+
+
+Usage = namedtuple('Usage', 'prompt_tokens completion_tokens')
+
+
+class BackendUnavailable(RuntimeError):
+    pass
+
+
+class UpstreamRateLimited(RuntimeError):
+    """Upstream refused the call (HTTP 429); retry_after is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited upstream, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+def _retry_after(response, default=5.0):
+    headers = response.headers if response is not None else {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        return float(headers.get("retry-after", default))
+    except ValueError:
+        return default
+
+
+class OpenAIBackend:
+    def __init__(self, api_key=None, base_url=None, max_retries=0, timeout=60.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        # The client's own retries sleep inside the request, holding a worker.
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if not self.api_key:
+                        raise BackendUnavailable("OPENAI_API_KEY is not set")
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          max_retries=self.max_retries, timeout=self.timeout)
+        return self._client
+
+    @staticmethod
+    def _usage(usage):
+        return Usage(usage.prompt_tokens or 0, usage.completion_tokens or 0) if usage else None
+
+    def _create(self, **params):
+        client = self.client
+        from openai import RateLimitError
+        try:
+            return client.chat.completions.create(**params)
+        except RateLimitError as e:
+            raise UpstreamRateLimited(_retry_after(e.response)) from e
+
+    def complete(self, messages, **params):
+        response = self._create(messages=messages, **params)
+        return response.choices[0].message.content.strip(), self._usage(response.usage)
+
+    def stream(self, messages, **params):
+        stream = self._create(
+            messages=messages, stream=True, stream_options={"include_usage": True}, **params
+        )
+        for chunk in stream:
+            # With include_usage the final chunk has no choices, only usage.
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            usage = self._usage(chunk.usage)
+            if delta or usage:
+                yield delta, usage
+
+
+class StubBackend:
+    """Echoes the last user message back, after delay seconds; counts words as tokens."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def _reply(self, messages):
+        if self.delay:
+            time.sleep(self.delay)
+        prompt = " ".join(m["content"] for m in messages)
+        question = messages[-1]["content"] if messages else ""
+        reply = f"SmartBot (offline stub) received: {question}"
+        return reply, Usage(len(prompt.split()), len(reply.split()))
+
+    def complete(self, messages, **params):
+        return self._reply(messages)
+
+    def stream(self, messages, **params):
+        reply, usage = self._reply(messages)
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            yield (word if i == 0 else " " + word), None
+        yield None, usage
+
+
+def create_chat_backend(name, api_key=None, base_url=None, max_retries=0, timeout=60.0, stub_delay=0.0):
+    """Build a backend from its name: "openai" or "stub"."""
+    if name == "stub":
+        return StubBackend(delay=stub_delay)
+    if name == "openai":
+        return OpenAIBackend(api_key=api_key, base_url=base_url, max_retries=max_retries, timeout=timeout)
+    raise ValueError(f"Unknown SMARTBOT_BACKEND: {name!r}")
@@ -0,0 +1,269 @@
+# smartbot_cache.py
+"""Reply cache and request coalescing for SmartBot completions.
+
+Replies are keyed on the normalized prompt plus the model and sampling
+parameters, expire after a TTL and are evicted least-recently-used first.
+Two backends are available: an in-process dict (per worker) and a SQLite
+table that every gunicorn worker on the host can share.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_prompt(text):
+    """Fold case, whitespace and trailing punctuation so near-identical questions share a key."""
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def make_cache_key(prompt, model, **params):
+    payload = json.dumps(
+        {"prompt": normalize_prompt(prompt), "model": model, "params": params},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------- Backends ----------
+class MemoryCacheBackend:
+    """Per-process LRU dict with TTL."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """LRU cache in a SQLite table, shared by all workers on the host."""
+
+    def __init__(self, path, max_entries=10000, ttl=3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS smartbot_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_smartbot_cache_last_used"
+                " ON smartbot_cache (last_used)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM smartbot_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM smartbot_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE smartbot_cache SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO smartbot_cache (key, value, expires_at, last_used)"
+            " VALUES (?, ?, ?, ?)",
+            (key, value, now + self.ttl, now)
+        )
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM smartbot_cache WHERE key IN ("
+                " SELECT key FROM smartbot_cache ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def clear(self):
+        self._connect().execute("DELETE FROM smartbot_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM smartbot_cache").fetchone()[0]
+
+
+# ---------- Cache front-end ----------
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReplyCache:
+    """Looks replies up in a backend and coalesces concurrent misses for the same key.
+
+    While one thread computes a reply, other threads in the same worker asking
+    for the same key wait for it instead of issuing their own upstream call.
+    A waiter gives up after wait_timeout seconds (a hung leader must not hold
+    every follower) and computes the reply itself.
+
+    get_or_compute() does all of this for a blocking compute function;
+    begin(), finish() and wait() are the same steps for a leader that
+    produces its reply incrementally (a stream).
+    """
+
+    def __init__(self, backend, wait_timeout=60.0):
+        self.backend = backend
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.wait_timeouts = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def begin(self, key):
+        """Claim key: (pending, True) if the caller must compute it, (pending, False)
+        if another request in this worker already is (then wait(pending))."""
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = _InFlight()
+                return pending, True
+            self.coalesced += 1
+            return pending, False
+
+    def finish(self, key, pending, value=None, error=None):
+        """Publish the leader's outcome to its waiters (value None: nothing to share).
+
+        Calling it again for the same pending does nothing.
+        """
+        if pending.done.is_set():
+            return
+        if value is not None:
+            self.backend.set(key, value)
+        pending.value = value
+        pending.error = error
+        with self._lock:
+            if self._inflight.get(key) is pending:
+                del self._inflight[key]
+        pending.done.set()
+
+    def wait(self, pending):
+        """The leader's value, or None if it had none or wait_timeout passed; raises its error."""
+        if not pending.done.wait(self.wait_timeout):
+            with self._lock:
+                self.wait_timeouts += 1
+            return None
+        if pending.error is not None:
+            raise pending.error
+        return pending.value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        pending, leader = self.begin(key)
+        if not leader:
+            value = self.wait(pending)
+            if value is not None:
+                return value
+            value = compute()
+            self.backend.set(key, value)
+            return value
+
+        try:
+            value = compute()
+        except Exception as e:
+            self.finish(key, pending, error=e)
+            raise
+        self.finish(key, pending, value)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "max_entries": self.backend.max_entries,
+            "ttl": self.backend.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "wait_timeouts": self.wait_timeouts,
+            "evictions": self.backend.evictions,
+        }
+
+
+def create_reply_cache(backend, path=None, max_entries=1024, ttl=3600, wait_timeout=60.0):
+    """Build a ReplyCache from a backend name: "memory", "sqlite" or "none"."""
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return ReplyCache(SQLiteCacheBackend(path, max_entries=max_entries, ttl=ttl), wait_timeout)
+    if backend == "memory":
+        return ReplyCache(MemoryCacheBackend(max_entries=max_entries, ttl=ttl), wait_timeout)
+    raise ValueError(f"Unknown SmartBot cache backend: {backend!r}")
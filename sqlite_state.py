@@ -0,0 +1,36 @@
+# sqlite_state.py
+"""One SQLite connection per process for state kept in a local file.
+
+The submission journal, SmartBot admission and the note vector index each
+keep their state in a SQLite file that every worker on the host opens.
+Web servers start a thread per request, and connecting costs more than
+most of the statements run on it, so each process shares one connection
+between its threads under an RLock. A worker forked from a process that
+had it open gets its own connection on first use rather than sharing the
+parent's.
+"""
+import os
+import sqlite3
+import threading
+
+
+class ForkSafeSQLite:
+    def __init__(self, path, timeout=30, pragmas=()):
+        self.path = path
+        self.timeout = timeout
+        # Run on every new connection, after journal_mode=WAL.
+        self.pragmas = tuple(pragmas)
+        self.lock = threading.RLock()
+        self._conn = None
+        self._pid = None
+
+    def connect(self):
+        """The process's connection (reopened after a fork); call with self.lock held."""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for pragma in self.pragmas:
+                conn.execute(f"PRAGMA {pragma}")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
@@ -0,0 +1,17 @@
+// add_question.html: validateForm() is called from the form's onsubmit.
+// Validate that the correct option matches one of the 4 options
+function validateForm() {
+    const option1 = document.getElementById("option1").value.trim();
+    const option2 = document.getElementById("option2").value.trim();
+    const option3 = document.getElementById("option3").value.trim();
+    const option4 = document.getElementById("option4").value.trim();
+    const correct = document.getElementById("correct_option").value.trim();
+
+    const options = [option1, option2, option3, option4];
+
+    if (!options.includes(correct)) {
+        alert("❌ The Correct Option must exactly match one of the four options above.");
+        return false;
+    }
+    return true;
+}
@@ -0,0 +1,92 @@
+// chat.html: sendMessage() is called from the input and button handlers.
+const CHAT_ERROR_TEXT = "Sorry, the reply could not be loaded. Please try again.";
+
+// Messages are built as nodes and appended, never as markup: the text is
+// the user's (or the model's), and re-parsing the history would detach a
+// reply that is still streaming.
+function appendMessage(chatBox, className, label, text) {
+    const div = document.createElement("div");
+    div.className = className;
+    const strong = document.createElement("strong");
+    strong.textContent = label;
+    const span = document.createElement("span");
+    span.textContent = text;
+    div.appendChild(strong);
+    div.appendChild(document.createTextNode(" "));
+    div.appendChild(span);
+    chatBox.appendChild(div);
+    chatBox.scrollTop = chatBox.scrollHeight;
+    return span;
+}
+
+async function sendMessage() {
+    const input = document.getElementById("userInput");
+    const message = input.value.trim();
+    if (!message) return;
+
+    const chatBox = document.getElementById("chat-box");
+    appendMessage(chatBox, "user", "You:", message);
+    input.value = "";
+
+    const replySpan = appendMessage(chatBox, "bot", "SmartBot:", "");
+    try {
+        await receiveReply(message, replySpan, chatBox);
+    } catch (error) {
+        if (!replySpan.textContent) replySpan.parentNode.remove();
+        appendMessage(chatBox, "bot error", "SmartBot:", CHAT_ERROR_TEXT);
+    }
+}
+
+async function receiveReply(message, replySpan, chatBox) {
+    const response = await fetch("/chatbot", {
+        method: "POST",
+        headers: {"Content-Type": "application/json", "Accept": "text/event-stream"},
+        body: JSON.stringify({ message, stream: true })
+    });
+
+    // Empty messages, busy refusals and failures get a plain JSON reply
+    if (!(response.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+        const data = await response.json();
+        if (!data.reply) throw new Error("HTTP " + response.status);
+        replySpan.textContent = data.reply;
+        chatBox.scrollTop = chatBox.scrollHeight;
+        return;
+    }
+
+    // 🔄 Render SmartBot's reply token-by-token as SSE frames arrive
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let finished = false;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = "message", data = "";
+            frame.split("\n").forEach(line => {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+
+            const payload = JSON.parse(data);
+            if (event === "error") {
+                replySpan.textContent = payload.error;
+                finished = true;
+            } else if (event === "done") {
+                finished = true;
+            } else if (payload.delta) {
+                replySpan.textContent += payload.delta;
+            }
+        }
+        chatBox.scrollTop = chatBox.scrollHeight;
+    }
+    // The connection dropped before the server finished the reply.
+    if (!finished) throw new Error("Reply stream ended early");
+}
@@ -0,0 +1,69 @@
+// exam.html: countdown timer and answer autosave.
+(function () {
+    if (!document.body.classList.contains("page-exam")) return;
+
+    var form = document.getElementById("examForm");
+    var duration = Number(form.dataset.remaining); // Seconds left, counted by the server from the first opening
+
+    function startTimer() {
+        var timer = duration, minutes, seconds;
+        var display = document.getElementById("time");
+
+        var countdown = setInterval(function () {
+            minutes = Math.floor(timer / 60);
+            seconds = timer % 60;
+
+            seconds = seconds < 10 ? "0" + seconds : seconds;
+            display.textContent = minutes + ":" + seconds;
+
+            if (--timer < 0) {
+                clearInterval(countdown);
+                alert("Time is up! Your exam will be submitted.");
+                form.requestSubmit();
+            }
+        }, 1000);
+    }
+    startTimer();
+
+    // Autosave: answers are sent (debounced) on every change and restored
+    // by the server if the page is reopened, so leaving no longer submits.
+    (function () {
+        var url = form.dataset.autosaveUrl;
+        var timer = null, dirty = false, submitting = false;
+
+        function payload() {
+            var answers = {};
+            new FormData(form).forEach(function (value, name) { answers[name] = value; });
+            return JSON.stringify({answers: answers, seq: Date.now()});
+        }
+
+        function save(onExit) {
+            clearTimeout(timer);
+            if (!dirty) return;
+            dirty = false;
+            var body = payload();
+            if (onExit && navigator.sendBeacon) {
+                navigator.sendBeacon(url, new Blob([body], {type: "application/json"}));
+                return;
+            }
+            fetch(url, {method: "POST", headers: {"Content-Type": "application/json"}, body: body, keepalive: true})
+                .catch(function () { dirty = true; });
+        }
+
+        form.addEventListener("change", function () {
+            dirty = true;
+            clearTimeout(timer);
+            timer = setTimeout(save, 500);
+        });
+        form.addEventListener("submit", function () { submitting = true; });
+
+        window.addEventListener("beforeunload", function (e) {
+            if (submitting) return;
+            e.preventDefault();
+            e.returnValue = "Your exam is still in progress. Your answers are saved and will be restored when you return.";
+        });
+        window.addEventListener("pagehide", function () {
+            if (!submitting) save(true);
+        });
+    })();
+})();
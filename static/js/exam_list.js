@@ -0,0 +1,16 @@
+// exam_list.html: live search over the exam cards.
+(function () {
+    if (!document.body.classList.contains("page-exam-list")) return;
+
+    // 🔍 Live Search Filter
+    const searchInput = document.getElementById('searchInput');
+    const examCards = document.querySelectorAll('.exam-card');
+
+    searchInput.addEventListener('keyup', function() {
+        const filter = searchInput.value.toLowerCase();
+        examCards.forEach(card => {
+            const title = card.querySelector('.exam-title').textContent.toLowerCase();
+            card.style.display = title.includes(filter) ? '' : 'none';
+        });
+    });
+})();
@@ -0,0 +1,90 @@
+// exam_participants.html: lazily loaded, searchable participants table.
+(function () {
+    if (!document.body.classList.contains("page-exam-participants")) return;
+
+    const main = document.querySelector('main');
+    const apiUrl = main.dataset.apiUrl;
+    const pageSize = Number(main.dataset.pageSize);
+    const searchInput = document.getElementById('searchInput');
+    const sortSelect = document.getElementById('sortSelect');
+    const table = document.getElementById('participantsTable');
+    const tbody = table ? table.querySelector('tbody') : null;
+    const loadMore = document.getElementById('loadMore');
+
+    let nextCursor = null;
+    let exhausted = false;
+    let loading = false;
+    let generation = 0;
+
+    function pageUrl(cursor) {
+        const params = new URLSearchParams({
+            q: searchInput.value.trim(),
+            sort: sortSelect.value,
+            limit: pageSize
+        });
+        if (cursor) params.set('cursor', cursor);
+        return `${apiUrl}?${params}`;
+    }
+
+    function appendRow(p) {
+        const row = tbody.insertRow();
+        [p.fullname, p.email, p.score, p.date_taken].forEach(value => {
+            row.insertCell().textContent = value;
+        });
+    }
+
+    // 📄 Fetch the next page of participants from the server
+    async function loadNextPage() {
+        if (!tbody || loading || exhausted) return;
+        loading = true;
+        const current = generation;
+        const response = await fetch(pageUrl(nextCursor));
+        const data = await response.json();
+        loading = false;
+        if (current !== generation) return;  // search/sort changed meanwhile
+
+        data.participants.forEach(appendRow);
+        nextCursor = data.next_cursor;
+        exhausted = !nextCursor;
+        loadMore.textContent = exhausted
+            ? (tbody.rows.length ? '' : 'No matching students.')
+            : 'Loading more...';
+        if (!exhausted && isVisible(loadMore)) loadNextPage();
+    }
+
+    function isVisible(el) {
+        return el.getBoundingClientRect().top < window.innerHeight;
+    }
+
+    function resetAndLoad() {
+        generation++;
+        tbody.innerHTML = '';
+        nextCursor = null;
+        exhausted = false;
+        loading = false;
+        loadNextPage();
+    }
+
+    if (tbody) {
+        // ⬇️ Load rows lazily as the admin scrolls
+        new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) loadNextPage();
+        }).observe(loadMore);
+
+        // 🔍 Search (server-side, debounced)
+        let searchTimer;
+        searchInput.addEventListener('input', function () {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(resetAndLoad, 250);
+        });
+
+        // ⬆️ Sort (server-side)
+        sortSelect.addEventListener('change', resetAndLoad);
+    }
+
+    // ✅ Show Delete Button after Download (the CSV is streamed by the server)
+    document.getElementById('downloadBtn')?.addEventListener('click', function () {
+        const deleteBtn = document.getElementById('deleteBtn');
+        if (deleteBtn) deleteBtn.style.display = 'inline-block';
+    });
+})();
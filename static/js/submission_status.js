@@ -0,0 +1,24 @@
+// submission_status.html: poll until the submission is graded.
+(function () {
+    if (!document.body.classList.contains("page-submission-status")) return;
+
+    var url = document.getElementById("status").dataset.statusUrl;
+    var delay = 1000;
+
+    function poll() {
+        fetch(url, {headers: {"Accept": "application/json"}})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (data.redirect) {
+                    window.location = data.redirect;
+                    return;
+                }
+                setTimeout(poll, delay);
+            })
+            .catch(function () {
+                delay = Math.min(delay * 2, 10000);
+                setTimeout(poll, delay);
+            });
+    }
+    setTimeout(poll, delay);
+})();
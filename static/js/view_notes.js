@@ -0,0 +1,38 @@
+// view_notes.html: full-text note search.
+(function () {
+    if (!document.body.classList.contains("page-view-notes")) return;
+
+    const noteSearch = document.getElementById('noteSearch');
+    const searchResults = document.getElementById('searchResults');
+    let searchTimer;
+
+    noteSearch.addEventListener('input', function () {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(async function () {
+            const q = noteSearch.value.trim();
+            searchResults.innerHTML = '';
+            if (!q) return;
+
+            const response = await fetch(`${noteSearch.dataset.searchUrl}?q=${encodeURIComponent(q)}`);
+            const data = await response.json();
+            if (!data.results.length) {
+                searchResults.innerHTML = '<li>No notes match your search.</li>';
+                return;
+            }
+            data.results.forEach(r => {
+                const li = document.createElement('li');
+                const link = document.createElement('a');
+                link.className = 'download-btn';
+                link.href = r.download_url;
+                link.textContent = 'Download';
+                const title = document.createElement('strong');
+                title.textContent = r.title + ' ';
+                const snippet = document.createElement('div');
+                snippet.className = 'snippet';
+                snippet.innerHTML = r.snippet;  // escaped server-side, only <mark> tags added
+                li.append(title, link, snippet);
+                searchResults.appendChild(li);
+            });
+        }, 250);
+    });
+})();
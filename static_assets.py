@@ -0,0 +1,215 @@
+# static_assets.py
+"""Fingerprinted, precompressed static assets.
+
+`flask build-assets` (or create_app(), when the build is missing or
+older than its sources) concatenates the BUNDLES and copies every other
+file under static/ into static/dist/ under a content-hashed name, next
+to .gz and .br copies of the text files. static/dist/manifest.json maps
+each logical name to its built file.
+
+url_for('static', filename='app.css') keeps working in templates: a URL
+default rewrites the filename to its fingerprinted path. Fingerprinted
+files never change, so they are served with a one-year "immutable"
+Cache-Control, as the best encoding the client accepts.
+
+Without a build (ASSETS_AUTO_BUILD off, or a read-only static folder
+and no earlier `flask build-assets`) the bundles are concatenated from
+their sources on each request and served uncompressed, revalidated by
+ETag, so the pages still work, only slower.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+from flask import Response, current_app, request, send_from_directory
+
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+# Each page's CSS is scoped with :where(.page-<template>), so concatenation
+# keeps the original cascade; each page's JS checks its body class.
+BUNDLES = {
+    'app.css': [
+        'style.css',
+        'css/index.css',
+        'css/exam_list.css',
+        'css/exam_participants.css',
+        'css/chat.css',
+        'css/view_notes.css',
+        'css/upload_notes.css',
+    ],
+    'app.js': [
+        'js/add_question.js',
+        'js/chat.js',
+        'js/exam.js',
+        'js/exam_list.js',
+        'js/exam_participants.js',
+        'js/submission_status.js',
+        'js/view_notes.js',
+    ],
+}
+
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.xml', '.map'}
+# Preferred first; brotli is only produced when the Brotli package is installed.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def brotli_compress(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def gzip_compress(data):
+    # mtime=0 keeps the output identical across builds.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def fingerprinted_name(name, data):
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+
+def write_atomic(path, data):
+    """Write via a temp file and rename: other workers may be serving or building too."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates the file 0600; a front proxy may serve static/ itself.
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class AssetPipeline:
+    def __init__(self, static_folder, bundles=BUNDLES, max_age=365 * 24 * 3600):
+        self.static_folder = static_folder
+        self.dist_folder = os.path.join(static_folder, DIST_DIR)
+        self.manifest_path = os.path.join(self.dist_folder, MANIFEST)
+        self.bundles = bundles
+        self.max_age = max_age
+        self.manifest = {}
+        self.built = frozenset()
+
+    # ---------- Build ----------
+    def sources(self):
+        """Logical name -> list of source files (relative to static/)."""
+        bundled = {source for sources in self.bundles.values() for source in sources}
+        sources = {name: list(files) for name, files in self.bundles.items()}
+        for directory, subdirectories, files in os.walk(self.static_folder):
+            if os.path.abspath(directory) == os.path.abspath(self.static_folder):
+                subdirectories[:] = [d for d in subdirectories if d != DIST_DIR]
+            for filename in files:
+                relative = os.path.relpath(os.path.join(directory, filename), self.static_folder)
+                relative = relative.replace(os.sep, '/')
+                if relative not in bundled:
+                    sources.setdefault(relative, [relative])
+        return sources
+
+    def build(self):
+        """Write every asset, its compressed copies and the manifest; return the manifest."""
+        manifest = {}
+        for name, files in sorted(self.sources().items()):
+            data = self.concatenate(name, files)
+            built = f"{DIST_DIR}/{fingerprinted_name(name, data)}"
+            path = os.path.join(self.static_folder, built)
+            if not os.path.exists(path):
+                write_atomic(path, data)
+            if os.path.splitext(name)[1] in COMPRESSIBLE:
+                for compress, suffix in ((gzip_compress, '.gz'), (brotli_compress, '.br')):
+                    if os.path.exists(path + suffix):
+                        continue
+                    compressed = compress(data)
+                    # Tiny files can grow; those are served as they are.
+                    if compressed is not None and len(compressed) < len(data):
+                        write_atomic(path + suffix, compressed)
+            manifest[name] = built
+        write_atomic(self.manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+        self._use(manifest)
+        return manifest
+
+    def concatenate(self, name, files):
+        parts = []
+        for source in files:
+            with open(os.path.join(self.static_folder, source), 'rb') as f:
+                parts.append(f.read())
+        # Bundle parts are separated by a newline, and by a ";" in JS, so
+        # one file's last line cannot run into the next file's first.
+        separator = b'\n;\n' if name.endswith('.js') else b'\n'
+        return separator.join(parts)
+
+    def stale(self):
+        """True when the manifest is missing or older than a source file."""
+        try:
+            built_at = os.path.getmtime(self.manifest_path)
+        except FileNotFoundError:
+            return True
+        return any(
+            os.path.getmtime(os.path.join(self.static_folder, source)) > built_at
+            for files in self.sources().values() for source in files
+        )
+
+    def load(self, build_if_stale=True):
+        if build_if_stale and self.stale():
+            return self.build()
+        try:
+            with open(self.manifest_path) as f:
+                self._use(json.load(f))
+        except FileNotFoundError:
+            self._use({})
+        return self.manifest
+
+    def _use(self, manifest):
+        self.manifest = manifest
+        self.built = frozenset(manifest.values())
+
+    @property
+    def version(self):
+        """Changes whenever any asset does (part of the page ETags)."""
+        return hashlib.sha1(json.dumps(self.manifest, sort_keys=True).encode()).hexdigest()
+
+    # ---------- Flask hooks ----------
+    def fingerprint_url(self, endpoint, values):
+        """url_defaults hook: url_for('static', filename=name) -> the fingerprinted file."""
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+    def send_static(self, filename):
+        """The static view: fingerprinted files cached for good, in the client's best encoding."""
+        if filename in self.bundles and filename not in self.manifest:
+            return self.send_unbuilt_bundle(filename)
+        if filename not in self.built:
+            return current_app.send_static_file(filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        served, encoding = filename, None
+        for candidate, suffix in ENCODINGS:
+            if request.accept_encodings[candidate] and os.path.isfile(
+                    os.path.join(self.static_folder, filename + suffix)):
+                served, encoding = filename + suffix, candidate
+                break
+        response = send_from_directory(self.static_folder, served, mimetype=mimetype,
+                                       max_age=self.max_age, conditional=True)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def send_unbuilt_bundle(self, name):
+        """A bundle nobody has built, concatenated from its sources for this request."""
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        response = Response(self.concatenate(name, self.bundles[name]), mimetype=mimetype)
+        response.cache_control.no_cache = True
+        response.add_etag()
+        return response.make_conditional(request)
@@ -0,0 +1,182 @@
+# submission_queue.py
+"""Durable journal and batching worker for exam submissions.
+
+take_exam() appends the raw answers to a SQLite journal (WAL, fsync per
+append by default) and acknowledges at once. A worker thread in every
+web process claims pending submissions in batches, grades them and
+inserts their results in one database transaction per batch. A claim is
+a lease: if a worker dies mid-batch, its submissions become claimable
+again once the lease expires, and re-grading is harmless because a
+second Result for the same attempt is rejected as a duplicate.
+
+Statuses: pending -> grading -> graded | duplicate | failed.
+"""
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from sqlite_state import ForkSafeSQLite
+
+
+logger = logging.getLogger(__name__)
+
+Submission = namedtuple('Submission', 'id user_id exam_id answers submitted_at status score total error')
+
+FINISHED = ('graded', 'duplicate', 'failed')
+
+
+class SubmissionJournal:
+    def __init__(self, path, synchronous='FULL'):
+        self.path = path
+        self.synchronous = synchronous
+        self._db = ForkSafeSQLite(path, pragmas=(f"synchronous={synchronous}",))
+        with self._db.lock:
+            conn = self._db.connect()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS submission ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " user_id INTEGER NOT NULL,"
+                " exam_id INTEGER NOT NULL,"
+                " answers TEXT NOT NULL,"
+                " submitted_at REAL NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " claimed_at REAL,"
+                " score INTEGER,"
+                " total INTEGER,"
+                " error TEXT)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_submission_status_id ON submission (status, id)"
+            )
+
+    def append(self, user_id, exam_id, answers):
+        """Journal one submission; returns its id once it is on disk."""
+        answers = json.dumps(answers)
+        with self._db.lock:
+            cursor = self._db.connect().execute(
+                "INSERT INTO submission (user_id, exam_id, answers, submitted_at) VALUES (?, ?, ?, ?)",
+                (user_id, exam_id, answers, time.time())
+            )
+            return cursor.lastrowid
+
+    def get(self, submission_id):
+        with self._db.lock:
+            row = self._db.connect().execute(
+                "SELECT id, user_id, exam_id, answers, submitted_at, status, score, total, error"
+                " FROM submission WHERE id = ?", (submission_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Submission(row[0], row[1], row[2], json.loads(row[3]), *row[4:])
+
+    def claim(self, limit, lease):
+        """Atomically lease up to limit pending (or abandoned) submissions, oldest first."""
+        now = time.time()
+        with self._db.lock:
+            rows = self._db.connect().execute(
+                "UPDATE submission SET status = 'grading', claimed_at = ?"
+                " WHERE id IN (SELECT id FROM submission"
+                "  WHERE status = 'pending' OR (status = 'grading' AND claimed_at < ?)"
+                "  ORDER BY id LIMIT ?)"
+                " RETURNING id, user_id, exam_id, answers, submitted_at",
+                (now, now - lease, limit)
+            ).fetchall()
+        return sorted(
+            (Submission(id_, user_id, exam_id, json.loads(answers), submitted_at,
+                        'grading', None, None, None)
+             for id_, user_id, exam_id, answers, submitted_at in rows),
+            key=lambda s: s.id
+        )
+
+    def complete(self, outcomes):
+        """Record (id, status, score, total, error) outcomes in one transaction."""
+        with self._db.lock:
+            conn = self._db.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "UPDATE submission SET status = ?, score = ?, total = ?, error = ? WHERE id = ?",
+                    [(status, score, total, error, id_) for id_, status, score, total, error in outcomes]
+                )
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def prune(self, max_age):
+        """Drop finished submissions older than max_age seconds."""
+        with self._db.lock:
+            self._db.connect().execute(
+                "DELETE FROM submission WHERE status IN (?, ?, ?) AND submitted_at < ?",
+                (*FINISHED, time.time() - max_age)
+            )
+
+    def counts(self):
+        with self._db.lock:
+            return dict(self._db.connect().execute(
+                "SELECT status, COUNT(*) FROM submission GROUP BY status"
+            ).fetchall())
+
+
+class SubmissionWorker:
+    """Background thread that drains the journal through grade_batch in batches.
+
+    grade_batch(submissions) must return one (id, status, score, total,
+    error) outcome per submission; if it raises, the batch is retried once
+    its lease expires.
+    """
+
+    def __init__(self, journal, grade_batch, batch_size=200, lease=30.0,
+                 poll_interval=0.5, retention=86400.0):
+        self.journal = journal
+        self._grade_batch = grade_batch
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.graded = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='submission-worker', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def drain(self):
+        """Grade batches until nothing is claimable; returns the number processed."""
+        processed = 0
+        while True:
+            batch = self.journal.claim(self.batch_size, self.lease)
+            if not batch:
+                return processed
+            outcomes = self._grade_batch(batch)
+            self.journal.complete(outcomes)
+            self.batches += 1
+            self.graded += len(outcomes)
+            processed += len(outcomes)
+
+    def _run(self):
+        last_prune = 0.0
+        while True:
+            try:
+                self.drain()
+                if time.time() - last_prune > 3600:
+                    self.journal.prune(self.retention)
+                    last_prune = time.time()
+            except Exception:
+                logger.exception("Grading a submission batch failed; it will be retried")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
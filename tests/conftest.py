@@ -0,0 +1,39 @@
+import pytest
+
+import config
+
+
+@pytest.fixture
+def settings(tmp_path):
+    """TestingConfig with every on-disk path under tmp_path; tweak before using app."""
+    settings = config.TestingConfig()
+    # A file, not sqlite://: in-memory SQLite shares one connection between
+    # the request and the app's background threads.
+    settings.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+    settings.SUBMISSION_JOURNAL_PATH = str(tmp_path / "submissions.db")
+    settings.METRICS_DIR = str(tmp_path / "metrics")
+    settings.UPLOAD_FOLDER = str(tmp_path / "uploads")
+    settings.NOTE_VECTORS_DIR = str(tmp_path / "note_vectors")
+    settings.JINJA_CACHE_DIR = str(tmp_path / "jinja_cache")
+    return settings
+
+
+@pytest.fixture
+def app(settings):
+    """An app with an empty schema, an admin (id 1) and a student (id 2)."""
+    from app import User, create_app, db
+
+    app = create_app(settings)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(fullname="Admin", email="admin@example.com", password_hash="x", is_admin=True))
+        db.session.add(User(fullname="Student", email="student@example.com", password_hash="x"))
+        db.session.commit()
+    return app
+
+
+def client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client
@@ -0,0 +1,45 @@
+from conftest import client_for
+
+
+def add_exam(app):
+    from app import Exam, Question, db
+
+    with app.app_context():
+        exam = Exam(title="Exam", description="", duration=10)
+        db.session.add(exam)
+        db.session.flush()
+        db.session.add(Question(exam_id=exam.id, question_text="q", option1="a", option2="b",
+                                option3="c", option4="d", correct_option="a"))
+        db.session.commit()
+        return exam.id
+
+
+def draft(app, exam_id):
+    from app import ExamDraft, db
+
+    with app.app_context():
+        return db.session.get(ExamDraft, (2, exam_id))
+
+
+def test_autosave_needs_an_open_attempt(app):
+    exam_id = add_exam(app)
+    student = client_for(app, 2)
+    assert student.post(f"/autosave/{exam_id}", json={"answers": {"1": "a"}, "seq": 1}).status_code == 409
+    student.get(f"/take_exam/{exam_id}")
+    assert student.post(f"/autosave/{exam_id}", json={"answers": {"1": "a"}, "seq": 1}).status_code == 202
+
+
+def test_late_flush_does_not_recreate_a_submitted_draft(app):
+    from app import write_drafts
+
+    exam_id = add_exam(app)
+    student = client_for(app, 2)
+    student.get(f"/take_exam/{exam_id}")
+    write_drafts(app, [((2, exam_id), {"1": "b"}, 1)])
+    assert draft(app, exam_id).answers == {"1": "b"}
+    student.post(f"/take_exam/{exam_id}", data={"1": "a"})
+    assert draft(app, exam_id) is None
+
+    # Another worker flushes an autosave it buffered before the submission.
+    write_drafts(app, [((2, exam_id), {"1": "c"}, 2)])
+    assert draft(app, exam_id) is None
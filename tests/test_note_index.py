@@ -0,0 +1,46 @@
+import io
+
+from conftest import client_for
+
+
+def wait_for_indexing():
+    from app import note_index_executor
+
+    note_index_executor.submit(lambda: None).result(timeout=30)
+
+
+def vector_note_ids(app):
+    with app.app_context():
+        from app import note_vectors
+        return note_vectors.note_ids()
+
+
+def test_fresh_vector_folder_is_rebuilt_on_first_request(app, settings, tmp_path):
+    from app import create_app
+
+    admin = client_for(app, 1)
+    admin.post("/upload_notes", data={"title": "Cells",
+                                      "file": (io.BytesIO(b"Osmosis moves water across membranes."), "cells.txt")})
+    admin.post("/upload_notes", data={"title": "Empty", "file": (io.BytesIO(b""), "empty.txt")})
+    wait_for_indexing()
+    assert vector_note_ids(app) == {1, 2}
+
+    # Same database, new host: the full-text index is shared, the vectors are not.
+    settings.NOTE_VECTORS_DIR = str(tmp_path / "other_host_vectors")
+    fresh = create_app(settings)
+    assert vector_note_ids(fresh) == set()
+    client_for(fresh, 1).get("/view_notes")
+    wait_for_indexing()
+    assert vector_note_ids(fresh) == {1, 2}
+
+
+def test_search_limit_is_clamped(app):
+    admin = client_for(app, 1)
+    for i in range(3):
+        admin.post("/upload_notes", data={"title": f"Osmosis {i}",
+                                          "file": (io.BytesIO(b"Osmosis moves water."), f"o{i}.txt")})
+    wait_for_indexing()
+    for limit, expected in ((-1, 1), (0, 3), (2, 2), (1000, 3)):
+        response = admin.get("/search_notes", query_string={"q": "osmosis", "limit": limit})
+        assert response.status_code == 200
+        assert len(response.json["results"]) == expected
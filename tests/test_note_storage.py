@@ -0,0 +1,32 @@
+import io
+import os
+import threading
+import time
+
+from conftest import client_for
+
+
+def test_delete_keeps_a_blob_that_an_upload_is_storing(app):
+    from app import Note, acquire_blob, blob_store, db
+
+    content = b"Mitochondria make ATP."
+    admin = client_for(app, 1)
+    admin.post("/upload_notes", data={"title": "Cells", "file": (io.BytesIO(content), "cells.txt")})
+
+    # A second upload of the same file has put the blob in place but not yet
+    # committed its reference when the first note is deleted.
+    with app.app_context():
+        with blob_store.storing(io.BytesIO(content)) as (digest, size):
+            deleting = threading.Thread(target=admin.post, args=("/delete_note/1",))
+            deleting.start()
+            time.sleep(0.5)
+            acquire_blob(digest, size)
+            db.session.add(Note(title="Cells again", filename="cells.txt", content_hash=digest,
+                                size=size, uploaded_by=1))
+            db.session.commit()
+        deleting.join(timeout=30)
+        assert [note.title for note in Note.query.all()] == ["Cells again"]
+        assert os.path.exists(blob_store.path_for(digest))
+        note_id = Note.query.one().id
+
+    assert admin.get(f"/download/{note_id}").data == content
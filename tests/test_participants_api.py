@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import client_for
+
+
+@pytest.fixture
+def exam_with_results(app):
+    from app import Exam, Result, User, db
+
+    with app.app_context():
+        exam = Exam(title="Exam", description="", duration=10)
+        db.session.add(exam)
+        db.session.flush()
+        for i in range(5):
+            user = User(fullname=f"Student {i}", email=f"s{i}@example.com", password_hash="x")
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Result(user_id=user.id, exam_id=exam.id, score=i))
+        db.session.commit()
+        return exam.id
+
+
+def page(app, exam_id, **args):
+    return client_for(app, 1).get(f"/api/exam_participants/{exam_id}", query_string=args)
+
+
+@pytest.mark.parametrize("limit", [-2, -1])
+def test_negative_limit_is_clamped(app, exam_with_results, limit):
+    response = page(app, exam_with_results, limit=limit)
+    assert response.status_code == 200
+    assert len(response.json["participants"]) == 1
+    assert response.json["next_cursor"]
+
+
+def test_pages_walk_every_row(app, exam_with_results):
+    seen, cursor = [], None
+    while True:
+        args = {"sort": "score", "limit": 2}
+        if cursor:
+            args["cursor"] = cursor
+        body = page(app, exam_with_results, **args).json
+        seen += [row["score"] for row in body["participants"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [4, 3, 2, 1, 0]
+
+
+def test_cursor_must_match_sort(app, exam_with_results):
+    name_cursor = page(app, exam_with_results, sort="name", limit=1).json["next_cursor"]
+    assert page(app, exam_with_results, sort="score", cursor=name_cursor).status_code == 400
+    score_cursor = page(app, exam_with_results, sort="score", limit=1).json["next_cursor"]
+    assert page(app, exam_with_results, sort="name", cursor=score_cursor).status_code == 400
@@ -0,0 +1,83 @@
+"""The hot queries use their indexes on SQLite (EXPLAIN QUERY PLAN).
+
+Each statement comes from the helper the app itself runs, so a change to
+a query is checked here too.
+"""
+import re
+
+import pytest
+
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+TEMP_SORT = "USE TEMP B-TREE"
+
+
+# name: (statement built from the app module, index the plan must use, whether it sorts)
+HOT_QUERIES = {
+    "answer key load": (
+        lambda app: app.answer_key_query(1), "ix_question_exam_id", False),
+    "participants by score": (
+        lambda app: app.participants_query(1, sort="score").limit(51).statement,
+        "ix_result_exam_id_score", False),
+    "participants by score, next page": (
+        lambda app: app.participants_query(1, sort="score", after=[10, 500]).limit(51).statement,
+        "ix_result_exam_id_score", False),
+    # Ordering by a joined column sorts the exam's results; the index still
+    # keeps that sort to the one exam.
+    "participants by name": (
+        lambda app: app.participants_query(1).limit(51).statement,
+        "ix_result_exam_id_score", True),
+    "score counts": (
+        lambda app: app.score_counts_query(1), "ix_result_exam_id_score", False),
+}
+
+
+def explain(statement):
+    from app import db
+
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    with db.engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+
+
+def seed(n_users=500, n_exams=20):
+    """Enough rows that the planner's ANALYZE statistics resemble production."""
+    from app import Exam, Question, Result, User, db
+
+    db.session.execute(User.__table__.insert(), [
+        {"fullname": f"Student {i}", "email": f"s{i}@example.org", "password_hash": "x"}
+        for i in range(n_users)
+    ])
+    db.session.execute(Exam.__table__.insert(), [
+        {"title": f"Exam {i}", "duration": 30, "questions_version": "0"} for i in range(n_exams)
+    ])
+    db.session.execute(Question.__table__.insert(), [
+        {"exam_id": e + 1, "question_text": "Q", "option1": "a", "option2": "b",
+         "option3": "c", "option4": "d", "correct_option": "a"}
+        for e in range(n_exams) for _ in range(20)
+    ])
+    db.session.execute(Result.__table__.insert(), [
+        {"user_id": u + 1, "exam_id": e + 1, "score": (u * e) % 21}
+        for u in range(n_users) for e in range(n_exams) if (u + e) % 3
+    ])
+    db.session.commit()
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+@pytest.fixture
+def seeded(app):
+    with app.test_request_context():
+        seed()
+        yield
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_its_index(seeded, name):
+    import app
+
+    build, index, sorts = HOT_QUERIES[name]
+    plan = explain(build(app))
+    assert any(index in line for line in plan), plan
+    assert not [line for line in plan if FULL_SCAN.match(line)], plan
+    assert any(TEMP_SORT in line for line in plan) == sorts, plan
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from conftest import client_for
+from question_import import ImportFormatError, iter_csv_rows
+
+HEADER = "question_text,option1,option2,option3,option4,correct_option\n"
+LATIN1_CSV = (HEADER + "2 + 2?,3,4,5,6,4\nCafé au lait?,oui,non,peut-être,jamais,oui\n").encode("latin-1")
+
+
+@pytest.fixture
+def exam(app):
+    from app import Exam, db
+
+    with app.app_context():
+        db.session.add(Exam(title="Exam", description="", duration=10))
+        db.session.commit()
+
+
+def test_csv_decode_error_names_the_row():
+    rows = iter_csv_rows(io.BytesIO(LATIN1_CSV))
+    assert next(rows)["question_text"] == "2 + 2?"
+    with pytest.raises(ImportFormatError, match="Row 2"):
+        next(rows)
+
+
+def test_latin1_upload_is_rejected_with_the_row(app, exam):
+    from app import Question
+
+    client = client_for(app, 1)
+    response = client.post(
+        "/import_questions/1",
+        data={"file": (io.BytesIO(LATIN1_CSV), "questions.csv")},
+        headers={"Accept": "application/json"},
+    )
+
+    assert response.status_code == 400
+    assert response.json["imported"] == 0
+    assert "Row 2" in response.json["error"]
+    assert "UTF-8" in response.json["error"]
+    with app.app_context():
+        assert Question.query.count() == 0
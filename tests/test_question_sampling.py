@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from conftest import client_for
+
+
+def add_exam(app, questions, sample_size=None):
+    from app import Exam, Question, db
+
+    with app.app_context():
+        exam = Exam(title="Bank", description="", duration=10, sample_size=sample_size)
+        db.session.add(exam)
+        db.session.flush()
+        for i in range(questions):
+            db.session.add(Question(exam_id=exam.id, question_text=f"q{i}", option1="a", option2="b",
+                                    option3="c", option4="d", correct_option="a"))
+        db.session.commit()
+        return exam.id
+
+
+def add_questions(app, exam_id, count):
+    admin = client_for(app, 1)
+    for i in range(count):
+        admin.post(f"/add_question/{exam_id}", data=dict(question_text=f"added {i}", option1="a", option2="b",
+                                                         option3="c", option4="d", correct_option="a"))
+
+
+def set_sampling(app, exam_id, sample_size):
+    response = client_for(app, 1).post(f"/exam_sampling/{exam_id}", data={"sample_size": sample_size})
+    assert response.status_code == 302
+
+
+def served_ids(page):
+    return [int(i) for i in re.findall(r'name="(\d+)"', page.get_data(as_text=True))]
+
+
+def submit_all_correct(student, exam_id, question_ids):
+    student.post(f"/take_exam/{exam_id}", data={str(i): "a" for i in question_ids})
+    with student.session_transaction() as session:
+        return session["last_score"], session["last_total"]
+
+
+@pytest.mark.parametrize("before, after", [("", "3"), ("3", "")])
+def test_attempt_is_graded_on_what_it_was_served(app, before, after):
+    exam_id = add_exam(app, 10, sample_size=int(before) if before else None)
+    student = client_for(app, 2)
+    served = sorted(set(served_ids(student.get(f"/take_exam/{exam_id}"))))
+    assert len(served) == (int(before) if before else 10)
+
+    set_sampling(app, exam_id, after)
+
+    assert submit_all_correct(student, exam_id, served) == (len(served), len(served))
+
+
+def test_short_draw_is_redrawn_when_the_bank_grows(app):
+    from app import ExamAttempt, db
+
+    exam_id = add_exam(app, 0, sample_size=3)
+    student = client_for(app, 2)
+    assert served_ids(student.get(f"/take_exam/{exam_id}")) == []
+    with app.app_context():
+        assert db.session.get(ExamAttempt, (2, exam_id)) is None
+
+    add_questions(app, exam_id, 1)
+    assert len(set(served_ids(student.get(f"/take_exam/{exam_id}")))) == 1
+
+    add_questions(app, exam_id, 5)
+    served = sorted(set(served_ids(student.get(f"/take_exam/{exam_id}"))))
+    assert len(served) == 3
+    assert submit_all_correct(student, exam_id, served) == (3, 3)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from conftest import client_for
+
+DELAY = 0.5
+MAX_IN_FLIGHT = 2
+STUDENTS = 6
+
+
+@pytest.fixture
+def settings(settings):
+    settings.SMARTBOT_STUB_DELAY = DELAY
+    settings.SMARTBOT_CACHE_BACKEND = "none"
+    settings.SMARTBOT_MAX_IN_FLIGHT = MAX_IN_FLIGHT
+    settings.SMARTBOT_USER_BURST = 2
+    settings.SMARTBOT_USER_RATE_PER_MINUTE = 6
+    return settings
+
+
+@pytest.fixture
+def students(app):
+    """Ids of STUDENTS more students, beyond the conftest admin and student."""
+    from app import User, db
+
+    with app.app_context():
+        users = [User(fullname=f"Student {i}", email=f"s{i}@example.com", password_hash="x")
+                 for i in range(STUDENTS)]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+
+class RateLimitedBackend:
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+    def complete(self, messages, **params):
+        from smartbot_backends import UpstreamRateLimited
+        raise UpstreamRateLimited(self.retry_after)
+
+
+def track_in_flight(app):
+    """Wrap the stub backend; return the peak number of concurrent upstream calls."""
+    services = app.extensions['smartelearning']
+    backend = services['smartbot_backend']
+    lock = threading.Lock()
+    counts = {"current": 0, "peak": 0}
+
+    class Tracking:
+        def complete(self, messages, **params):
+            with lock:
+                counts["current"] += 1
+                counts["peak"] = max(counts["peak"], counts["current"])
+            try:
+                return backend.complete(messages, **params)
+            finally:
+                with lock:
+                    counts["current"] -= 1
+    services['smartbot_backend'] = Tracking()
+    return counts
+
+
+def ask(app, user_id, message):
+    started = time.perf_counter()
+    response = client_for(app, user_id).post("/chatbot", json={"message": message})
+    return response, time.perf_counter() - started
+
+
+def test_in_flight_cap_refuses_the_rest_at_once(app, students):
+    counts = track_in_flight(app)
+    outcomes = []
+    threads = [threading.Thread(target=lambda u=user_id: outcomes.append(ask(app, u, f"Question {u}")))
+               for user_id in students]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    answered = [elapsed for response, elapsed in outcomes if response.status_code == 200]
+    refused = [(response, elapsed) for response, elapsed in outcomes if response.status_code == 429]
+    assert counts["peak"] == MAX_IN_FLIGHT
+    assert len(answered) == MAX_IN_FLIGHT
+    assert len(refused) == STUDENTS - MAX_IN_FLIGHT
+    for response, elapsed in refused:
+        # Refused without waiting on upstream, and told when to come back.
+        assert elapsed < DELAY / 2
+        assert response.json["busy"] is True
+        assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_student_past_their_burst_is_told_when_to_retry(app):
+    statuses = []
+    for i in range(3):
+        response, _ = ask(app, 2, f"Question {i}")
+        statuses.append(response.status_code)
+    assert statuses == [200, 200, 429]
+    assert "too quickly" in response.json["reply"]
+    # One call every 10 s at 6 per minute.
+    assert int(response.headers["Retry-After"]) >= 5
+
+
+def test_upstream_rate_limit_closes_admission_until_it_passes(app, students):
+    services = app.extensions['smartelearning']
+    stub = services['smartbot_backend']
+    services['smartbot_backend'] = RateLimitedBackend(retry_after=1)
+    response, _ = ask(app, students[0], "hello")
+    services['smartbot_backend'] = stub
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    response, _ = ask(app, students[1], "hello")
+    assert response.status_code == 429
+
+    time.sleep(1.1)
+    response, _ = ask(app, students[1], "hello")
+    assert response.status_code == 200
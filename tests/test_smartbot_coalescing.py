@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from conftest import client_for
+
+STREAMS = 6
+
+
+@pytest.fixture
+def settings(settings):
+    # Long enough for every request to arrive while the first is upstream.
+    settings.SMARTBOT_STUB_DELAY = 0.5
+    return settings
+
+
+def count_backend_calls(app):
+    backend = app.extensions['smartelearning']['smartbot_backend']
+    calls = []
+    stream = backend.stream
+
+    def counted(*args, **kwargs):
+        calls.append(1)
+        return stream(*args, **kwargs)
+    backend.stream = counted
+    return calls
+
+
+def ask(app, user_id, bodies):
+    response = client_for(app, user_id).post("/chatbot", json={"message": "What is osmosis?", "stream": True})
+    bodies.append((response.status_code, response.get_data(as_text=True)))
+
+
+def test_concurrent_identical_streams_share_one_upstream_call(app):
+    calls = count_backend_calls(app)
+    bodies = []
+    threads = [threading.Thread(target=ask, args=(app, 1 + i % 2, bodies)) for i in range(STREAMS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(bodies) == STREAMS
+    for status, body in bodies:
+        assert status == 200
+        assert "osmosis" in body
+        assert "event: done" in body
+    assert app.extensions['smartelearning']['smartbot_cache'].stats()["coalesced"] == STREAMS - 1